@@ -0,0 +1,216 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# How often a worker re-reads which wallets are sharded
+BALANCE_SHARDS_REFRESH_SECONDS = float(os.getenv("BALANCE_SHARDS_REFRESH_SECONDS", "30"))
+MAX_BALANCE_SHARDS = 64
+
+# A sharded wallet's balance is wallets.balance plus the sum of its wallet_balance_shards.
+# Credits go to a random shard with a relative update and never touch the wallet row;
+# debits lock the wallet row and claim from it first, then from the shards.
+# Crediting the wallet row itself is always correct, so a worker's list of sharded
+# wallets only needs to be roughly current.
+wallets_table = models.Wallet.__table__
+shards_table = models.WalletBalanceShard.__table__
+
+_sharded = {}
+_loaded_at = None
+_lock = None
+shard_credits = 0
+claims = 0
+
+
+# ---------------- Sharded Wallets ----------------
+async def sharded_wallets(db: AsyncSession):
+    # {wallet_id: shard count}; flagged wallets are few, so each worker keeps them all
+    global _sharded, _loaded_at, _lock
+    if _loaded_at is not None and time.monotonic() - _loaded_at < BALANCE_SHARDS_REFRESH_SECONDS:
+        return _sharded
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        if _loaded_at is None or time.monotonic() - _loaded_at >= BALANCE_SHARDS_REFRESH_SECONDS:
+            _sharded = dict((await db.execute(
+                select(wallets_table.c.id, wallets_table.c.balance_shards).where(wallets_table.c.balance_shards > 0)
+            )).all())
+            _loaded_at = time.monotonic()
+    return _sharded
+
+
+def invalidate():
+    global _loaded_at
+    _loaded_at = None
+
+
+def shard_sum(wallet_id_column):
+    return select(func.coalesce(func.sum(shards_table.c.balance), 0))\
+        .where(shards_table.c.wallet_id == wallet_id_column)\
+        .scalar_subquery()
+
+
+async def totals(db: AsyncSession, wallet_ids):
+    # {wallet_id: balance including shards}, in one query
+    return {wallet_id: int(total) for wallet_id, total in (await db.execute(
+        select(wallets_table.c.id, wallets_table.c.balance + shard_sum(wallets_table.c.id))
+        .where(wallets_table.c.id.in_(list(wallet_ids)))
+        .order_by(wallets_table.c.id)
+    )).all()}
+
+
+# ---------------- Credits and Debits ----------------
+async def credit(db: AsyncSession, wallet_id: int, amount: int, shards: int = 0):
+    # Relative credit; False if the wallet doesn't exist. The caller commits.
+    global shard_credits
+    if shards:
+        credited = (await db.execute(
+            update(shards_table)
+            .where(shards_table.c.wallet_id == wallet_id, shards_table.c.shard == random.randrange(shards))
+            .values(balance=shards_table.c.balance + amount)
+            .returning(shards_table.c.wallet_id)
+        )).first()
+        if credited is not None:
+            shard_credits += 1
+            return True
+        # Shards were resized or removed since the list was read: credit the wallet row
+    return (await db.execute(
+        update(wallets_table)
+        .where(wallets_table.c.id == wallet_id)
+        .values(balance=wallets_table.c.balance + amount)
+        .returning(wallets_table.c.id)
+    )).first() is not None
+
+
+async def claim(db: AsyncSession, wallet_id: int, amount: int, user_id: int = None):
+    # Debits a sharded wallet: the wallet row first, then the fullest shards.
+    # Locks the wallet row (a no-op if the caller holds it), then its shards, the same
+    # order compaction uses. Returns the new total, or None if the wallet is missing,
+    # isn't user_id's, or can't cover the amount. The caller commits.
+    global claims
+    query = select(wallets_table.c.balance).where(wallets_table.c.id == wallet_id).with_for_update()
+    if user_id is not None:
+        query = query.where(wallets_table.c.user_id == user_id)
+    base = (await db.execute(query)).scalar()
+    if base is None:
+        return None
+    shards = (await db.execute(
+        select(shards_table.c.shard, shards_table.c.balance)
+        .where(shards_table.c.wallet_id == wallet_id)
+        .order_by(shards_table.c.shard)
+        .with_for_update()
+    )).all()
+    total = base + sum(balance for _, balance in shards)
+    if total < amount:
+        return None
+
+    from_base = min(base, amount)
+    remaining = amount - from_base
+    takes = []
+    for shard, balance in sorted(shards, key=lambda row: -row.balance):
+        if not remaining:
+            break
+        take = min(balance, remaining)
+        takes.append({"shard_key": shard, "take": take})
+        remaining -= take
+
+    # Relative updates: on SQLite (no FOR UPDATE) the non-negative CHECKs catch a stale read
+    if from_base:
+        await db.execute(
+            update(wallets_table).where(wallets_table.c.id == wallet_id)
+            .values(balance=wallets_table.c.balance - from_base)
+        )
+    if takes:
+        await db.execute(
+            update(shards_table)
+            .where(shards_table.c.wallet_id == wallet_id, shards_table.c.shard == bindparam("shard_key"))
+            .values(balance=shards_table.c.balance - bindparam("take")),
+            takes
+        )
+    claims += 1
+    return total - amount
+
+
+# ---------------- Maintenance ----------------
+def _fold(db: Session, wallet_id: int):
+    # Moves a wallet's shard balances into its wallet row; both are locked first
+    db.execute(select(wallets_table.c.id).where(wallets_table.c.id == wallet_id).with_for_update())
+    folded = sum(db.execute(
+        select(shards_table.c.balance)
+        .where(shards_table.c.wallet_id == wallet_id)
+        .order_by(shards_table.c.shard)
+        .with_for_update()
+    ).scalars())
+    if folded:
+        db.execute(update(wallets_table).where(wallets_table.c.id == wallet_id)
+                   .values(balance=wallets_table.c.balance + folded))
+        db.execute(update(shards_table).where(shards_table.c.wallet_id == wallet_id).values(balance=0))
+    return int(folded)
+
+
+def compact(db: Session):
+    # Folds every sharded wallet's shards back into its wallet row, one commit per wallet
+    folded = {}
+    wallet_ids = db.execute(select(wallets_table.c.id).where(wallets_table.c.balance_shards > 0)).scalars().all()
+    for wallet_id in wallet_ids:
+        folded[wallet_id] = _fold(db, wallet_id)
+        db.commit()
+    return folded
+
+
+def set_shards(db: Session, wallet_id: int, count: int):
+    # Flags a wallet as sharded into count shards (0 turns sharding off), keeping its balance
+    if not 0 <= count <= MAX_BALANCE_SHARDS:
+        raise ValueError(f"Shard count must be between 0 and {MAX_BALANCE_SHARDS}")
+    if db.get(models.Wallet, wallet_id) is None:
+        raise ValueError(f"Wallet {wallet_id} not found")
+    _fold(db, wallet_id)
+    db.execute(delete(shards_table).where(shards_table.c.wallet_id == wallet_id))
+    if count:
+        db.execute(insert(shards_table), [{"wallet_id": wallet_id, "shard": shard, "balance": 0} for shard in range(count)])
+    db.execute(update(wallets_table).where(wallets_table.c.id == wallet_id).values(balance_shards=count))
+    db.commit()
+
+
+def stats():
+    return {
+        "refresh_seconds": BALANCE_SHARDS_REFRESH_SECONDS,
+        "sharded_wallets": dict(_sharded),
+        "shard_credits": shard_credits,
+        "claims": claims,
+    }
+
+
+# Usage (from the app directory):
+#   python balances.py shard <wallet_id> <count>   -> spread a hot wallet's credits over count shards
+#   python balances.py shard <wallet_id> 0         -> back to a single balance row
+#   python balances.py compact [--every 60]        -> fold shard balances into their wallets
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    db = SessionLocal()
+    try:
+        if command == "shard" and len(sys.argv) == 4:
+            set_shards(db, int(sys.argv[2]), int(sys.argv[3]))
+            print(f"✅ Wallet {sys.argv[2]} now has {sys.argv[3]} balance shards.")
+        elif command == "compact":
+            interval = int(sys.argv[sys.argv.index("--every") + 1]) if "--every" in sys.argv else None
+            while True:
+                folded = compact(db)
+                print(f"✅ Compacted {len(folded)} sharded wallets ({sum(folded.values())} minor units folded).")
+                if interval is None:
+                    break
+                time.sleep(interval)
+        else:
+            print("Usage: python balances.py shard <wallet_id> <count> | compact [--every N]")
+            sys.exit(2)
+    finally:
+        db.close()
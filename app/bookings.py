@@ -0,0 +1,93 @@
+import os
+
+from fastapi import HTTPException
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import balances
+import jobs
+import points_ledger
+import points_rules
+
+# Points rules for this activity price a booking (per km of tour distance by default)
+BOOKING_ACTIVITY = "tour_booking"
+# queue: the booking commits an award_points job and the points follow moments later
+# inline: the points are awarded in the booking's own transaction
+BOOKING_POINTS_AWARD = os.getenv("BOOKING_POINTS_AWARD", "queue")
+
+
+async def _debit_failure(db: AsyncSession, wallet_id: int, user_id: int):
+    # Only runs once the debit matched no row, to say why
+    wallet = (await db.execute(
+        select(models.Wallet.user_id).where(models.Wallet.id == wallet_id)
+    )).first()
+    if wallet is None:
+        return HTTPException(status_code=404, detail="Wallet not found")
+    if wallet.user_id != user_id:
+        return HTTPException(status_code=403, detail="Wallet does not belong to this user")
+    return HTTPException(status_code=400, detail="Insufficient funds in wallet")
+
+
+async def book_tour(db: AsyncSession, tour, user_id: int, wallet_id: int):
+    # tour: cached tour snapshot (id, price, distance_km). The caller commits.
+    # The debit is one guarded UPDATE ... RETURNING: it takes the wallet's row lock,
+    # checks ownership and funds, and returns the new balance in a single round trip.
+    # Sharded wallets are debited with balances.claim instead.
+    price = tour["price"]
+    wallets_table = models.Wallet.__table__
+    sharded = wallet_id in await balances.sharded_wallets(db)
+    if not sharded:
+        new_balance = (await db.execute(
+            update(wallets_table)
+            .where(
+                wallets_table.c.id == wallet_id,
+                wallets_table.c.user_id == user_id,
+                wallets_table.c.balance >= price,
+                wallets_table.c.balance_shards == 0
+            )
+            .values(balance=wallets_table.c.balance - price)
+            .returning(wallets_table.c.balance)
+        )).scalar()
+        # The worker's list of sharded wallets can lag a wallet that was just sharded
+        sharded = new_balance is None and bool((await db.execute(
+            select(wallets_table.c.balance_shards).where(wallets_table.c.id == wallet_id)
+        )).scalar())
+    if sharded:
+        # Part of the balance sits in shards: lock the wallet and claim across them
+        new_balance = await balances.claim(db, wallet_id, price, user_id=user_id)
+    if new_balance is None:
+        raise await _debit_failure(db, wallet_id, user_id)
+
+    booking_id = (await db.execute(
+        insert(models.TourTransaction.__table__)
+        .values(user_id=user_id, tour_id=tour["id"], amount_paid=price, status="completed")
+        .returning(models.TourTransaction.__table__.c.id)
+    )).scalar_one()
+    await db.execute(insert(models.Transaction.__table__).values(
+        wallet_id=wallet_id,
+        amount=-price,
+        transaction_type=models.TransactionType.debit,
+        transaction_category=models.TransactionCategory.tour_booking,
+        status="completed"
+    ))
+
+    points = (await points_rules.get_rules(db)).points(BOOKING_ACTIVITY, tour["distance_km"])
+    total_points = None
+    if points and BOOKING_POINTS_AWARD == "queue":
+        award = {"user_id": user_id, "points": points, "activity_type": BOOKING_ACTIVITY, "details": f"tour:{tour['id']}"}
+        await jobs.enqueue(db, "award_points", award)
+    elif points:
+        total_points = await db.run_sync(points_ledger.add_points, user_id, points, BOOKING_ACTIVITY, f"tour:{tour['id']}")
+
+    return {
+        "booking_id": booking_id,
+        "new_balance": new_balance,
+        "points_earned": points,
+        "total_points": total_points,
+    }
+
+
+@jobs.handler("award_points")
+async def _award_points_job(db: AsyncSession, payload):
+    await db.run_sync(points_ledger.add_points, payload["user_id"], payload["points"], payload["activity_type"], payload["details"])
@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+
+import models
+
+# memory (per-process LRU) or redis (shared; needs the redis package and CACHE_URL)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))  # seconds
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+# How long Redis remembers that a key was invalidated (longer than any load takes)
+GENERATION_TTL = 3600
+
+# Cached entities are stored as plain dicts of these columns, never as ORM objects
+CACHED_COLUMNS = {
+    "user": (models.User, ("id", "name", "email")),
+    "wallet": (models.Wallet, ("id", "user_id", "balance", "currency")),
+    "vendor": (models.Vendor, ("id", "name", "service_type")),
+    "tour": (models.Tour, ("id", "name", "location", "distance_km", "price", "vendor_id")),
+}
+
+
+# ---------------- Backends ----------------
+class LRUCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # key -> invalidation count, so a load that raced an invalidate isn't stored.
+        # Cleared when it outgrows max_entries; the epoch then tells every earlier load apart.
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def generation(self, key):
+        with self._lock:
+            return (self._epoch, self._generations.get(key, 0))
+
+    async def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return  # invalidated while the value was loading
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, *keys):
+        with self._lock:
+            if len(self._generations) + len(keys) > self.max_entries:
+                self._generations.clear()
+                self._epoch += 1
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    def __init__(self, url=CACHE_URL, ttl=CACHE_TTL):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self._watch_error = redis.WatchError
+        self.ttl = ttl
+        self.evictions = 0  # handled by the server
+
+    async def get(self, key):
+        value = await self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    @staticmethod
+    def _generation_key(key):
+        return f"{key}:generation"
+
+    async def generation(self, key):
+        return await self.client.get(self._generation_key(key))
+
+    async def set(self, key, value, generation=None):
+        if generation is None:
+            await self.client.set(key, json.dumps(value), ex=max(int(self.ttl), 1))
+            return
+        # Stored only if no worker invalidated the key while the value was loading
+        async with self.client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self._generation_key(key))
+                if await pipe.get(self._generation_key(key)) != generation:
+                    return
+                pipe.multi()
+                pipe.set(key, json.dumps(value), ex=max(int(self.ttl), 1))
+                await pipe.execute()
+            except self._watch_error:
+                pass
+
+    async def delete(self, *keys):
+        if keys:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.delete(*keys)
+                for key in keys:
+                    pipe.incr(self._generation_key(key))
+                    pipe.expire(self._generation_key(key), GENERATION_TTL)
+                await pipe.execute()
+
+    def size(self):
+        return None
+
+
+backend = RedisCache() if CACHE_BACKEND == "redis" else LRUCache()
+hits = {kind: 0 for kind in CACHED_COLUMNS}
+misses = {kind: 0 for kind in CACHED_COLUMNS}
+
+
+# ---------------- Read-through Lookups ----------------
+def _key(kind, entity_id):
+    return f"vooya:{kind}:{entity_id}"
+
+
+async def get(db, kind, entity_id):
+    # Returns the cached snapshot dict, loading it from the database on a miss.
+    # Misses for rows that don't exist are not cached, so creates need no invalidation.
+    key = _key(kind, entity_id)
+    value = await backend.get(key)
+    if value is not None:
+        hits[kind] += 1
+        return value
+
+    misses[kind] += 1
+    # Taken before reading, so an invalidate committed meanwhile keeps the read out of the cache
+    generation = await backend.generation(key)
+    model, columns = CACHED_COLUMNS[kind]
+    row = await db.get(model, entity_id)
+    if row is None:
+        return None
+    value = {column: getattr(row, column) for column in columns}
+    if kind == "wallet" and row.balance_shards:
+        # Part of a sharded wallet's balance is kept in its shard rows
+        value["balance"] += int((await db.execute(
+            select(func.coalesce(func.sum(models.WalletBalanceShard.balance), 0))
+            .where(models.WalletBalanceShard.wallet_id == entity_id)
+        )).scalar())
+    await backend.set(key, value, generation)
+    return value
+
+
+async def get_user(db, user_id):
+    return await get(db, "user", user_id)
+
+
+async def get_wallet(db, wallet_id):
+    return await get(db, "wallet", wallet_id)
+
+
+async def get_vendor(db, vendor_id):
+    return await get(db, "vendor", vendor_id)
+
+
+async def get_tour(db, tour_id):
+    return await get(db, "tour", tour_id)
+
+
+async def invalidate(kind, *entity_ids):
+    # Call after the commit that changed the rows
+    await backend.delete(*[_key(kind, entity_id) for entity_id in entity_ids])
+
+
+def stats():
+    return {
+        "backend": CACHE_BACKEND,
+        "ttl_seconds": CACHE_TTL,
+        "entries": backend.size(),
+        "evictions": backend.evictions,
+        "hits": dict(hits),
+        "misses": dict(misses),
+    }
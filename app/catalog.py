@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import os
+import time
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, or_, select
+from sqlalchemy.orm import Session
+
+import models
+from bookings import BOOKING_ACTIVITY
+import points_rules
+from pagination import decode_key_cursor, encode_key_cursor
+
+# Serve GET /tours from an in-memory snapshot (true) or straight from the indexed tables
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "true").lower() not in ("0", "false", "no")
+# How often a worker checks whether another process changed tours or vendors
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "30"))
+
+# sort name -> catalog field; a leading "-" in the request sorts descending
+SORT_FIELDS = {"name": "name", "price": "price", "distance": "distance_km"}
+
+# Only tours with a price can be booked, so only those are listed
+CATALOG_COLUMNS = (
+    models.Tour.id, models.Tour.name, models.Tour.location, models.Tour.distance_km, models.Tour.price,
+    models.Tour.vendor_id, models.Vendor.name.label("vendor_name"), models.Vendor.service_type,
+)
+
+
+def _catalog_query():
+    return select(*CATALOG_COLUMNS)\
+        .outerjoin(models.Vendor, models.Vendor.id == models.Tour.vendor_id)\
+        .where(models.Tour.price.isnot(None))
+
+
+def _entry(row):
+    return dict(row._mapping)
+
+
+def _sort_value(entry, field):
+    # Missing distances sort as 0
+    value = entry[field]
+    return value if value is not None else 0
+
+
+# ---------------- Snapshot ----------------
+class CatalogSnapshot:
+    def __init__(self, entries, stamp, version):
+        self.stamp = stamp
+        self.version = version  # of invalidate() calls when built
+        self.checked_at = time.monotonic()
+        self.size = len(entries)
+        # Every sort order is precomputed once per build, with its (value, id) keys for bisecting
+        self.orders = {}
+        for field in SORT_FIELDS.values():
+            ordered = sorted(entries, key=lambda entry: (_sort_value(entry, field), entry["id"]))
+            self.orders[field] = (ordered, [(_sort_value(entry, field), entry["id"]) for entry in ordered])
+
+    def search(self, filters, field, descending, cursor, limit):
+        ordered, keys = self.orders[field]
+        if descending:
+            start = bisect.bisect_left(keys, tuple(cursor)) - 1 if cursor else len(ordered) - 1
+            positions = range(start, -1, -1)
+        else:
+            start = bisect.bisect_right(keys, tuple(cursor)) if cursor else 0
+            positions = range(start, len(ordered))
+
+        matches = []
+        for position in positions:
+            entry = ordered[position]
+            if all(check(entry) for check in filters):
+                matches.append(entry)
+                if len(matches) > limit:
+                    break
+        return matches
+
+
+_snapshot = None
+# Bumped by invalidate(). A snapshot built from an earlier version is out of date, even when
+# the invalidate arrived while its rebuild was already reading the database.
+_version = 0
+_lock = None
+builds = 0
+served = 0
+
+
+async def _stamp(db):
+    # One small indexed query that changes whenever a tour or vendor is added, edited or removed
+    return tuple((await db.execute(select(
+        select(func.count()).select_from(models.Tour).scalar_subquery(),
+        select(func.max(models.Tour.updated_at)).scalar_subquery(),
+        select(func.count()).select_from(models.Vendor).scalar_subquery(),
+        select(func.max(models.Vendor.updated_at)).scalar_subquery(),
+    ))).one())
+
+
+async def get_snapshot(db):
+    global _snapshot, _lock, builds
+    if _snapshot is not None and _snapshot.version == _version and time.monotonic() - _snapshot.checked_at < CATALOG_REFRESH_SECONDS:
+        return _snapshot
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    # One rebuild per worker at a time; requests queued behind it reuse the result
+    async with _lock:
+        if _snapshot is not None and _snapshot.version == _version and time.monotonic() - _snapshot.checked_at < CATALOG_REFRESH_SECONDS:
+            return _snapshot
+        version = _version
+        stamp = await _stamp(db)
+        if _snapshot is not None and stamp == _snapshot.stamp:
+            _snapshot.checked_at = time.monotonic()
+            _snapshot.version = version
+            return _snapshot
+        rows = (await db.execute(_catalog_query())).all()
+        _snapshot = CatalogSnapshot([_entry(row) for row in rows], stamp, version)
+        builds += 1
+        return _snapshot
+
+
+def invalidate():
+    global _version
+    _version += 1
+
+
+# Changes committed through this process rebuild the snapshot on the next read
+@event.listens_for(Session, "after_flush")
+def _note_catalog_changes(session, flush_context):
+    if any(isinstance(obj, (models.Tour, models.Vendor)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["catalog_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session):
+    if session.info.pop("catalog_changed", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("catalog_changed", None)
+
+
+# ---------------- Search ----------------
+def _filters(location, vendor_id, service_type, min_price, max_price, min_distance, max_distance):
+    checks = []
+    if location is not None:
+        checks.append(lambda entry: entry["location"] == location)
+    if vendor_id is not None:
+        checks.append(lambda entry: entry["vendor_id"] == vendor_id)
+    if service_type is not None:
+        checks.append(lambda entry: entry["service_type"] == service_type)
+    if min_price is not None:
+        checks.append(lambda entry: entry["price"] >= min_price)
+    if max_price is not None:
+        checks.append(lambda entry: entry["price"] <= max_price)
+    if min_distance is not None:
+        checks.append(lambda entry: _sort_value(entry, "distance_km") >= min_distance)
+    if max_distance is not None:
+        checks.append(lambda entry: _sort_value(entry, "distance_km") <= max_distance)
+    return checks
+
+
+async def _search_database(db, field, descending, cursor, limit, location, vendor_id, service_type,
+                           min_price, max_price, min_distance, max_distance):
+    # Same semantics as the snapshot, answered by the tour indexes
+    column = {"name": models.Tour.name, "price": models.Tour.price,
+              "distance_km": func.coalesce(models.Tour.distance_km, 0)}[field]
+    query = _catalog_query()
+    if location is not None:
+        query = query.where(models.Tour.location == location)
+    if vendor_id is not None:
+        query = query.where(models.Tour.vendor_id == vendor_id)
+    if service_type is not None:
+        query = query.where(models.Vendor.service_type == service_type)
+    if min_price is not None:
+        query = query.where(models.Tour.price >= min_price)
+    if max_price is not None:
+        query = query.where(models.Tour.price <= max_price)
+    if min_distance is not None:
+        query = query.where(func.coalesce(models.Tour.distance_km, 0) >= min_distance)
+    if max_distance is not None:
+        query = query.where(func.coalesce(models.Tour.distance_km, 0) <= max_distance)
+    if cursor:
+        value, row_id = cursor
+        if descending:
+            query = query.where(or_(column < value, and_(column == value, models.Tour.id < row_id)))
+        else:
+            query = query.where(or_(column > value, and_(column == value, models.Tour.id > row_id)))
+    order = (column.desc(), models.Tour.id.desc()) if descending else (column, models.Tour.id)
+    return [_entry(row) for row in (await db.execute(query.order_by(*order).limit(limit + 1))).all()]
+
+
+async def search(db, sort="name", cursor=None, limit=20, location=None, vendor_id=None, service_type=None,
+                 min_price=None, max_price=None, min_distance=None, max_distance=None):
+    # Returns {"items": [catalog entries], "next_cursor": ...}; prices are minor units
+    global served
+    descending = sort.startswith("-")
+    field = SORT_FIELDS[sort.lstrip("-")]
+    position = decode_key_cursor(cursor) if cursor else None
+
+    if CATALOG_SNAPSHOT:
+        snapshot = await get_snapshot(db)
+        filters = _filters(location, vendor_id, service_type, min_price, max_price, min_distance, max_distance)
+        try:
+            rows = snapshot.search(filters, field, descending, position, limit)
+        except TypeError:  # a cursor taken from a listing with another sort
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        served += 1
+    else:
+        rows = await _search_database(db, field, descending, position, limit, location, vendor_id, service_type,
+                                      min_price, max_price, min_distance, max_distance)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_key_cursor(_sort_value(rows[-1], field), rows[-1]["id"])
+    # Points follow the current rules (promotions start and end), so they are added per page
+    rules = await points_rules.get_rules(db)
+    points = rules.points_batch([(BOOKING_ACTIVITY, entry["distance_km"]) for entry in rows])
+    items = [{**entry, "points_per_booking": earned} for entry, earned in zip(rows, points)]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def stats():
+    return {
+        "snapshot": CATALOG_SNAPSHOT,
+        "refresh_seconds": CATALOG_REFRESH_SECONDS,
+        "tours": _snapshot.size if _snapshot is not None else None,
+        "stale": _snapshot is None or _snapshot.version != _version,
+        "builds": builds,
+        "served_from_snapshot": served,
+    }
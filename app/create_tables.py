@@ -1,6 +1,9 @@
-from app.database import Base, engine
-import app.models  # important!
+import os
 
-print("Creating tables...")
-Base.metadata.create_all(bind=engine)
+from alembic import command
+from alembic.config import Config
+
+# Same as `alembic upgrade head` from this directory
+print("Running migrations...")
+command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
 print("All tables created successfully!")
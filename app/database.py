@@ -1,16 +1,262 @@
-from sqlalchemy import create_engine
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 
 # Load the .env file
 from dotenv import load_dotenv
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Connection pool settings (per engine, per worker process)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+
+# The API runs on the async engine; the sync engine serves scripts (create_tables,
+# seed_data, points_ledger, rollups). DATABASE_URL may name either kind of driver,
+# e.g. postgresql://, postgresql+asyncpg://, sqlite:///./vooya.db or
+# sqlite+aiosqlite:///./vooya.db - the other engine gets the matching driver.
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+SYNC_DRIVERS = {"postgresql": "postgresql+psycopg2", "sqlite": "sqlite"}
+ASYNC_ONLY_DRIVER_NAMES = {"asyncpg", "aiosqlite", "aiomysql", "asyncmy"}
+ASYNC_DRIVER_NAMES = ASYNC_ONLY_DRIVER_NAMES | {"psycopg"}  # psycopg 3 does both
+
+def _explicit_driver(url):
+    # "postgresql+asyncpg" -> "asyncpg"; a bare "postgresql" names no driver
+    return url.drivername.partition("+")[2]
+
+def _sync_url(url):
+    url = make_url(url)
+    if _explicit_driver(url) in ASYNC_ONLY_DRIVER_NAMES:
+        return url.set(drivername=SYNC_DRIVERS.get(url.get_backend_name(), url.get_backend_name()))
+    return url
+
+def _async_url(url):
+    url = make_url(url)
+    if _explicit_driver(url) in ASYNC_DRIVER_NAMES:
+        return url
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+# ---------------- Pool Statistics ----------------
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+        self.connection_errors = 0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_error(self, timed_out):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.connection_errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "wait_total_seconds": round(self.wait_total, 6),
+                "wait_avg_seconds": round(self.wait_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_max_seconds": round(self.wait_max, 6),
+                "timeouts": self.timeouts,
+                "connection_errors": self.connection_errors,
+            }
+        pool = self.pool
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow_in_use": max(pool.overflow(), 0),
+            })
+        return stats
+
+
+class _TimedCheckoutMixin:
+    # QueuePool._do_get blocks while the pool is exhausted, so timing it gives the
+    # checkout wait (including opening a new connection when one is needed).
+    pool_stats = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.pool_stats.record_error(timed_out=True)
+            raise
+        except Exception:
+            self.pool_stats.record_error(timed_out=False)
+            raise
+        self.pool_stats.record_wait(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.pool_stats = self.pool_stats
+        self.pool_stats.pool = pool
+        return pool
+
+
+class InstrumentedQueuePool(_TimedCheckoutMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckoutMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument_engine(engine, stats):
+    # Accepts a sync Engine or the .sync_engine of an AsyncEngine
+    stats.pool = engine.pool
+    if isinstance(engine.pool, _TimedCheckoutMixin):
+        engine.pool.pool_stats = stats
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        with stats._lock:
+            stats.connects += 1
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        with stats._lock:
+            stats.checkins += 1
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(context):
+        if context.is_disconnect:
+            stats.record_error(timed_out=False)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})  # ✅ PostgreSQL does not need connect_args
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# ---------------- Engines ----------------
+def _connect_args(url):
+    driver = url.get_driver_name()
+    if url.get_backend_name() == "sqlite":
+        return {} if driver == "aiosqlite" else {"check_same_thread": False}
+    if driver == "asyncpg":
+        return {"timeout": DB_CONNECT_TIMEOUT}
+    if driver in ("psycopg2", "psycopg"):
+        return {"connect_timeout": DB_CONNECT_TIMEOUT}
+    return {}
+
+def _engine_kwargs(url, pool_class):
+    kwargs = {"connect_args": _connect_args(url), "pool_pre_ping": DB_POOL_PRE_PING}
+    # In-memory SQLite keeps its single-connection pool; everything else gets a sized QueuePool
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return kwargs
+    kwargs.update(
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return kwargs
+
+# ---------------- Lazy Engines ----------------
+# Nothing connects at import: the engines are built on first use, so the app (or a
+# script) can be imported and configured without a live database.
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+_engines = {}
+_engine_hooks = []
+
+
+def on_engine_created(hook):
+    # hook(sync_engine) runs for each engine as it is built (the async engine passes
+    # its .sync_engine); registering twice is a no-op
+    if hook in _engine_hooks:
+        return
+    _engine_hooks.append(hook)
+    for built in _engines.values():
+        hook(built.sync_engine if hasattr(built, "sync_engine") else built)
+
+
+def _database_url():
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        raise RuntimeError("DATABASE_URL is not set")
+    return url
+
+
+def sync_url():
+    # URL for the sync engine (scripts, migrations)
+    return _sync_url(_database_url())
+
+
+def get_engine():
+    if "sync" not in _engines:
+        url = sync_url()
+        built = create_engine(url, **_engine_kwargs(url, InstrumentedQueuePool))
+        instrument_engine(built, sync_pool_stats)
+        _engines["sync"] = built
+        for hook in _engine_hooks:
+            hook(built)
+    return _engines["sync"]
+
+
+def get_async_engine():
+    if "async" not in _engines:
+        url = _async_url(_database_url())
+        built = create_async_engine(url, **_engine_kwargs(url, InstrumentedAsyncQueuePool))
+        instrument_engine(built.sync_engine, async_pool_stats)
+        _engines["async"] = built
+        for hook in _engine_hooks:
+            hook(built.sync_engine)
+    return _engines["async"]
+
+
+async def dispose_engines():
+    engines = dict(_engines)
+    _engines.clear()
+    if "async" in engines:
+        await engines["async"].dispose()
+    if "sync" in engines:
+        engines["sync"].dispose()
+
+
+class LazySessionmaker:
+    # Called like a sessionmaker; (re)binds to the current engine when a session is made
+    def __init__(self, get_bind, factory_class=sessionmaker, **options):
+        self._get_bind = get_bind
+        self._factory_class = factory_class
+        self._options = options
+        self._factory = None
+
+    def __call__(self, **kwargs):
+        bind = self._get_bind()
+        if self._factory is None or self._factory.kw["bind"] is not bind:
+            self._factory = self._factory_class(bind=bind, **self._options)
+        return self._factory(**kwargs)
+
+
+SessionLocal = LazySessionmaker(get_engine, autocommit=False, autoflush=False)
+# expire_on_commit=False: handlers return ORM rows after commit, and async sessions can't lazy-load
+AsyncSessionLocal = LazySessionmaker(
+    get_async_engine, async_sessionmaker, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
 Base = declarative_base()
 
@@ -21,3 +267,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async dependency (used by the routers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
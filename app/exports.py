@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import select
+
+import models
+import money
+from database import AsyncSessionLocal
+
+# Rows fetched per server-side cursor round trip (and written per chunk)
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    models.Transaction.id,
+    models.Transaction.wallet_id,
+    models.Transaction.amount,
+    models.Transaction.transaction_type,
+    models.Transaction.transaction_category,
+    models.Transaction.status,
+    models.Transaction.created_at,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+AMOUNT_INDEX = EXPORT_FIELDS.index("amount")
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_query(wallet_filter, date_from: date = None, date_to: date = None):
+    # Plain column tuples in ledger order; no ORM objects are built
+    query = select(*EXPORT_COLUMNS)\
+        .join(models.Wallet, models.Wallet.id == models.Transaction.wallet_id)\
+        .where(wallet_filter)
+    if date_from:
+        query = query.where(models.Transaction.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.where(models.Transaction.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return query.order_by(models.Transaction.created_at, models.Transaction.id)\
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _plain(value):
+    if hasattr(value, "value"):  # enum members
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _plain_row(row):
+    values = [_plain(value) for value in row]
+    values[AMOUNT_INDEX] = money.to_major(values[AMOUNT_INDEX])  # exported in major units
+    return values
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([_plain_row(row) for row in rows])
+    return buffer.getvalue()
+
+
+def _ndjson_chunk(rows):
+    return "".join(json.dumps(dict(zip(EXPORT_FIELDS, _plain_row(row)))) + "\n" for row in rows)
+
+
+async def stream_export(query, fmt):
+    # The request's session is closed once the handler returns, so streaming
+    # uses its own session for the lifetime of the response.
+    async with AsyncSessionLocal() as db:
+        if fmt == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+        result = await db.stream(query)
+        async for rows in result.partitions():
+            yield _csv_chunk(rows) if fmt == "csv" else _ndjson_chunk(rows)
@@ -0,0 +1,197 @@
+import asyncio
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from fractions import Fraction
+
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# Currency user summaries are reported in when the request does not name one
+FX_REPORTING_CURRENCY = os.getenv("FX_REPORTING_CURRENCY", "GHS").upper()
+# How long a worker serves its cached rates before re-reading the latest ones
+FX_REFRESH_SECONDS = float(os.getenv("FX_REFRESH_SECONDS", "300"))
+# Serve rates from this CSV file instead of the fx_rates table (e.g. for offline reports)
+FX_RATES_FILE = os.getenv("FX_RATES_FILE")
+
+# Wallets created without a currency hold the app's default one
+DEFAULT_CURRENCY = "GHS"
+
+
+# ---------------- Rate File ----------------
+def read_rates_file(path):
+    # CSV with a header: base_currency,quote_currency,rate[,as_of]
+    # Rates stay Decimal from the file to the database; as_of defaults to now.
+    now = datetime.utcnow()
+    rates = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            try:
+                rate = Decimal(row["rate"].strip())
+            except (KeyError, AttributeError, InvalidOperation):
+                raise ValueError(f"{path}:{line}: invalid rate")
+            if not rate.is_finite() or rate <= 0:
+                raise ValueError(f"{path}:{line}: rate must be positive")
+            base, quote = row["base_currency"].strip().upper(), row["quote_currency"].strip().upper()
+            if not (len(base) == len(quote) == 3 and (base + quote).isalpha()) or base == quote:
+                raise ValueError(f"{path}:{line}: invalid currency pair")
+            as_of = row.get("as_of")
+            rates.append({
+                "base_currency": base,
+                "quote_currency": quote,
+                "rate": rate,
+                "as_of": datetime.fromisoformat(as_of.strip()) if as_of else now,
+            })
+    return rates
+
+
+def import_rates(db: Session, rates):
+    # Adds rows to the history; a pair's newest as_of becomes its current rate
+    if rates:
+        db.execute(models.FxRate.__table__.insert(), rates)
+    db.commit()
+    return len(rates)
+
+
+# ---------------- Rate Cache ----------------
+class RateTable:
+    def __init__(self, rates):
+        # Fractions keep inverse and cross rates exact
+        self.rates = {}
+        self.as_of = None
+        for row in rates:
+            self.rates[(row["base_currency"], row["quote_currency"])] = Fraction(row["rate"])
+            if self.as_of is None or row["as_of"] > self.as_of:
+                self.as_of = row["as_of"]
+        self.loaded_at = time.monotonic()
+        self.currencies = {currency for pair in self.rates for currency in pair}
+
+    def _pair(self, base, quote):
+        if base == quote:
+            return Fraction(1)
+        if (base, quote) in self.rates:
+            return self.rates[(base, quote)]
+        if (quote, base) in self.rates:
+            return 1 / self.rates[(quote, base)]
+        return None
+
+    def rate(self, base, quote):
+        # Direct, inverse, or crossed through one currency quoted against both
+        rate = self._pair(base, quote)
+        if rate is not None:
+            return rate
+        for via in sorted(self.currencies):
+            first, second = self._pair(base, via), self._pair(via, quote)
+            if first is not None and second is not None:
+                return first * second
+        return None
+
+
+_table = None
+_lock = None
+loads = 0
+
+
+def _latest_rates_query():
+    latest = select(
+        models.FxRate.base_currency, models.FxRate.quote_currency, func.max(models.FxRate.as_of).label("as_of")
+    ).group_by(models.FxRate.base_currency, models.FxRate.quote_currency).subquery()
+    return select(
+        models.FxRate.base_currency, models.FxRate.quote_currency, models.FxRate.rate, models.FxRate.as_of
+    ).join(latest, (models.FxRate.base_currency == latest.c.base_currency)
+           & (models.FxRate.quote_currency == latest.c.quote_currency)
+           & (models.FxRate.as_of == latest.c.as_of))
+
+
+async def get_rates(db):
+    global _table, _lock, loads
+    if _table is not None and time.monotonic() - _table.loaded_at < FX_REFRESH_SECONDS:
+        return _table
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        if _table is not None and time.monotonic() - _table.loaded_at < FX_REFRESH_SECONDS:
+            return _table
+        if FX_RATES_FILE:
+            # Later lines win, like a newer as_of in the table
+            rows = sorted(read_rates_file(FX_RATES_FILE), key=lambda row: row["as_of"])
+        else:
+            rows = [dict(row._mapping) for row in (await db.execute(_latest_rates_query())).all()]
+        _table = RateTable(rows)
+        loads += 1
+        return _table
+
+
+def invalidate():
+    global _table
+    _table = None
+
+
+# ---------------- Conversion ----------------
+CONVERTED_FIELDS = ("total_credits", "total_debits")
+COUNTED_FIELDS = ("credit_count", "debit_count")
+
+
+def convert_summaries(by_currency, target, rates, required=True):
+    # Folds per-currency summaries (minor units) into one in the target currency.
+    # Every product is summed exactly and each total is rounded once, half to even.
+    # rates may be None when every summary is already in the target currency.
+    # A missing rate is a 400 when the conversion is required; otherwise the
+    # converted totals are None and only the counts are folded.
+    used = {currency: Fraction(1) if currency == target else rates.rate(currency, target) for currency in by_currency}
+    missing = sorted(currency for currency, rate in used.items() if rate is None)
+    if missing and required:
+        raise HTTPException(status_code=400, detail=f"No FX rate to {target} for: {missing}")
+    if missing:
+        counts = {field: sum(summary[field] for summary in by_currency.values()) for field in COUNTED_FIELDS}
+        found = {currency: rate for currency, rate in used.items() if rate is not None}
+        return {**dict.fromkeys(CONVERTED_FIELDS), **counts, "current_balance": None}, found
+
+    sums = dict.fromkeys(CONVERTED_FIELDS, Fraction(0))
+    counts = dict.fromkeys(COUNTED_FIELDS, 0)
+    for currency, summary in by_currency.items():
+        rate = used[currency]
+        for field in CONVERTED_FIELDS:
+            sums[field] += summary[field] * rate
+        for field in COUNTED_FIELDS:
+            counts[field] += summary[field]
+
+    converted = {field: round(total) for field, total in sums.items()}
+    return {
+        **converted,
+        **counts,
+        "current_balance": converted["total_credits"] + converted["total_debits"],
+    }, used
+
+
+def stats():
+    return {
+        "reporting_currency": FX_REPORTING_CURRENCY,
+        "refresh_seconds": FX_REFRESH_SECONDS,
+        "source": FX_RATES_FILE or "fx_rates",
+        "pairs": len(_table.rates) if _table is not None else None,
+        "as_of": _table.as_of.isoformat() if _table is not None and _table.as_of else None,
+        "loads": loads,
+    }
+
+
+# Usage (from the app directory):
+#   python fx.py load rates.csv   -> add the file's rates to the fx_rates table
+#   CSV header: base_currency,quote_currency,rate[,as_of]   e.g. USD,GHS,12.45,2026-10-18T00:00:00
+if __name__ == "__main__":
+    if len(sys.argv) != 3 or sys.argv[1] != "load":
+        print("Usage: python fx.py load <rates.csv>")
+        sys.exit(2)
+    db = SessionLocal()
+    try:
+        print(f"✅ Loaded {import_rates(db, read_rates_file(sys.argv[2]))} FX rates.")
+    finally:
+        db.close()
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+import cache
+import models
+from database import SessionLocal
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))  # seconds a key is remembered
+IDEMPOTENCY_CACHE_ENTRIES = int(os.getenv("IDEMPOTENCY_CACHE_ENTRIES", "10000"))
+MAX_KEY_LENGTH = 255
+
+# Completed responses, "scope:key" -> (request_hash, expires_at, body). The DB table is the
+# source of truth; this only saves the lookup for retries landing on the same worker.
+_recent = cache.LRUCache(max_entries=IDEMPOTENCY_CACHE_ENTRIES, ttl=IDEMPOTENCY_TTL)
+# Requests running in this process, "scope:key" -> future resolved when they finish
+_in_flight = {}
+
+
+def request_hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replay(fingerprint, stored_hash, body, response):
+    if stored_hash != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if response is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+    return body
+
+
+async def _stored(db, scope, key):
+    return (await db.execute(
+        select(models.IdempotencyKey).where(models.IdempotencyKey.scope == scope, models.IdempotencyKey.key == key)
+    )).scalar_one_or_none()
+
+
+async def run(db, scope, key, payload, handler, response=None):
+    # handler() does the work on db without committing and returns the JSON body.
+    # The body is stored in the same transaction as the work, so a key is
+    # recorded exactly when its effects are.
+    if key is None:
+        body = await handler()
+        await db.commit()
+        return body
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+
+    fingerprint = request_hash(payload)
+    lookup = f"{scope}:{key}"
+    # A duplicate already running here: wait for it rather than racing it
+    while lookup in _in_flight:
+        await asyncio.shield(_in_flight[lookup])
+
+    entry = await _recent.get(lookup)
+    if entry is not None and entry[1] > datetime.utcnow():
+        return _replay(fingerprint, entry[0], entry[2], response)
+
+    finished = asyncio.get_running_loop().create_future()
+    _in_flight[lookup] = finished
+    try:
+        row = await _stored(db, scope, key)
+        now = datetime.utcnow()
+        if row is not None and row.expires_at > now:
+            body = json.loads(row.response)
+            await _recent.set(lookup, (row.request_hash, row.expires_at, body))
+            return _replay(fingerprint, row.request_hash, body, response)
+        if row is not None:
+            await db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.id == row.id))
+
+        row = models.IdempotencyKey(
+            scope=scope, key=key, request_hash=fingerprint, response="",
+            expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL)
+        )
+        db.add(row)
+        try:
+            # On another worker's duplicate this insert blocks until that request commits
+            # (then fails on the unique index) or rolls back (then goes through)
+            await db.flush()
+        except IntegrityError:
+            await db.rollback()
+            row = await _stored(db, scope, key)
+            if row is None:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress, please retry")
+            return _replay(fingerprint, row.request_hash, json.loads(row.response), response)
+
+        body = await handler()
+        row.response = json.dumps(body)
+        await db.commit()
+        await _recent.set(lookup, (fingerprint, row.expires_at, body))
+        return body
+    finally:
+        del _in_flight[lookup]
+        finished.set_result(None)
+
+
+def purge_expired(db):
+    deleted = db.execute(
+        delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= datetime.utcnow())
+    ).rowcount
+    db.commit()
+    return deleted
+
+
+# Usage (from the app directory):
+#   python idempotency.py purge   -> delete expired keys; run periodically
+if __name__ == "__main__":
+    if (sys.argv[1] if len(sys.argv) > 1 else "purge") != "purge":
+        print(f"Unknown command: {sys.argv[1]}")
+        sys.exit(2)
+    db = SessionLocal()
+    try:
+        print(f"✅ Purged {purge_expired(db)} expired idempotency keys.")
+    finally:
+        db.close()
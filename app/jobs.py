@@ -0,0 +1,399 @@
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, delete, event, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+from database import AsyncSessionLocal, SessionLocal, get_async_engine
+
+# Jobs run at once per worker process (0: this process only enqueues; run `python jobs.py run`)
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "4"))
+# How often an idle worker looks for jobs committed by other processes and for retries that are due
+JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+# A claimed job that isn't finished within this long is picked up again
+JOBS_LEASE_SECONDS = float(os.getenv("JOBS_LEASE_SECONDS", "60"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+# Delay before the first retry; doubles with every attempt, up to MAX_RETRY_SECONDS
+JOBS_RETRY_SECONDS = float(os.getenv("JOBS_RETRY_SECONDS", "2"))
+MAX_RETRY_SECONDS = 3600
+
+PENDING, RUNNING, DONE, FAILED = "pending", "running", "done", "failed"
+
+logger = logging.getLogger("vooya.jobs")
+
+# Jobs are rows in outbox_jobs, inserted in the same transaction as the request's own
+# writes, so a job exists exactly when the request committed. A handler's writes commit
+# together with its job being marked done, so they are applied once even if a worker dies
+# mid-job and another picks it up after the lease expires.
+jobs_table = models.OutboxJob.__table__
+
+
+# ---------------- Handlers ----------------
+class Handler:
+    def __init__(self, function, concurrency, max_attempts):
+        self.function = function
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+
+_handlers = {}
+
+
+def handler(kind, concurrency=None, max_attempts=JOBS_MAX_ATTEMPTS):
+    # Registers `async def function(db: AsyncSession, payload)`; it must not commit.
+    # concurrency caps how many jobs of this kind one process runs at once.
+    def register(function):
+        _handlers[kind] = Handler(function, concurrency, max_attempts)
+        return function
+    return register
+
+
+async def enqueue(db: AsyncSession, kind, payload, delay=0):
+    # Adds the job to the caller's transaction; it runs only once that commits
+    if kind not in _handlers:
+        raise ValueError(f"No job handler for {kind!r}")
+    await db.execute(insert(jobs_table).values(
+        kind=kind,
+        payload=json.dumps(payload),
+        max_attempts=_handlers[kind].max_attempts,
+        run_after=datetime.utcnow() + timedelta(seconds=delay),
+    ))
+    db.sync_session.info["jobs_enqueued"] = True
+    queue.enqueued[kind] = queue.enqueued.get(kind, 0) + 1
+
+
+# Committed jobs start right away instead of at the next poll
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop("jobs_enqueued", False):
+        queue.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_jobs(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+def _due(now):
+    # Pending jobs whose time has come, and running jobs whose worker lost its lease
+    return or_(
+        and_(jobs_table.c.status == PENDING, jobs_table.c.run_after <= now),
+        and_(jobs_table.c.status == RUNNING, jobs_table.c.locked_until < now),
+    )
+
+
+def retry_delay(attempts):
+    return min(JOBS_RETRY_SECONDS * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+
+
+# ---------------- Worker Pool ----------------
+class JobQueue:
+    def __init__(self, workers=JOBS_WORKERS, poll_seconds=JOBS_POLL_SECONDS, lease_seconds=JOBS_LEASE_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease = timedelta(seconds=lease_seconds)
+        self._loop = None
+        self._wake = None
+        self._dispatcher = None
+        self._stopping = False
+        self._running = set()
+        self._running_by_kind = {}
+        self._kind_slots = {}
+        self.enqueued = {}
+        self.succeeded = {}
+        self.retried = {}
+        self.failed = {}
+        self.lost_leases = 0
+        self.outbox = {}           # status -> jobs, as of the last poll
+        self.oldest_pending = None  # created_at of the oldest pending job, as of the last poll
+        self.last_seconds = 0.0
+
+    # Started by the app at startup, or by the first commit that enqueues a job
+    def start(self):
+        if self.workers <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if self._dispatcher is not None and self._loop is loop and not self._dispatcher.done():
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._running = set()
+        self._running_by_kind = {}
+        self._kind_slots = {}
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    def wake(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # a script's sync session: a worker will poll for it
+            loop = None
+        if loop is not None and (self._loop is not loop or self._dispatcher is None):
+            self.start()
+        if self._wake is None or self._loop is None or self._loop.is_closed():
+            return
+        if loop is self._loop:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _dispatch(self):
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                free = self.workers - len(self._running)
+                for job in await self._claim(free):
+                    task = asyncio.get_running_loop().create_task(self._run(job))
+                    self._running.add(task)
+                    task.add_done_callback(self._finished)
+            except Exception:
+                logger.exception("Claiming jobs failed")
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+
+    def _finished(self, task):
+        self._running.discard(task)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _claim(self, limit):
+        # Leases up to `limit` due jobs this process has handlers for, and refreshes the
+        # outbox depth. On PostgreSQL SKIP LOCKED lets several worker processes share the
+        # outbox; elsewhere the guarded UPDATE makes sure only one of them gets each job.
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            depth = (await db.execute(
+                select(jobs_table.c.status, func.count(), func.min(jobs_table.c.created_at))
+                .where(jobs_table.c.status.in_([PENDING, RUNNING, FAILED]))
+                .group_by(jobs_table.c.status)
+            )).all()
+            self.outbox = {status: count for status, count, _ in depth}
+            self.oldest_pending = next((oldest for status, _, oldest in depth if status == PENDING), None)
+
+            kinds = [kind for kind, registered in _handlers.items()
+                     if not registered.concurrency or self._running_by_kind.get(kind, 0) < registered.concurrency]
+            if limit <= 0 or not kinds:
+                return []
+            query = select(jobs_table.c.id)\
+                .where(_due(now), jobs_table.c.kind.in_(kinds))\
+                .order_by(jobs_table.c.run_after, jobs_table.c.id)\
+                .limit(limit)
+            if get_async_engine().dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+            ids = (await db.execute(query)).scalars().all()
+            if not ids:
+                return []
+            claimed = (await db.execute(
+                update(jobs_table)
+                .where(jobs_table.c.id.in_(ids), _due(now))
+                .values(status=RUNNING, attempts=jobs_table.c.attempts + 1, locked_until=now + self.lease, updated_at=now)
+                .returning(jobs_table.c.id, jobs_table.c.kind, jobs_table.c.payload,
+                           jobs_table.c.attempts, jobs_table.c.max_attempts)
+            )).all()
+            await db.commit()
+            return claimed
+
+    def _mine(self, job):
+        # Only the worker holding the current attempt may finish the job
+        return and_(jobs_table.c.id == job.id, jobs_table.c.status == RUNNING, jobs_table.c.attempts == job.attempts)
+
+    async def _run(self, job):
+        registered = _handlers[job.kind]
+        self._running_by_kind[job.kind] = self._running_by_kind.get(job.kind, 0) + 1
+        if registered.concurrency and job.kind not in self._kind_slots:
+            self._kind_slots[job.kind] = asyncio.Semaphore(registered.concurrency)
+        try:
+            async with self._kind_slots.get(job.kind) or contextlib.nullcontext():
+                start = time.perf_counter()
+                try:
+                    async with AsyncSessionLocal() as db:
+                        await registered.function(db, json.loads(job.payload))
+                        now = datetime.utcnow()
+                        finished = await db.execute(update(jobs_table).where(self._mine(job)).values(
+                            status=DONE, locked_until=None, last_error=None, finished_at=now, updated_at=now
+                        ))
+                        if finished.rowcount != 1:
+                            # The lease ran out and another worker took the job over
+                            await db.rollback()
+                            self.lost_leases += 1
+                            logger.warning("Job %d (%s) lost its lease; its changes were rolled back", job.id, job.kind)
+                            return
+                        await db.commit()
+                except Exception as e:
+                    logger.exception("Job %d (%s) failed on attempt %d of %d",
+                                     job.id, job.kind, job.attempts, job.max_attempts)
+                    await self._failed(job, e)
+                    return
+                self.last_seconds = time.perf_counter() - start
+                self.succeeded[job.kind] = self.succeeded.get(job.kind, 0) + 1
+        finally:
+            self._running_by_kind[job.kind] -= 1
+
+    async def _failed(self, job, error):
+        now = datetime.utcnow()
+        values = {"locked_until": None, "last_error": f"{type(error).__name__}: {error}"[:2000], "updated_at": now}
+        if job.attempts < job.max_attempts:
+            values.update(status=PENDING, run_after=now + timedelta(seconds=retry_delay(job.attempts)))
+            counter = self.retried
+        else:
+            values.update(status=FAILED, finished_at=now)
+            counter = self.failed
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(update(jobs_table).where(self._mine(job)).values(**values))
+                await db.commit()
+        except Exception:
+            # The lease still runs out, and the job is retried then
+            logger.exception("Recording the failure of job %d failed", job.id)
+        counter[job.kind] = counter.get(job.kind, 0) + 1
+
+    async def drain(self, timeout=30.0):
+        # Waits until this process has no due jobs left to run (benchmarks, tests)
+        self.wake()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self._running:
+                async with AsyncSessionLocal() as db:
+                    due = (await db.execute(select(func.count()).select_from(jobs_table).where(
+                        _due(datetime.utcnow()), jobs_table.c.kind.in_(list(_handlers))
+                    ))).scalar()
+                if not due:
+                    return True
+                self.wake()
+            await asyncio.sleep(0.05)
+        return False
+
+    async def close(self, timeout=10.0):
+        # Jobs still running after timeout keep their lease and are retried once it expires
+        if self._dispatcher is None or self._loop is not asyncio.get_running_loop():
+            self._dispatcher = None
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._dispatcher
+        self._dispatcher = None
+        if self._running:
+            await asyncio.wait(set(self._running), timeout=timeout)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "poll_seconds": self.poll_seconds,
+            "lease_seconds": self.lease.total_seconds(),
+            "handlers": {kind: {"concurrency": registered.concurrency, "max_attempts": registered.max_attempts}
+                         for kind, registered in sorted(_handlers.items())},
+            "running": len(self._running),
+            "outbox": dict(self.outbox),
+            "oldest_pending_seconds": round((datetime.utcnow() - self.oldest_pending).total_seconds(), 3)
+            if self.oldest_pending else None,
+            "enqueued": dict(self.enqueued),
+            "succeeded": dict(self.succeeded),
+            "retried": dict(self.retried),
+            "failed": dict(self.failed),
+            "lost_leases": self.lost_leases,
+            "last_job_seconds": round(self.last_seconds, 6),
+        }
+
+
+queue = JobQueue()
+
+
+# ---------------- Maintenance ----------------
+def retry_failed(db: Session, job_ids=None):
+    # Gives failed jobs a fresh set of attempts
+    query = update(jobs_table).where(jobs_table.c.status == FAILED)
+    if job_ids:
+        query = query.where(jobs_table.c.id.in_(job_ids))
+    count = db.execute(query.values(
+        status=PENDING, attempts=0, run_after=datetime.utcnow(), finished_at=None, updated_at=datetime.utcnow()
+    )).rowcount
+    db.commit()
+    return count
+
+
+def purge(db: Session, days=7):
+    # Done jobs are only history; failed ones stay until retried or looked at
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = db.execute(delete(jobs_table).where(jobs_table.c.status == DONE, jobs_table.c.finished_at < cutoff)).rowcount
+    db.commit()
+    return count
+
+
+def describe(db: Session):
+    return {
+        "by_kind": [
+            dict(row._mapping) for row in db.execute(
+                select(jobs_table.c.kind, jobs_table.c.status, func.count().label("jobs"))
+                .group_by(jobs_table.c.kind, jobs_table.c.status)
+                .order_by(jobs_table.c.kind, jobs_table.c.status)
+            )
+        ],
+        "failed": [
+            {**row._mapping, "finished_at": row.finished_at.isoformat() if row.finished_at else None}
+            for row in db.execute(
+                select(jobs_table.c.id, jobs_table.c.kind, jobs_table.c.attempts, jobs_table.c.last_error,
+                       jobs_table.c.finished_at)
+                .where(jobs_table.c.status == FAILED)
+                .order_by(jobs_table.c.id)
+            )
+        ],
+    }
+
+
+async def run_worker():
+    # A worker without handlers would poll forever and never claim a job
+    if not _handlers:
+        raise RuntimeError("No job handlers registered: import the modules that define them first")
+    queue.start()
+    print(f"✅ Running jobs with {queue.workers} workers for {', '.join(sorted(_handlers))} (Ctrl+C to stop).")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await queue.close()
+
+
+def main(argv):
+    command = argv[0] if argv else "list"
+    if command == "run":
+        queue.workers = int(argv[argv.index("--workers") + 1]) if "--workers" in argv else JOBS_WORKERS or 4
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(run_worker())
+        return 0
+
+    db = SessionLocal()
+    try:
+        if command == "list":
+            print(json.dumps(describe(db), indent=2))
+        elif command == "retry":
+            print(f"✅ {retry_failed(db, [int(job_id) for job_id in argv[1:]])} failed jobs queued again.")
+        elif command == "purge":
+            days = int(argv[argv.index("--days") + 1]) if "--days" in argv else 7
+            print(f"✅ Purged {purge(db, days)} finished jobs.")
+        else:
+            print("Usage: python jobs.py run [--workers N] | list | retry [<job_id> ...] | purge [--days N]")
+            return 2
+    finally:
+        db.close()
+    return 0
+
+
+# Usage (from the app directory):
+#   python jobs.py run [--workers 4]    -> a worker process (e.g. with JOBS_WORKERS=0 on the API)
+#   python jobs.py list                 -> jobs by kind and status, and failed jobs with their last error
+#   python jobs.py retry [<job_id> ...] -> give failed jobs (all of them by default) new attempts
+#   python jobs.py purge [--days 7]     -> delete finished jobs older than that
+if __name__ == "__main__":
+    # Run as a script, this file is __main__: a second copy of the module, not the `jobs`
+    # that handlers register on. Hand over to that one once the handlers are imported.
+    import jobs
+    import bookings  # noqa: F401  (registers its job handlers)
+
+    sys.exit(jobs.main(sys.argv[1:]))
@@ -1,37 +1,98 @@
+import math
+
 from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from routers import users, wallets, points, transactions
+from routers import users, wallets, points, transactions, tours, internal
 
-# ✅ Add these imports
-from database import Base, engine
+import database
 import models  # Make sure all your models are imported here
+import passwords
+import metrics
+import points_buffer
+import jobs
+
+# ✅ The schema is managed by Alembic migrations, run as a separate step before
+# starting workers (see README): importing or creating the app never touches the DB.
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="Vooya Wallet API",
+        description="API for Vooya travel wallet, points system, and transactions",
+        version="1.0.0"
+    )
+
+    # Optional: Allow frontend apps to call your API (adjust origins as needed)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Change "*" to specific frontend URLs in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Per-route latency and SQL query counts, exported at /metrics; engines are
+    # instrumented when they are first built
+    app.add_middleware(metrics.MetricsMiddleware)
+    database.on_engine_created(metrics.instrument_engine)
+
+    # Register routers
+    app.include_router(users.router)
+    app.include_router(wallets.router)
+    app.include_router(points.router)
+    app.include_router(transactions.router)
+    app.include_router(tours.router)
+    app.include_router(internal.router)
+
+    # FastAPI's 422 echoes the rejected input, and Infinity or NaN (which Python's JSON
+    # parser accepts) can't be rendered back as JSON: send those as strings
+    @app.exception_handler(RequestValidationError)
+    async def validation_error(request, error):
+        finite = lambda value: value if math.isfinite(value) else str(value)
+        return JSONResponse(status_code=422,
+                            content={"detail": jsonable_encoder(error.errors(), custom_encoder={float: finite})})
+
+    # Pick up jobs left in the outbox by earlier runs or other processes
+    @app.on_event("startup")
+    async def start_jobs():
+        jobs.queue.start()
+
+    # Commit any earn events still sitting in the buffer
+    @app.on_event("shutdown")
+    async def flush_points_buffer():
+        await points_buffer.buffer.close()
+
+    # Let running jobs finish; unclaimed ones wait in the outbox for the next worker
+    @app.on_event("shutdown")
+    async def stop_jobs():
+        await jobs.queue.close()
+
+    # Stop the password hashing processes with the worker
+    @app.on_event("shutdown")
+    def shutdown_password_pool():
+        passwords.shutdown()
+
+    # Close pooled connections last
+    @app.on_event("shutdown")
+    async def close_engines():
+        await database.dispose_engines()
+
+    # Prometheus metrics
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Health check
+    @app.get("/")
+    def read_root():
+        return {"message": "Vooya Wallet API is live!"}
+
+    return app
+
 
-# ✅ Create tables at startup
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="Vooya Wallet API",
-    description="API for Vooya travel wallet, points system, and transactions",
-    version="1.0.0"
-)
-
-# Optional: Allow frontend apps to call your API (adjust origins as needed)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Change "*" to specific frontend URLs in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Register routers
-app.include_router(users.router)
-app.include_router(wallets.router)
-app.include_router(points.router)
-app.include_router(transactions.router)
-
-# Health check
-@app.get("/")
-def read_root():
-    return {"message": "Vooya Wallet API is live!"}
+# For `uvicorn main:app`; `uvicorn --factory main:create_app` builds a fresh one
+app = create_app()
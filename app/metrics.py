@@ -0,0 +1,222 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+import cache
+import database
+import points_buffer
+import jobs
+
+# Requests issuing more queries than this are counted (and logged) as likely N+1s
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+logger = logging.getLogger("vooya.metrics")
+
+# Per-request query counters; set by the middleware, bumped by the engine events
+_request_stats = contextvars.ContextVar("request_db_stats", default=None)
+
+
+# ---------------- Collectors ----------------
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+
+_lock = threading.Lock()
+_latency = {}        # (method, route) -> Histogram of seconds
+_queries = {}        # (method, route) -> Histogram of queries per request
+_db_seconds = {}     # (method, route) -> total DB time
+_responses = {}      # (method, route, status) -> count
+_n_plus_one = {}     # (method, route) -> requests over N_PLUS_ONE_THRESHOLD
+
+
+def _record_request(method, route, status, seconds, stats):
+    key = (method, route)
+    with _lock:
+        _latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        _queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats["queries"])
+        _db_seconds[key] = _db_seconds.get(key, 0.0) + stats["db_seconds"]
+        _responses[(method, route, status)] = _responses.get((method, route, status), 0) + 1
+        if stats["queries"] > N_PLUS_ONE_THRESHOLD:
+            _n_plus_one[key] = _n_plus_one.get(key, 0) + 1
+    if stats["queries"] > N_PLUS_ONE_THRESHOLD:
+        logger.warning("%s %s issued %d queries (threshold %d)", method, route, stats["queries"], N_PLUS_ONE_THRESHOLD)
+
+
+# ---------------- SQLAlchemy Hooks ----------------
+def instrument_engine(engine):
+    # Accepts a sync Engine or the .sync_engine of an AsyncEngine
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["db_seconds"] += time.perf_counter() - start
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        # after_cursor_execute doesn't fire for failed statements
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+# ---------------- ASGI Middleware ----------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = {"queries": 0, "db_seconds": 0.0}
+        token = _request_stats.set(stats)
+        status = {"code": 500}
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Timed to the last body chunk, so streamed exports count in full
+            route = scope.get("route")
+            _record_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status["code"],
+                time.perf_counter() - start,
+                stats
+            )
+            _request_stats.reset(token)
+
+
+# ---------------- Prometheus Exposition ----------------
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{str(value).replace(chr(34), chr(39))}"' for name, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, histograms):
+    lines = []
+    for (method, route), histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_labels(method=method, route=route, le='+Inf')} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(method=method, route=route)} {histogram.total}")
+        lines.append(f"{name}_count{_labels(method=method, route=route)} {histogram.count}")
+    return lines
+
+
+def render():
+    lines = []
+    with _lock:
+        lines += [
+            "# HELP vooya_http_request_duration_seconds Request latency by route.",
+            "# TYPE vooya_http_request_duration_seconds histogram",
+        ] + _histogram_lines("vooya_http_request_duration_seconds", _latency)
+
+        lines += ["# HELP vooya_http_requests_total Responses by route and status.",
+                  "# TYPE vooya_http_requests_total counter"]
+        for (method, route, status), count in sorted(_responses.items()):
+            lines.append(f"vooya_http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+
+        lines += [
+            "# HELP vooya_db_queries_per_request SQL statements issued per request.",
+            "# TYPE vooya_db_queries_per_request histogram",
+        ] + _histogram_lines("vooya_db_queries_per_request", _queries)
+
+        lines += ["# HELP vooya_db_seconds_total Time spent in SQL statements by route.",
+                  "# TYPE vooya_db_seconds_total counter"]
+        for (method, route), seconds in sorted(_db_seconds.items()):
+            lines.append(f"vooya_db_seconds_total{_labels(method=method, route=route)} {seconds}")
+
+        lines += [f"# HELP vooya_db_n_plus_one_requests_total Requests issuing more than {N_PLUS_ONE_THRESHOLD} queries.",
+                  "# TYPE vooya_db_n_plus_one_requests_total counter"]
+        for (method, route), count in sorted(_n_plus_one.items()):
+            lines.append(f"vooya_db_n_plus_one_requests_total{_labels(method=method, route=route)} {count}")
+
+    pools = {"api": database.async_pool_stats.snapshot(), "scripts": database.sync_pool_stats.snapshot()}
+    for key, metric, kind, help_text in (
+        ("checkouts", "vooya_db_pool_checkouts_total", "counter", "Connections checked out of the pool."),
+        ("wait_total_seconds", "vooya_db_pool_wait_seconds_total", "counter", "Time spent waiting for a pooled connection."),
+        ("timeouts", "vooya_db_pool_timeouts_total", "counter", "Checkouts that timed out."),
+        ("connection_errors", "vooya_db_pool_connection_errors_total", "counter", "Failed connects and disconnects."),
+        ("checked_out", "vooya_db_pool_checked_out", "gauge", "Connections currently in use."),
+        ("overflow_in_use", "vooya_db_pool_overflow_in_use", "gauge", "Connections open beyond pool_size."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for engine_name, stats in pools.items():
+            if key in stats:
+                lines.append(f"{metric}{_labels(engine=engine_name)} {stats[key]}")
+
+    cache_stats = cache.stats()
+    for name in ("hits", "misses"):
+        lines += [f"# HELP vooya_cache_{name}_total Cache {name} by entity kind.",
+                  f"# TYPE vooya_cache_{name}_total counter"]
+        for kind, count in sorted(cache_stats[name].items()):
+            lines.append(f"vooya_cache_{name}_total{_labels(kind=kind)} {count}")
+
+    earn = points_buffer.buffer.stats()
+    for key, metric, kind, help_text in (
+        ("flushes", "vooya_points_buffer_flushes_total", "counter", "Group commits of buffered earn events."),
+        ("events", "vooya_points_buffer_events_total", "counter", "Earn events committed by the buffer."),
+        ("failures", "vooya_points_buffer_failures_total", "counter", "Buffer flushes that failed."),
+        ("pending", "vooya_points_buffer_pending", "gauge", "Earn events waiting for the next flush."),
+        ("last_flush_size", "vooya_points_buffer_last_flush_size", "gauge", "Events in the most recent flush."),
+        ("last_flush_seconds", "vooya_points_buffer_last_flush_seconds", "gauge", "Duration of the most recent flush."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}", f"{metric} {earn[key]}"]
+
+    job_stats = jobs.queue.stats()
+    for name, help_text in (
+        ("enqueued", "Jobs added to the outbox by this process."),
+        ("succeeded", "Jobs finished."),
+        ("retried", "Job attempts that failed and were rescheduled."),
+        ("failed", "Jobs that used up their attempts."),
+    ):
+        lines += [f"# HELP vooya_jobs_{name}_total {help_text}", f"# TYPE vooya_jobs_{name}_total counter"]
+        for kind, count in sorted(job_stats[name].items()):
+            lines.append(f"vooya_jobs_{name}_total{_labels(kind=kind)} {count}")
+    lines += ["# HELP vooya_jobs_outbox Jobs in the outbox by status, as of the last poll.",
+              "# TYPE vooya_jobs_outbox gauge"]
+    for status, count in sorted(job_stats["outbox"].items()):
+        lines.append(f"vooya_jobs_outbox{_labels(status=status)} {count}")
+    lines += ["# HELP vooya_jobs_running Jobs this process is running.", "# TYPE vooya_jobs_running gauge",
+              f"vooya_jobs_running {job_stats['running']}"]
+    if job_stats["oldest_pending_seconds"] is not None:
+        lines += ["# HELP vooya_jobs_oldest_pending_seconds Age of the oldest pending job.",
+                  "# TYPE vooya_jobs_oldest_pending_seconds gauge",
+                  f"vooya_jobs_oldest_pending_seconds {job_stats['oldest_pending_seconds']}"]
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,39 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+import models  # noqa: F401  (registers every table on Base.metadata)
+from database import Base, get_engine, sync_url
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    # `alembic upgrade head --sql`: emit the SQL instead of running it
+    context.configure(
+        url=sync_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    with get_engine().connect() as connection:
+        # render_as_batch: SQLite can only change columns by rebuilding the table
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,68 @@
+"""money in minor units
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 07:57:12.604381
+
+Converts the float major-unit amounts to BigInteger minor units (pesewas,
+cents), rounding each value once. On SQLite every table is rebuilt from its
+reflected definition. Columns that are already integers are left alone.
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONEY_COLUMNS = {
+    'wallets': ['balance'],
+    'transactions': ['amount'],
+    'tours': ['price'],
+    'tour_transactions': ['amount_paid'],
+}
+# money.MINOR_UNIT_SCALE when this migration was written
+MINOR_UNIT_SCALE = 100
+
+
+def _float_columns(table, columns):
+    if context.is_offline_mode():  # --sql: assume nothing was converted yet
+        return columns
+    types = {column['name']: column['type'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+    return [name for name in columns if not isinstance(types[name], sa.Integer)]
+
+
+def _convert(table, columns, type_, existing_type, expression):
+    if op.get_context().dialect.name == 'sqlite':
+        # SQLite can't change a column type in place: set the values, then rebuild
+        # the table from its reflected definition (constraints and indexes included)
+        for name in columns:
+            op.execute(f'UPDATE {table} SET {name} = {expression.format(name=name)}')
+        with op.batch_alter_table(table, recreate='always') as batch_op:
+            for name in columns:
+                batch_op.alter_column(name, type_=type_, existing_type=existing_type)
+    else:
+        for name in columns:
+            op.alter_column(table, name, type_=type_, existing_type=existing_type,
+                            postgresql_using=expression.format(name=name))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, columns in MONEY_COLUMNS.items():
+        pending = _float_columns(table, columns)
+        if pending:
+            _convert(table, pending, sa.BigInteger(), sa.Float(),
+                     f'CAST(ROUND({{name}} * {MINOR_UNIT_SCALE}) AS BIGINT)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, columns in MONEY_COLUMNS.items():
+        _convert(table, columns, sa.Float(), sa.BigInteger(), f'{{name}} / {MINOR_UNIT_SCALE}.0')
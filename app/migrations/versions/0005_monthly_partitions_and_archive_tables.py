@@ -0,0 +1,175 @@
+"""monthly partitions and archive tables
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 08:02:36.689223
+
+On PostgreSQL transactions and points_transactions are rebuilt as tables
+partitioned by month of created_at, and their archive tables are created
+partitioned the same way so partitions.py can move whole months between them.
+The rebuild copies every row: stop the API while it runs. SQLite keeps plain
+tables (partitions.py emulates the months).
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL: table -> (indexes, foreign key), recreated on the rebuilt table
+PARTITIONED_TABLES = {
+    'transactions': (
+        {'ix_transactions_id': 'id',
+         'ix_transactions_wallet_created_id': 'wallet_id, created_at, id',
+         'ix_transactions_created_id': 'created_at, id'},
+        ('wallet_id', 'wallets'),
+    ),
+    'points_transactions': (
+        {'ix_points_transactions_id': 'id'},
+        ('user_id', 'users'),
+    ),
+}
+ARCHIVE_INDEXES = {
+    'transactions_archive': ('ix_transactions_archive_wallet_created_id', 'wallet_id, created_at, id'),
+    'points_transactions_archive': ('ix_points_transactions_archive_user_created_id', 'user_id, created_at, id'),
+}
+MONTHS_AHEAD = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _restore_keys(table, primary_key):
+    indexes, (column, parent) = PARTITIONED_TABLES[table]
+    op.execute(f'ALTER TABLE {table} ADD PRIMARY KEY ({primary_key})')
+    for name, columns in indexes.items():
+        op.execute(f'CREATE INDEX {name} ON {table} ({columns})')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) REFERENCES {parent} (id)')
+
+
+def _partition(table):
+    old = f'{table}_unpartitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)')
+
+    # One partition per month with data through MONTHS_AHEAD from now; the default catches the rest
+    if context.is_offline_mode():  # --sql: existing rows are routed to the default partition
+        first = last = None
+    else:
+        first, last = op.get_bind().execute(sa.text(f'SELECT min(created_at), max(created_at) FROM {old}')).one()
+    now = datetime.utcnow()
+    month = datetime((first or now).year, (first or now).month, 1)
+    end = max(_add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD), last or now)
+    while month <= end:
+        op.execute(f"CREATE TABLE {table}_{month:%Y_%m} PARTITION OF {table} "
+                   f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')")
+        month = _add_months(month, 1)
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {old}')
+    # Unique keys on a partitioned table must include the partition key
+    _restore_keys(table, 'id, created_at')
+
+
+def _unpartition(table):
+    old = f'{table}_partitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {old}')
+    _restore_keys(table, 'id')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    postgres = op.get_bind().dialect.name == 'postgresql'
+
+    # Partition keys cannot be NULL
+    for table in PARTITIONED_TABLES:
+        op.execute(f'UPDATE {table} SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE created_at IS NULL')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at',
+                   existing_type=sa.DateTime(),
+                   nullable=False)
+
+    with op.batch_alter_table('rollup_watermarks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tail_from', sa.DateTime(), nullable=True))
+
+    if postgres:
+        for table in PARTITIONED_TABLES:
+            _partition(table)
+        # Same columns as the hot tables, no defaults or foreign keys; months are attached by partitions.py
+        for archive, (index, columns) in ARCHIVE_INDEXES.items():
+            op.execute(f'CREATE TABLE {archive} (LIKE {archive[:-len("_archive")]}) PARTITION BY RANGE (created_at)')
+            op.execute(f'ALTER TABLE {archive} ADD PRIMARY KEY (id, created_at)')
+            op.execute(f'CREATE INDEX {index} ON {archive} ({columns})')
+        return
+
+    op.create_table('points_transactions_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('activity_type', sa.String(), nullable=True),
+    sa.Column('details', sa.String(), nullable=True),
+    sa.Column('points', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('points_transactions_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_points_transactions_archive_user_created_id', ['user_id', 'created_at', 'id'], unique=False)
+
+    op.create_table('transactions_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('wallet_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.BigInteger(), nullable=True),
+    sa.Column('transaction_type', sa.Enum('credit', 'debit', 'funding', 'points_redeemed', name='transactiontype'), nullable=False),
+    sa.Column('transaction_category', sa.Enum('wallet_funding', 'point_usage', 'tour_booking', 'wallet_transfer', name='transactioncategory'), nullable=False),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_archive_wallet_created_id', ['wallet_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived rows are dropped with the archive tables
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    if postgres:
+        for archive in ARCHIVE_INDEXES:
+            op.execute(f'DROP TABLE {archive}')
+        for table in PARTITIONED_TABLES:
+            _unpartition(table)
+    else:
+        with op.batch_alter_table('transactions_archive', schema=None) as batch_op:
+            batch_op.drop_index('ix_transactions_archive_wallet_created_id')
+
+        op.drop_table('transactions_archive')
+        with op.batch_alter_table('points_transactions_archive', schema=None) as batch_op:
+            batch_op.drop_index('ix_points_transactions_archive_user_created_id')
+
+        op.drop_table('points_transactions_archive')
+
+    with op.batch_alter_table('rollup_watermarks', schema=None) as batch_op:
+        batch_op.drop_column('tail_from')
+
+    for table in PARTITIONED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column('created_at',
+                   existing_type=sa.DateTime(),
+                   nullable=True)
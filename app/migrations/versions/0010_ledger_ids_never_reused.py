@@ -0,0 +1,50 @@
+"""ledger ids never reused
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 08:24:51.370648
+
+SQLite reuses the ids above the highest remaining row, so archiving the newest
+ledger rows handed their ids out again, behind the rollup and reconciliation
+watermarks. transactions and points_transactions are rebuilt with AUTOINCREMENT
+and their sequence starts after the highest id in the table or its archive.
+PostgreSQL sequences never go back: nothing to do there.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LEDGER_TABLES = {
+    'transactions': 'transactions_archive',
+    'points_transactions': 'points_transactions_archive',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for table, archive in LEDGER_TABLES.items():
+        with op.batch_alter_table(table, recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        op.execute(f"DELETE FROM sqlite_sequence WHERE name = '{table}'")
+        op.execute(f"INSERT INTO sqlite_sequence (name, seq) SELECT '{table}', COALESCE(MAX(id), 0) "
+                   f"FROM (SELECT MAX(id) AS id FROM {table} UNION ALL SELECT MAX(id) FROM {archive})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name != 'sqlite':
+        return
+    for table in LEDGER_TABLES:
+        # Rebuilt from the reflected table, which doesn't carry AUTOINCREMENT
+        with op.batch_alter_table(table, recreate='always'):
+            pass
@@ -1,8 +1,8 @@
-from sqlalchemy import CheckConstraint, Column, Integer, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import BigInteger, CheckConstraint, Column, Integer, String, Float, ForeignKey, Date, DateTime, Enum, Index, Numeric, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from enum import Enum as PyEnum
-from app.database import Base
+from database import Base
 
 # Enum for Transaction Type and Category
 class TransactionType(PyEnum):
@@ -15,6 +15,7 @@ class TransactionCategory(PyEnum):
     wallet_funding = "wallet_funding"
     point_usage = "point_usage"
     tour_booking = "tour_booking"
+    wallet_transfer = "wallet_transfer"
 
 # User Model
 class User(Base):
@@ -30,6 +31,7 @@ class User(Base):
     # Relationships
     wallets = relationship("Wallet", back_populates="owner", cascade="all, delete")
     points_transactions = relationship("PointsTransaction", back_populates="user", cascade="all, delete")
+    points_balance = relationship("PointsBalance", back_populates="user", uselist=False, cascade="all, delete")
     tour_transactions = relationship("TourTransaction", back_populates="user", cascade="all, delete")
 
 # Wallet Model
@@ -38,8 +40,9 @@ class Wallet(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    balance = Column(Float, default=0.0)
+    balance = Column(BigInteger, default=0)  # minor units (pesewas/cents); plus its shards when sharded
     currency = Column(String, default="GHS")
+    balance_shards = Column(Integer, nullable=False, default=0, server_default="0")  # 0 = one balance row
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -52,21 +55,149 @@ class Wallet(Base):
         CheckConstraint('balance >= 0', name='check_balance_non_negative'),
     )
 
+# WalletBalanceShard Model (part of a hot wallet's balance; credits spread over the
+# shards so they don't all queue on the wallet row's lock)
+class WalletBalanceShard(Base):
+    __tablename__ = "wallet_balance_shards"
+
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    balance = Column(BigInteger, nullable=False, default=0)  # minor units
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        CheckConstraint('balance >= 0', name='check_shard_balance_non_negative'),
+    )
+
 # Transaction Model
 class Transaction(Base):
     __tablename__ = "transactions"
 
     id = Column(Integer, primary_key=True, index=True)
     wallet_id = Column(Integer, ForeignKey("wallets.id"))
-    amount = Column(Float)
+    amount = Column(BigInteger)  # minor units; negative for debits
     transaction_type = Column(Enum(TransactionType), nullable=False)  # Enum for 'credit' or 'debit'
     transaction_category = Column(Enum(TransactionCategory), nullable=False)  # Enum for categorizing
     status = Column(String, default="pending")  # Add status (e.g., 'pending', 'completed')
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # monthly partition key on PostgreSQL
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     wallet = relationship("Wallet", back_populates="transactions")
 
+    # Keyset pagination indexes: per-wallet listings and the global listing.
+    # sqlite_autoincrement: SQLite would otherwise hand out the ids of archived rows
+    # again, behind the rollup and reconciliation watermarks
+    __table_args__ = (
+        Index("ix_transactions_wallet_created_id", "wallet_id", "created_at", "id"),
+        Index("ix_transactions_created_id", "created_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+# TransactionArchive Model (closed months moved out of transactions by partitions.py)
+class TransactionArchive(Base):
+    __tablename__ = "transactions_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    wallet_id = Column(Integer)  # no foreign key: cold rows never block wallet changes
+    amount = Column(BigInteger)
+    transaction_type = Column(Enum(TransactionType), nullable=False)
+    transaction_category = Column(Enum(TransactionCategory), nullable=False)
+    status = Column(String)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_transactions_archive_wallet_created_id", "wallet_id", "created_at", "id"),
+    )
+
+# WalletDailyTotal Model (per-wallet, per-day rollup of transactions)
+class WalletDailyTotal(Base):
+    __tablename__ = "wallet_daily_totals"
+
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    credit_total = Column(BigInteger, nullable=False, default=0)  # minor units
+    credit_count = Column(Integer, nullable=False, default=0)
+    debit_total = Column(BigInteger, nullable=False, default=0)
+    debit_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# RollupWatermark Model (last transaction id folded into the rollups)
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    name = Column(String, primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    # Every transaction after last_id was created at or after this; lets summaries skip old partitions
+    tail_from = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# WalletReconciliation Model (per-wallet watermark of reconcile.py: the wallet's ledger
+# rows up to last_id sum to ledger_sum)
+class WalletReconciliation(Base):
+    __tablename__ = "wallet_reconciliations"
+
+    wallet_id = Column(Integer, ForeignKey("wallets.id"), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    ledger_sum = Column(BigInteger, nullable=False, default=0)  # minor units
+    difference = Column(BigInteger, nullable=False, default=0)  # balance - ledger at the last check
+    checked_at = Column(DateTime, nullable=False)
+
+# FxRate Model (1 unit of base_currency = rate units of quote_currency, as of a point in time)
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+
+    id = Column(Integer, primary_key=True)
+    base_currency = Column(String(3), nullable=False)
+    quote_currency = Column(String(3), nullable=False)
+    rate = Column(Numeric(18, 8), nullable=False)  # exact decimal, never a float
+    as_of = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Latest rate per pair; history is kept
+    __table_args__ = (
+        Index("ux_fx_rates_pair_as_of", "base_currency", "quote_currency", "as_of", unique=True),
+        CheckConstraint("rate > 0", name="check_fx_rate_positive"),
+    )
+
+# IdempotencyKey Model (stored response of a fund/transfer request, replayed on retry)
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True)
+    scope = Column(String, nullable=False)  # which endpoint the key was used on
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    response = Column(Text, nullable=False)  # JSON body of the original response
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        Index("ux_idempotency_keys_scope_key", "scope", "key", unique=True),
+    )
+
+# OutboxJob Model (work committed with a request and run after it by jobs.py)
+class OutboxJob(Base):
+    __tablename__ = "outbox_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    status = Column(String(16), nullable=False, default="pending")  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_until = Column(DateTime, nullable=True)  # a running job's lease
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Workers look for due jobs by status and time
+    __table_args__ = (
+        Index("ix_outbox_jobs_status_run_after", "status", "run_after"),
+    )
+
 # PointsTransaction Model
 class PointsTransaction(Base):
     __tablename__ = "points_transactions"
@@ -76,20 +207,72 @@ class PointsTransaction(Base):
     activity_type = Column(String)  # 'booking', 'referral', etc.
     details = Column(String, nullable=True)  # Renamed from metadata
     points = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # monthly partition key on PostgreSQL
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     user = relationship("User", back_populates="points_transactions")
 
+    # Ids of archived rows are never handed out again (see Transaction)
+    __table_args__ = {"sqlite_autoincrement": True}
+
+# PointsTransactionArchive Model (closed months moved out of points_transactions by partitions.py)
+class PointsTransactionArchive(Base):
+    __tablename__ = "points_transactions_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer)
+    activity_type = Column(String)
+    details = Column(String, nullable=True)
+    points = Column(Integer)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_points_transactions_archive_user_created_id", "user_id", "created_at", "id"),
+    )
+
+# PointsRule Model (how many points an activity earns; points_rules.py compiles these
+# into an in-memory lookup)
+class PointsRule(Base):
+    __tablename__ = "points_rules"
+
+    id = Column(Integer, primary_key=True)
+    activity_type = Column(String, nullable=False)  # "*" covers activities without a rule of their own
+    base_points = Column(Integer, nullable=False, default=0, server_default="0")
+    points_per_km = Column(Float, nullable=False, default=0, server_default="0")
+    max_points = Column(Integer, nullable=True)  # cap per event
+    valid_from = Column(DateTime, nullable=True)  # open-ended when NULL
+    valid_until = Column(DateTime, nullable=True)  # exclusive
+    description = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        CheckConstraint("base_points >= 0 AND points_per_km >= 0", name="check_points_rule_non_negative"),
+        CheckConstraint("max_points IS NULL OR max_points >= 0", name="check_points_rule_cap"),
+        CheckConstraint("valid_until IS NULL OR valid_from IS NULL OR valid_until > valid_from",
+                        name="check_points_rule_window"),
+    )
+
+# PointsBalance Model (running total, updated with every PointsTransaction)
+class PointsBalance(Base):
+    __tablename__ = "points_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_points = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", back_populates="points_balance")
+
 # Vendor Model
 class Vendor(Base):
     __tablename__ = "vendors"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
-    service_type = Column(String)  # e.g., "tour", "food", etc.
+    service_type = Column(String, index=True)  # e.g., "tour", "food", etc.
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     tours = relationship("Tour", back_populates="vendor")
 
@@ -99,16 +282,22 @@ class Tour(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    location = Column(String)
+    location = Column(String, index=True)
     distance_km = Column(Float)  # Used to calculate points
-    price = Column(Float)
-    vendor_id = Column(Integer, ForeignKey("vendors.id"))
+    price = Column(BigInteger)  # minor units
+    vendor_id = Column(Integer, ForeignKey("vendors.id"), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     vendor = relationship("Vendor", back_populates="tours")
     tour_transactions = relationship("TourTransaction", back_populates="tour")
 
+    # Catalog range filters and sorts; updated_at answers "has the catalog changed?"
+    __table_args__ = (
+        Index("ix_tours_price_id", "price", "id"),
+        Index("ix_tours_distance_id", "distance_km", "id"),
+    )
+
 # TourTransaction Model
 class TourTransaction(Base):
     __tablename__ = "tour_transactions"
@@ -116,7 +305,7 @@ class TourTransaction(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     tour_id = Column(Integer, ForeignKey("tours.id"))
-    amount_paid = Column(Float)
+    amount_paid = Column(BigInteger)  # minor units
     timestamp = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="pending")  # Add status (e.g., 'completed', 'pending')
 
@@ -0,0 +1,29 @@
+from decimal import Decimal, InvalidOperation
+
+# Money is stored as integer minor units (pesewas, cents). Every supported
+# currency (GHS, USD) has two decimal places.
+MINOR_UNIT_SCALE = 100
+# Largest amount a single request may move (10 trillion major units): far below
+# BigInteger's 9.2e18, so adding it to any balance can't overflow the column
+MAX_MINOR = 10**15
+
+
+def to_minor(amount) -> int:
+    # Exact conversion from major units (as sent by clients); anything finer than
+    # one minor unit is rejected rather than rounded.
+    if isinstance(amount, bool):
+        raise ValueError("Invalid amount")
+    try:
+        value = Decimal(str(amount)) * MINOR_UNIT_SCALE
+    except InvalidOperation:
+        raise ValueError("Invalid amount")
+    if not value.is_finite():
+        raise ValueError("Invalid amount")
+    if value != value.to_integral_value():
+        raise ValueError("Amount has more than 2 decimal places")
+    return int(value)
+
+
+def to_major(minor) -> float:
+    # For JSON responses; exact for any balance below 2**53 minor units
+    return int(minor) / MINOR_UNIT_SCALE
@@ -0,0 +1,63 @@
+import base64
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+
+# ---------------- Keyset Cursors ----------------
+# A cursor is the (created_at, id) of the last row on a page, base64-encoded so
+# clients treat it as opaque.
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_keyset(query, created_col, id_col, cursor, limit):
+    # Newest first; (created_at, id) keeps the order stable for equal timestamps
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # The plain upper bound lets PostgreSQL prune newer monthly partitions
+        query = query.filter(created_col <= created_at, or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < row_id)
+        ))
+    return query.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def build_page(rows, limit, created_attr="created_at", id_attr="id"):
+    # apply_keyset fetches one extra row to tell whether another page exists
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_attr), getattr(last, id_attr))
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+# ---------------- Sort-key Cursors ----------------
+# For listings ordered by an arbitrary column: the cursor carries that column's
+# value and the id of the last row.
+def encode_key_cursor(value, row_id: int) -> str:
+    raw = json.dumps([value, row_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_key_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return value, int(row_id)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,236 @@
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, text
+
+import models
+from database import get_engine
+from rollups import WATERMARK_NAME
+
+# On PostgreSQL transactions and points_transactions are partitioned by month of
+# created_at (see migration 0005). SQLite keeps one table per ledger and this module
+# emulates the partitions as month ranges, so the same jobs run in development.
+
+# Empty partitions created ahead of time, so inserts never land in the default partition
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# Full months kept hot before the current one; older months are archived
+ARCHIVE_AFTER_MONTHS = max(int(os.getenv("ARCHIVE_AFTER_MONTHS", "12")), 1)
+# table: move into transactions_archive / points_transactions_archive
+# file: write <table>_<YYYY_MM>.ndjson.gz to ARCHIVE_DIR, then drop the rows
+ARCHIVE_TO = os.getenv("ARCHIVE_TO", "table")
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "archive")
+ARCHIVE_BATCH_SIZE = 5000
+
+# hot table -> cold table
+PARTITIONED_TABLES = {
+    models.Transaction.__table__: models.TransactionArchive.__table__,
+    models.PointsTransaction.__table__: models.PointsTransactionArchive.__table__,
+}
+
+
+# ---------------- Months ----------------
+def month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name, month):
+    return f"{table_name}_{month:%Y_%m}"
+
+
+def _month_range(table, month):
+    return (table.c.created_at >= month) & (table.c.created_at < add_months(month, 1))
+
+
+def _bounds(month):
+    return f"FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+
+
+# ---------------- Partitions ----------------
+def is_partitioned(conn, table_name):
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name"
+    ), {"name": table_name}).first() is not None
+
+
+def _partitions(conn, table_name):
+    # {month: partition name} from the PostgreSQL catalog, read from each partition's
+    # bounds (an archived partition keeps its hot-table name); the default partition is left out
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+    ), {"name": table_name}).all()
+    partitions = {}
+    for name, bound in rows:
+        if bound.startswith("FOR VALUES FROM ('"):  # FOR VALUES FROM ('2026-01-01 00:00:00') TO (...)
+            partitions[month_start(datetime.fromisoformat(bound.split("'")[1]))] = name
+    return partitions
+
+
+def months(conn, table):
+    # Months holding (or, on PostgreSQL, set up to hold) rows of the table
+    if is_partitioned(conn, table.name):
+        return sorted(_partitions(conn, table.name))
+    # Emulated: the distinct months of created_at (stored as ISO text on SQLite)
+    month = func.strftime("%Y-%m", table.c.created_at) if conn.dialect.name == "sqlite" \
+        else func.to_char(table.c.created_at, "YYYY-MM")
+    return [datetime.strptime(value, "%Y-%m")
+            for value in conn.execute(select(month).group_by(month).order_by(month)).scalars()]
+
+
+def ensure_partitions(conn, current):
+    # PostgreSQL only: the current month and PARTITION_MONTHS_AHEAD after it
+    created = []
+    for table in PARTITIONED_TABLES:
+        if not is_partitioned(conn, table.name):
+            continue
+        existing = _partitions(conn, table.name)
+        for offset in range(PARTITION_MONTHS_AHEAD + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                conn.execute(text(
+                    f"CREATE TABLE {partition_name(table.name, month)} PARTITION OF {table.name} "
+                    f"FOR VALUES {_bounds(month)}"
+                ))
+                created.append(partition_name(table.name, month))
+    return created
+
+
+# ---------------- Archival ----------------
+def _json_value(value):
+    if hasattr(value, "value"):  # enum members
+        return value.value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+def _write_file(conn, table, month):
+    # Amounts stay in minor units, exactly as stored
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(ARCHIVE_DIR, f"{partition_name(table.name, month)}.ndjson.gz")
+    query = select(table).where(_month_range(table, month)).order_by(table.c.created_at, table.c.id)
+    result = conn.execution_options(stream_results=True, yield_per=ARCHIVE_BATCH_SIZE).execute(query)
+    with open(path + ".partial", "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as compressed:
+            for rows in result.partitions():
+                compressed.write("".join(
+                    json.dumps(dict(row._mapping), default=_json_value) + "\n" for row in rows
+                ).encode())
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + ".partial", path)
+    return path
+
+
+def archive_month(conn, hot, cold, month, to=ARCHIVE_TO):
+    # Moves one closed month out of the hot table, in the caller's transaction
+    result = {"table": hot.name, "month": f"{month:%Y-%m}", "to": to}
+    if hot is models.Transaction.__table__:
+        # Summaries read archived months from wallet_daily_totals, so only rolled-up rows may leave
+        watermark = select(models.RollupWatermark.last_id)\
+            .where(models.RollupWatermark.name == WATERMARK_NAME).scalar_subquery()
+        unrolled = conn.execute(select(func.count()).select_from(hot).where(
+            _month_range(hot, month), hot.c.id > func.coalesce(watermark, 0)
+        )).scalar()
+        if unrolled:
+            return {**result, "skipped": f"{unrolled} transactions not rolled up yet"}
+
+    if to == "file":
+        result["file"] = _write_file(conn, hot, month)
+
+    # PostgreSQL: the month's partition is detached, then attached to the cold table
+    # (no rows are copied) or dropped once the file is written
+    if is_partitioned(conn, hot.name):
+        name = _partitions(conn, hot.name).get(month)
+        if name is not None:
+            result["partition_rows"] = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            conn.execute(text(f"ALTER TABLE {hot.name} DETACH PARTITION {name}"))
+            if to == "table":
+                conn.execute(text(f"ALTER TABLE {cold.name} ATTACH PARTITION {name} FOR VALUES {_bounds(month)}"))
+            else:
+                conn.execute(text(f"DROP TABLE {name}"))
+            result["partition"] = name
+        elif to == "table":
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(cold.name, month)} PARTITION OF {cold.name} "
+                f"FOR VALUES {_bounds(month)}"
+            ))
+
+    # Rows still in the hot table: all of them on SQLite, default-partition strays on PostgreSQL
+    columns = [column.name for column in cold.columns]
+    if to == "table":
+        conn.execute(insert(cold).from_select(
+            columns, select(*(hot.c[name] for name in columns)).where(_month_range(hot, month))
+        ))
+    moved = conn.execute(delete(hot).where(_month_range(hot, month))).rowcount
+    result["rows_moved"] = result.pop("partition_rows", 0) + moved
+    return result
+
+
+def maintain(to=ARCHIVE_TO, now=None):
+    # Creates upcoming partitions, then archives every month before the hot window,
+    # one month per transaction
+    current = month_start(now or datetime.utcnow())
+    cutoff = add_months(current, -ARCHIVE_AFTER_MONTHS)
+    engine = get_engine()
+    with engine.begin() as conn:
+        report = {"created": ensure_partitions(conn, current), "archived": []}
+        closed = {table: [month for month in months(conn, table) if month < cutoff] for table in PARTITIONED_TABLES}
+    for hot, cold in PARTITIONED_TABLES.items():
+        for month in closed[hot]:
+            with engine.begin() as conn:
+                report["archived"].append(archive_month(conn, hot, cold, month, to))
+    return report
+
+
+def describe():
+    with get_engine().connect() as conn:
+        return {
+            table.name: {
+                "partitioned": is_partitioned(conn, table.name),
+                "months": {
+                    f"{month:%Y-%m}": conn.execute(
+                        select(func.count()).select_from(table).where(_month_range(table, month))
+                    ).scalar()
+                    for month in months(conn, table)
+                },
+            }
+            for table in (*PARTITIONED_TABLES, *PARTITIONED_TABLES.values())
+        }
+
+
+# Usage (from the app directory):
+#   python partitions.py list                     -> months and row counts, hot and archived
+#   python partitions.py maintain [--to file]     -> create upcoming partitions, archive closed months
+# Run maintain at least monthly (e.g. daily from cron).
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        print(json.dumps(describe(), indent=2))
+    elif command == "maintain":
+        to = sys.argv[sys.argv.index("--to") + 1] if "--to" in sys.argv else ARCHIVE_TO
+        if to not in ("table", "file"):
+            print(f"Unknown archive target: {to}")
+            sys.exit(2)
+        report = maintain(to)
+        for name in report["created"]:
+            print(f"✅ Created partition {name}")
+        for entry in report["archived"]:
+            if "skipped" in entry:
+                print(f"⏭️  {entry['table']} {entry['month']}: {entry['skipped']}")
+            else:
+                print(f"✅ Archived {entry['table']} {entry['month']} to {entry.get('file', entry['to'])} "
+                      f"({entry['rows_moved']} rows moved)")
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(2)
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# bcrypt work factor; raising it makes existing hashes "need update" so they are
+# rehashed transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes dedicated to hashing (0 = hash on the event loop's default thread pool)
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+# Hash/verify jobs allowed in flight before new ones are rejected
+PASSWORD_MAX_PENDING = int(os.getenv("PASSWORD_MAX_PENDING", str(max(PASSWORD_WORKERS, 1) * 8)))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+# ---------------- Worker Functions (run in the pool processes) ----------------
+def _hash(password):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password, hashed):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+# ---------------- Bounded Process Pool ----------------
+_executor = None
+_pending = 0
+
+
+def _get_executor():
+    global _executor
+    if _executor is None and PASSWORD_WORKERS > 0:
+        _executor = ProcessPoolExecutor(max_workers=PASSWORD_WORKERS)
+    return _executor
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_MAX_PENDING:
+        raise PasswordPoolBusy()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password):
+    return await _submit(_hash, password)
+
+
+async def verify_password(password, hashed):
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an old work factor
+    return await _submit(_verify_and_update, password, hashed)
+
+
+def pending():
+    return _pending
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,128 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+
+from database import AsyncSessionLocal
+import points_ledger
+
+# Flush when this many earn events are waiting, or when the oldest has waited WINDOW_MS
+POINTS_BUFFER_MAX_BATCH = int(os.getenv("POINTS_BUFFER_MAX_BATCH", "500"))
+POINTS_BUFFER_WINDOW_MS = float(os.getenv("POINTS_BUFFER_WINDOW_MS", "20"))
+# wait: respond after the batch is committed; async: respond once the event is queued
+POINTS_EARN_DURABILITY = os.getenv("POINTS_EARN_DURABILITY", "wait")
+
+logger = logging.getLogger("vooya.points_buffer")
+
+
+# ---------------- Group-commit Buffer ----------------
+class EarnBuffer:
+    def __init__(self, max_batch=POINTS_BUFFER_MAX_BATCH, window_ms=POINTS_BUFFER_WINDOW_MS):
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._pending = []   # (event, future or None)
+        self._timer = None
+        self._flush_lock = None
+        self._tasks = set()
+        self.flushes = 0
+        self.events = 0
+        self.failures = 0
+        self.last_size = 0
+        self.max_size = 0
+        self.last_seconds = 0.0
+        self.total_seconds = 0.0
+
+    async def add(self, events, wait=True):
+        # events: list of (user_id, points, activity_type, details).
+        # With wait=True, returns {user_id: total_points} once the batch holding them commits.
+        loop = asyncio.get_running_loop()
+        futures = []
+        for event in events:
+            future = loop.create_future() if wait else None
+            self._pending.append((event, future))
+            if future is not None:
+                futures.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._spawn_flush)
+
+        if not wait:
+            return None
+        totals = {}
+        for (user_id, _, _, _), total in zip(events, await asyncio.gather(*futures)):
+            totals[user_id] = total
+        return totals
+
+    def _spawn_flush(self):
+        # A fresh context: the flush must not count its queries against the request
+        # (metrics._request_stats) that happened to fill the batch
+        task = asyncio.get_running_loop().create_task(self.flush(), context=contextvars.Context())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        # One flush at a time keeps balance-row locking simple and ordered
+        async with self._flush_lock:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            if self._pending and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(0, self._spawn_flush)
+            if not batch:
+                return
+
+            start = time.perf_counter()
+            try:
+                async with AsyncSessionLocal() as db:
+                    totals = await db.run_sync(points_ledger.add_points_batch, [event for event, _ in batch])
+                    await db.commit()
+            except Exception as e:
+                self.failures += 1
+                logger.exception("Flushing %d points earn events failed", len(batch))
+                for _, future in batch:
+                    if future is not None and not future.done():
+                        future.set_exception(e)
+                return
+
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.events += len(batch)
+            self.last_size = len(batch)
+            self.max_size = max(self.max_size, len(batch))
+            self.last_seconds = elapsed
+            self.total_seconds += elapsed
+            for (user_id, _, _, _), future in batch:
+                if future is not None and not future.done():
+                    future.set_result(totals[user_id])
+
+    async def close(self):
+        while self._pending:
+            await self.flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "durability": POINTS_EARN_DURABILITY,
+            "max_batch": self.max_batch,
+            "window_ms": self.window * 1000,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "events": self.events,
+            "failures": self.failures,
+            "last_flush_size": self.last_size,
+            "max_flush_size": self.max_size,
+            "avg_flush_size": round(self.events / self.flushes, 2) if self.flushes else 0.0,
+            "last_flush_seconds": round(self.last_seconds, 6),
+            "avg_flush_seconds": round(self.total_seconds / self.flushes, 6) if self.flushes else 0.0,
+        }
+
+
+buffer = EarnBuffer()
@@ -0,0 +1,179 @@
+import sys
+
+from sqlalchemy import bindparam, exc, func, insert, select, union_all, update
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+balances_table = models.PointsBalance.__table__
+# A balance is the sum of the user's ledger rows, hot and archived (partitions.py moves
+# closed months to the archive). Rows archived to files (ARCHIVE_TO=file) can't be read.
+LEDGER_TABLES = (models.PointsTransaction.__table__, models.PointsTransactionArchive.__table__)
+
+
+# ---------------- Running Balance ----------------
+def get_balance_row(db: Session, user_id: int, for_update: bool = False):
+    query = db.query(models.PointsBalance).filter(models.PointsBalance.user_id == user_id)
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+
+def _move_balance(db: Session, user_id: int, delta: int):
+    # Relative update, so concurrent writers can't lose each other's points (SQLite ignores
+    # FOR UPDATE). A debit only applies while the balance covers it: returns None otherwise.
+    update_balance = update(balances_table)\
+        .where(balances_table.c.user_id == user_id)\
+        .values(total_points=balances_table.c.total_points + delta)\
+        .returning(balances_table.c.total_points)
+    if delta < 0:
+        update_balance = update_balance.where(balances_table.c.total_points >= -delta)
+    total_points = db.execute(update_balance).scalar()
+    if total_points is not None or delta < 0:
+        return total_points
+
+    # The user's first points: create the row, or add to the one a concurrent writer just created
+    try:
+        with db.begin_nested():
+            db.execute(insert(balances_table).values(user_id=user_id, total_points=delta))
+        return delta
+    except exc.IntegrityError:
+        return db.execute(update_balance).scalar()
+
+
+def add_points(db: Session, user_id: int, points: int, activity_type: str, details=None):
+    # Insert the ledger row and move the running balance in the same DB transaction.
+    # Returns the new total, or None (nothing written) when a debit exceeds the balance.
+    # The caller commits.
+    total_points = _move_balance(db, user_id, points)
+    if total_points is None:
+        return None
+    db.execute(insert(models.PointsTransaction).values(
+        user_id=user_id, activity_type=activity_type, details=details, points=points
+    ))
+    return total_points
+
+
+def _ensure_balance_rows(db: Session, user_ids):
+    # Create the missing balance rows at 0 in one insert (a user's first points)
+    existing = set(db.scalars(select(balances_table.c.user_id).where(balances_table.c.user_id.in_(user_ids))))
+    missing = [user_id for user_id in user_ids if user_id not in existing]
+    if not missing:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(balances_table), [{"user_id": user_id, "total_points": 0} for user_id in missing])
+    except exc.IntegrityError:
+        # A concurrent writer created one of them first: insert the rest
+        _ensure_balance_rows(db, user_ids)
+
+
+def add_points_batch(db: Session, events):
+    # events: list of (user_id, points, activity_type, details), all earns. A fixed number
+    # of statements however many users: one executemany moves every balance, one select
+    # reads the totals back and one multi-row insert writes the ledger. The caller commits.
+    deltas = {}
+    for user_id, points, _, _ in events:
+        deltas[user_id] = deltas.get(user_id, 0) + points
+    user_ids = sorted(deltas)
+
+    _ensure_balance_rows(db, user_ids)
+    # Balance rows are updated in user id order so concurrent batches can't deadlock
+    db.execute(
+        update(balances_table)
+        .where(balances_table.c.user_id == bindparam("balance_user_id"))
+        .values(total_points=balances_table.c.total_points + bindparam("delta")),
+        [{"balance_user_id": user_id, "delta": deltas[user_id]} for user_id in user_ids]
+    )
+    # The updated rows stay locked until commit, so these are this batch's totals
+    totals = dict(db.execute(
+        select(balances_table.c.user_id, balances_table.c.total_points).where(balances_table.c.user_id.in_(user_ids))
+    ).all())
+
+    db.execute(insert(models.PointsTransaction), [
+        {"user_id": user_id, "activity_type": activity_type, "details": details, "points": points}
+        for user_id, points, activity_type, details in events
+    ])
+    return totals
+
+
+# ---------------- Ledger Sums ----------------
+def _ledger_sums():
+    # user_id, ledger_points over every ledger table
+    rows = union_all(*(select(table.c.user_id, table.c.points) for table in LEDGER_TABLES)).subquery()
+    return select(
+        rows.c.user_id.label("user_id"),
+        func.coalesce(func.sum(rows.c.points), 0).label("ledger_points")
+    ).group_by(rows.c.user_id)
+
+
+# ---------------- Backfill ----------------
+def backfill_balances(db: Session):
+    # One-time rebuild of points_balances from the full points ledger
+    totals = db.execute(_ledger_sums()).all()
+
+    db.query(models.PointsBalance).delete()
+    db.add_all([models.PointsBalance(user_id=user_id, total_points=total) for user_id, total in totals])
+    db.commit()
+    return len(totals)
+
+
+# ---------------- Consistency Check ----------------
+def find_drift(db: Session):
+    # Compare every stored balance against the ledger sum in one grouped query.
+    ledger = _ledger_sums().subquery()
+
+    stored = func.coalesce(models.PointsBalance.total_points, 0)
+    summed = func.coalesce(ledger.c.ledger_points, 0)
+
+    missing_rows = db.query(ledger.c.user_id, summed, stored)\
+        .outerjoin(models.PointsBalance, models.PointsBalance.user_id == ledger.c.user_id)\
+        .filter(stored != summed)
+    orphan_rows = db.query(models.PointsBalance.user_id, summed, stored)\
+        .outerjoin(ledger, ledger.c.user_id == models.PointsBalance.user_id)\
+        .filter(ledger.c.user_id.is_(None), stored != 0)
+
+    return [
+        {"user_id": user_id, "ledger_points": ledger_points, "stored_points": stored_points}
+        for user_id, ledger_points, stored_points in missing_rows.union(orphan_rows).all()
+    ]
+
+
+def repair_drift(db: Session, drift):
+    for row in drift:
+        balance_row = get_balance_row(db, row["user_id"], for_update=True)
+        if balance_row is None:
+            balance_row = models.PointsBalance(user_id=row["user_id"])
+            db.add(balance_row)
+        balance_row.total_points = row["ledger_points"]
+    db.commit()
+
+
+# Usage (from the app directory):
+#   python points_ledger.py backfill        -> rebuild every balance from the ledger
+#   python points_ledger.py check [--fix]   -> report (and optionally repair) drift; run periodically
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "check"
+    db = SessionLocal()
+    try:
+        if command == "backfill":
+            count = backfill_balances(db)
+            print(f"✅ Backfilled points balances for {count} users.")
+        elif command == "check":
+            drift = find_drift(db)
+            if not drift:
+                print("✅ Points balances match the ledger.")
+            else:
+                for row in drift:
+                    print(f"❌ user {row['user_id']}: ledger={row['ledger_points']} stored={row['stored_points']}")
+                if "--fix" in sys.argv:
+                    repair_drift(db, drift)
+                    print(f"✅ Repaired {len(drift)} balances.")
+                else:
+                    sys.exit(1)
+        else:
+            print(f"Unknown command: {command}")
+            sys.exit(2)
+    finally:
+        db.close()
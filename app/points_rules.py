@@ -0,0 +1,213 @@
+import asyncio
+import csv
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# How often a worker checks whether another process changed the points rules
+POINTS_RULES_REFRESH_SECONDS = float(os.getenv("POINTS_RULES_REFRESH_SECONDS", "30"))
+
+# Rules for this activity apply to activities with no active rule of their own
+DEFAULT_ACTIVITY = "*"
+
+# What migration 0007 seeds: the points the API awarded before rules existed
+DEFAULT_RULES = [
+    {"activity_type": DEFAULT_ACTIVITY, "base_points": 10, "points_per_km": 0, "max_points": None,
+     "valid_from": None, "valid_until": None, "description": "Default for activities without a rule"},
+    {"activity_type": "tour_booking", "base_points": 0, "points_per_km": 1, "max_points": 1000,
+     "valid_from": None, "valid_until": None, "description": "Points per km of tour distance"},
+]
+RULE_FIELDS = ("activity_type", "base_points", "points_per_km", "max_points", "valid_from", "valid_until", "description")
+
+
+# ---------------- Rule Set ----------------
+# An event earns the sum of every rule for its activity that is valid at the event's time,
+# so a promotion is one more row with a window. Each rule gives
+# base_points + points_per_km * distance_km, rounded down and capped at max_points.
+class RuleSet:
+    def __init__(self, rules, stamp, version):
+        self.stamp = stamp
+        self.version = version  # of invalidate() calls when built
+        self.checked_at = time.monotonic()
+        self.size = len(rules)
+        # activity -> tuple of (valid_from, valid_until, base_points, points_per_km, max_points),
+        # with open window ends filled in so evaluating is plain comparisons
+        by_activity = {}
+        for rule in rules:
+            by_activity.setdefault(rule["activity_type"], []).append((
+                rule["valid_from"] or datetime.min,
+                rule["valid_until"] or datetime.max,
+                rule["base_points"],
+                rule["points_per_km"],
+                rule["max_points"],
+            ))
+        self.by_activity = {activity: tuple(compiled) for activity, compiled in by_activity.items()}
+        self.default = self.by_activity.get(DEFAULT_ACTIVITY, ())
+
+    @staticmethod
+    def _apply(rules, distance_km, at):
+        # None when no rule is valid at `at`
+        if distance_km is not None and not (math.isfinite(distance_km) and distance_km >= 0):
+            raise ValueError(f"Invalid distance_km: {distance_km}")
+        total = None
+        for valid_from, valid_until, base_points, points_per_km, max_points in rules:
+            if valid_from <= at < valid_until:
+                points = max(int(base_points + points_per_km * (distance_km or 0)), 0)
+                if max_points is not None:
+                    points = min(points, max_points)
+                total = (total or 0) + points
+        return total
+
+    def points(self, activity_type, distance_km=None, at=None):
+        at = at or datetime.utcnow()
+        total = self._apply(self.by_activity.get(activity_type, ()), distance_km, at)
+        if total is None:
+            total = self._apply(self.default, distance_km, at)
+        return total or 0
+
+    def points_batch(self, events, at=None):
+        # events: (activity_type, distance_km) pairs, all evaluated at one time
+        at = at or datetime.utcnow()
+        return [self.points(activity_type, distance_km, at) for activity_type, distance_km in events]
+
+
+_rules = None
+# Bumped by invalidate(). Rules built from an earlier version are out of date, even when
+# the invalidate arrived while their rebuild was already reading the database.
+_version = 0
+_lock = None
+builds = 0
+
+
+async def _stamp(db):
+    # Changes whenever a rule is added, edited or removed
+    return tuple((await db.execute(
+        select(func.count(), func.max(models.PointsRule.updated_at)).select_from(models.PointsRule)
+    )).one())
+
+
+async def get_rules(db):
+    global _rules, _lock, builds
+    if _rules is not None and _rules.version == _version and time.monotonic() - _rules.checked_at < POINTS_RULES_REFRESH_SECONDS:
+        return _rules
+    if _lock is None:
+        _lock = asyncio.Lock()
+
+    async with _lock:
+        if _rules is not None and _rules.version == _version and time.monotonic() - _rules.checked_at < POINTS_RULES_REFRESH_SECONDS:
+            return _rules
+        version = _version
+        stamp = await _stamp(db)
+        if _rules is not None and stamp == _rules.stamp:
+            _rules.checked_at = time.monotonic()
+            _rules.version = version
+            return _rules
+        rows = (await db.execute(select(*(getattr(models.PointsRule, field) for field in RULE_FIELDS)))).all()
+        _rules = RuleSet([dict(row._mapping) for row in rows], stamp, version)
+        builds += 1
+        return _rules
+
+
+def invalidate():
+    global _version
+    _version += 1
+
+
+# Changes committed through this process recompile the rules on the next read
+@event.listens_for(Session, "after_flush")
+def _note_rule_changes(session, flush_context):
+    if any(isinstance(obj, models.PointsRule) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info["points_rules_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session):
+    if session.info.pop("points_rules_changed", False):
+        invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop("points_rules_changed", None)
+
+
+# ---------------- Rule File ----------------
+def read_rules_file(path):
+    # CSV with a header: activity_type,base_points,points_per_km,max_points,valid_from,valid_until[,description]
+    # Empty cells mean 0 for points, no cap, and an open window.
+    rules = []
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            cell = lambda name: (row.get(name) or "").strip()
+            try:
+                rule = {
+                    "activity_type": cell("activity_type"),
+                    "base_points": int(cell("base_points") or 0),
+                    "points_per_km": float(cell("points_per_km") or 0),
+                    "max_points": int(cell("max_points")) if cell("max_points") else None,
+                    "valid_from": datetime.fromisoformat(cell("valid_from")) if cell("valid_from") else None,
+                    "valid_until": datetime.fromisoformat(cell("valid_until")) if cell("valid_until") else None,
+                    "description": cell("description") or None,
+                }
+            except ValueError:
+                raise ValueError(f"{path}:{line}: invalid number or date")
+            if not rule["activity_type"]:
+                raise ValueError(f"{path}:{line}: activity_type is required")
+            if rule["base_points"] < 0 or rule["points_per_km"] < 0 or (rule["max_points"] or 0) < 0:
+                raise ValueError(f"{path}:{line}: points must not be negative")
+            if rule["valid_from"] and rule["valid_until"] and rule["valid_until"] <= rule["valid_from"]:
+                raise ValueError(f"{path}:{line}: valid_until must be after valid_from")
+            rules.append(rule)
+    return rules
+
+
+def replace_rules(db: Session, rules):
+    # The file becomes the whole rule set, in one transaction
+    db.execute(delete(models.PointsRule))
+    if rules:
+        now = datetime.utcnow()
+        db.execute(insert(models.PointsRule), [{**rule, "created_at": now, "updated_at": now} for rule in rules])
+    db.commit()
+    return len(rules)
+
+
+def stats():
+    return {
+        "refresh_seconds": POINTS_RULES_REFRESH_SECONDS,
+        "rules": _rules.size if _rules is not None else None,
+        "activities": sorted(_rules.by_activity) if _rules is not None else None,
+        "stale": _rules is None or _rules.version != _version,
+        "builds": builds,
+    }
+
+
+# Usage (from the app directory):
+#   python points_rules.py list              -> print the rules
+#   python points_rules.py load rules.csv    -> replace every rule with the file's
+#   CSV header: activity_type,base_points,points_per_km,max_points,valid_from,valid_until[,description]
+#   e.g. tour_booking,50,0,,2026-12-01T00:00:00,2027-01-01T00:00:00,December booking bonus
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    db = SessionLocal()
+    try:
+        if command == "list":
+            rows = db.execute(select(*(getattr(models.PointsRule, field) for field in RULE_FIELDS))
+                              .order_by(models.PointsRule.activity_type, models.PointsRule.id)).all()
+            for row in rows:
+                print(json.dumps(dict(row._mapping), default=str))
+        elif command == "load" and len(sys.argv) == 3:
+            print(f"✅ Loaded {replace_rules(db, read_rules_file(sys.argv[2]))} points rules.")
+        else:
+            print("Usage: python points_rules.py list | load <rules.csv>")
+            sys.exit(2)
+    finally:
+        db.close()
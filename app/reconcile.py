@@ -0,0 +1,203 @@
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import bindparam, case, func, insert, select, union_all, update
+from sqlalchemy.orm import Session
+
+import models
+from balances import shard_sum
+from database import SessionLocal
+from rollups import GRACE_PERIOD
+
+# Processes checking wallet id ranges at once (1: everything in this process)
+RECONCILE_WORKERS = int(os.getenv("RECONCILE_WORKERS", str(os.cpu_count() or 1)))
+# Wallet ids per unit of work handed to a process
+RECONCILE_CHUNK_SIZE = int(os.getenv("RECONCILE_CHUNK_SIZE", "50000"))
+
+# Every wallet's balance (its row plus its shards) must equal the sum of its ledger rows,
+# hot and archived. Each wallet keeps a watermark: the sum of its rows up to last_id,
+# so a run only reads rows added since the previous one. Rows archived to files
+# (ARCHIVE_TO=file) before their first reconciliation can't be read and show as differences.
+wallets_table = models.Wallet.__table__
+watermarks_table = models.WalletReconciliation.__table__
+LEDGER_TABLES = (models.Transaction.__table__, models.TransactionArchive.__table__)
+
+
+# ---------------- Settled Horizon ----------------
+def settled_id(db: Session):
+    # The watermark only moves up to rows older than the grace period, so transactions
+    # still in flight (lower ids committed late) are read again next time, like the rollup
+    ledger = models.Transaction.__table__
+    return db.execute(
+        select(func.max(ledger.c.id)).where(ledger.c.created_at < datetime.utcnow() - GRACE_PERIOD)
+    ).scalar() or 0
+
+
+def wallet_chunks(db: Session, chunk_size=RECONCILE_CHUNK_SIZE):
+    low, high = db.execute(select(func.min(wallets_table.c.id), func.max(wallets_table.c.id))).one()
+    if low is None:
+        return []
+    return [(start, min(start + chunk_size, high + 1)) for start in range(low, high + 1, chunk_size)]
+
+
+# ---------------- One Chunk ----------------
+def _check_query(low, high, floor, upper):
+    # One statement, so balances, shards and ledger rows come from the same snapshot
+    # while transfers keep committing
+    new_rows = union_all(*(
+        select(table.c.wallet_id, table.c.id, table.c.amount)
+        .where(table.c.id > floor, table.c.wallet_id >= low, table.c.wallet_id < high)
+        for table in LEDGER_TABLES
+    )).subquery()
+    new = select(
+        new_rows.c.wallet_id,
+        func.count().label("new_rows"),
+        func.sum(new_rows.c.amount).label("new_sum"),
+        func.sum(case((new_rows.c.id <= upper, new_rows.c.amount), else_=0)).label("settled_sum"),
+    ).select_from(
+        new_rows.outerjoin(watermarks_table, watermarks_table.c.wallet_id == new_rows.c.wallet_id)
+    ).where(
+        new_rows.c.id > func.coalesce(watermarks_table.c.last_id, 0)
+    ).group_by(new_rows.c.wallet_id).subquery()
+
+    return select(
+        wallets_table.c.id,
+        (wallets_table.c.balance + shard_sum(wallets_table.c.id)).label("balance"),
+        watermarks_table.c.last_id,
+        watermarks_table.c.ledger_sum,
+        new.c.new_rows,
+        new.c.new_sum,
+        new.c.settled_sum,
+    ).select_from(
+        wallets_table
+        .outerjoin(watermarks_table, watermarks_table.c.wallet_id == wallets_table.c.id)
+        .outerjoin(new, new.c.wallet_id == wallets_table.c.id)
+    ).where(wallets_table.c.id >= low, wallets_table.c.id < high)
+
+
+def reconcile_chunk(low, high, upper):
+    # Checks wallets [low, high) and moves their watermarks to `upper`.
+    # Runs in a pool process: it opens its own session and returns plain data.
+    db = SessionLocal()
+    try:
+        # Rows at or below every wallet's watermark are never read
+        floor = db.execute(
+            select(func.min(func.coalesce(watermarks_table.c.last_id, 0)))
+            .select_from(wallets_table.outerjoin(watermarks_table, watermarks_table.c.wallet_id == wallets_table.c.id))
+            .where(wallets_table.c.id >= low, wallets_table.c.id < high)
+        ).scalar() or 0
+        rows = db.execute(_check_query(low, high, floor, upper)).all()
+
+        now = datetime.utcnow()
+        updates, inserts, mismatches = [], [], []
+        scanned = 0
+        for row in rows:
+            ledger = int(row.ledger_sum or 0) + int(row.new_sum or 0)
+            difference = int(row.balance) - ledger
+            scanned += row.new_rows or 0
+            if difference:
+                mismatches.append({"wallet_id": row.id, "balance": int(row.balance), "ledger": ledger,
+                                   "difference": difference})
+            watermark = {
+                "key": row.id,
+                "last_id": max(row.last_id or 0, upper),
+                "ledger_sum": int(row.ledger_sum or 0) + int(row.settled_sum or 0),
+                "difference": difference,
+                "checked_at": now,
+            }
+            (updates if row.last_id is not None else inserts).append(watermark)
+
+        if updates:
+            db.execute(
+                update(watermarks_table).where(watermarks_table.c.wallet_id == bindparam("key")).values(
+                    last_id=bindparam("last_id"), ledger_sum=bindparam("ledger_sum"),
+                    difference=bindparam("difference"), checked_at=bindparam("checked_at")
+                ),
+                updates
+            )
+        if inserts:
+            db.execute(insert(watermarks_table), [
+                {"wallet_id": watermark.pop("key"), **watermark} for watermark in inserts
+            ])
+        db.commit()
+        return {"wallets": len(rows), "rows": scanned, "mismatches": mismatches}
+    finally:
+        db.close()
+
+
+# ---------------- Whole Run ----------------
+def run(workers=RECONCILE_WORKERS, chunk_size=RECONCILE_CHUNK_SIZE):
+    # One run at a time: two runs would both move the same watermarks
+    start = time.perf_counter()
+    db = SessionLocal()
+    try:
+        upper = settled_id(db)
+        chunks = wallet_chunks(db, chunk_size)
+    finally:
+        db.close()
+
+    if workers > 1 and len(chunks) > 1:
+        # spawn: each process builds its own engine instead of inheriting pooled connections
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(reconcile_chunk, *zip(*[(low, high, upper) for low, high in chunks])))
+    else:
+        results = [reconcile_chunk(low, high, upper) for low, high in chunks]
+
+    mismatches = sorted((mismatch for result in results for mismatch in result["mismatches"]),
+                        key=lambda mismatch: mismatch["wallet_id"])
+    return {
+        "checked_at": datetime.utcnow().isoformat(),
+        "watermark": upper,
+        "chunks": len(chunks),
+        "workers": min(workers, len(chunks)) if chunks else 0,
+        "wallets": sum(result["wallets"] for result in results),
+        "rows_scanned": sum(result["rows"] for result in results),
+        "seconds": round(time.perf_counter() - start, 3),
+        "mismatches": mismatches,
+    }
+
+
+def current_mismatches(db: Session):
+    # Wallets whose last check found a difference
+    return [dict(row._mapping) for row in db.execute(
+        select(watermarks_table.c.wallet_id, watermarks_table.c.difference, watermarks_table.c.checked_at)
+        .where(watermarks_table.c.difference != 0)
+        .order_by(watermarks_table.c.wallet_id)
+    )]
+
+
+# Usage (from the app directory):
+#   python reconcile.py run [--workers 8] [--chunk-size 50000] [--report report.json]
+#       -> check every wallet against the ledger rows added since the last run; exits 1 on mismatches
+#   python reconcile.py mismatches   -> wallets whose last check found a difference
+# Run it nightly (e.g. from cron), one run at a time.
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    option = lambda name, default: sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+    if command == "run":
+        report = run(int(option("--workers", RECONCILE_WORKERS)), int(option("--chunk-size", RECONCILE_CHUNK_SIZE)))
+        if "--report" in sys.argv:
+            with open(option("--report", None), "w") as f:
+                json.dump(report, f, indent=2)
+        print(f"{'❌' if report['mismatches'] else '✅'} Checked {report['wallets']} wallets "
+              f"({report['rows_scanned']} new ledger rows, {report['chunks']} chunks on {report['workers']} workers) "
+              f"in {report['seconds']}s: {len(report['mismatches'])} mismatches.")
+        for mismatch in report["mismatches"][:20]:
+            print(f"   wallet {mismatch['wallet_id']}: balance {mismatch['balance']} != ledger {mismatch['ledger']} "
+                  f"({mismatch['difference']:+d})")
+        sys.exit(1 if report["mismatches"] else 0)
+    elif command == "mismatches":
+        db = SessionLocal()
+        try:
+            print(json.dumps(current_mismatches(db), indent=2, default=str))
+        finally:
+            db.close()
+    else:
+        print("Usage: python reconcile.py run [--workers N] [--chunk-size N] [--report file.json] | mismatches")
+        sys.exit(2)
@@ -0,0 +1,203 @@
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import DateTime, case, func, literal, union_all
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+from fx import DEFAULT_CURRENCY
+
+WATERMARK_NAME = "wallet_daily_totals"
+BATCH_SIZE = 50000
+# Rows younger than this stay in the tail, so transactions still in flight
+# (lower ids committed late) are not skipped by the watermark.
+GRACE_PERIOD = timedelta(minutes=1)
+# How much earlier than the newest rolled-up row a later transaction may be stamped
+# (clock skew between workers, long transactions). Summaries read the tail only from
+# there on, so PostgreSQL skips every older monthly partition.
+TAIL_SLACK = timedelta(hours=1)
+EPOCH = datetime(1970, 1, 1)
+
+
+def _is_credit():
+    return models.Transaction.transaction_type == models.TransactionType.credit
+
+
+def _is_debit():
+    return models.Transaction.transaction_type == models.TransactionType.debit
+
+
+def _as_date(value):
+    # func.date() returns a string on SQLite and a date on PostgreSQL
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+# ---------------- Watermark ----------------
+def watermark_query(db: Session, column=models.RollupWatermark.last_id):
+    return db.query(column)\
+        .filter(models.RollupWatermark.name == WATERMARK_NAME)\
+        .scalar_subquery()
+
+
+def get_watermark(db: Session, for_update: bool = False):
+    query = db.query(models.RollupWatermark).filter(models.RollupWatermark.name == WATERMARK_NAME)
+    if for_update:
+        query = query.with_for_update()
+    watermark = query.first()
+    if watermark is None:
+        watermark = models.RollupWatermark(name=WATERMARK_NAME, last_id=0)
+        db.add(watermark)
+        db.flush()
+    return watermark
+
+
+# ---------------- Incremental Rollup ----------------
+def roll_up(db: Session, batch_size: int = BATCH_SIZE):
+    # Fold transactions newer than the watermark into wallet_daily_totals.
+    # Each batch commits the rollup rows and the new watermark together.
+    cutoff = datetime.utcnow() - GRACE_PERIOD
+    rolled = 0
+    while True:
+        watermark = get_watermark(db, for_update=True)
+        # The next batch_size settled rows by id, not a fixed id window: an id gap
+        # wider than the batch (deletes, sequence jumps) must not stall the watermark
+        batch = db.query(models.Transaction.id).filter(
+            models.Transaction.id > watermark.last_id,
+            models.Transaction.created_at < cutoff
+        ).order_by(models.Transaction.id).limit(batch_size).subquery()
+        upper = db.query(func.max(batch.c.id)).scalar()
+        if upper is None:
+            db.commit()
+            return rolled
+
+        day = func.date(models.Transaction.created_at)
+        groups = db.query(
+            models.Transaction.wallet_id,
+            day,
+            func.coalesce(func.sum(case((_is_credit(), models.Transaction.amount), else_=0)), 0),
+            func.count(case((_is_credit(), 1))),
+            func.coalesce(func.sum(case((_is_debit(), models.Transaction.amount), else_=0)), 0),
+            func.count(case((_is_debit(), 1)))
+        ).filter(
+            models.Transaction.id > watermark.last_id,
+            models.Transaction.id <= upper
+        ).group_by(models.Transaction.wallet_id, day).all()
+
+        for wallet_id, txn_day, credit_total, credit_count, debit_total, debit_count in groups:
+            row = db.get(models.WalletDailyTotal, (wallet_id, _as_date(txn_day)))
+            if row is None:
+                row = models.WalletDailyTotal(
+                    wallet_id=wallet_id, day=_as_date(txn_day),
+                    credit_total=0, credit_count=0, debit_total=0, debit_count=0
+                )
+                db.add(row)
+            row.credit_total += int(credit_total)
+            row.credit_count += credit_count
+            row.debit_total += int(debit_total)
+            row.debit_count += debit_count
+
+        newest = db.query(func.max(models.Transaction.created_at)).filter(
+            models.Transaction.id > watermark.last_id,
+            models.Transaction.id <= upper
+        ).scalar()
+        watermark.last_id = upper
+        watermark.tail_from = max(watermark.tail_from or EPOCH, newest - TAIL_SLACK)
+        db.commit()
+        rolled += len(groups)
+
+
+# ---------------- Summaries ----------------
+def _summary_query(db: Session, wallet_filter, date_from, date_to, group_by=()):
+    # Rolled-up days plus the unrolled tail, in a single round trip.
+    # wallet_filter is applied to both halves (e.g. Wallet.id == x or Wallet.user_id == x);
+    # group_by columns (of Wallet) split the totals, e.g. per currency.
+    keys = [column.label(f"key_{i}") for i, column in enumerate(group_by)]
+    rolled = db.query(
+        *keys,
+        func.coalesce(func.sum(models.WalletDailyTotal.credit_total), 0).label("credit_total"),
+        func.coalesce(func.sum(models.WalletDailyTotal.credit_count), 0).label("credit_count"),
+        func.coalesce(func.sum(models.WalletDailyTotal.debit_total), 0).label("debit_total"),
+        func.coalesce(func.sum(models.WalletDailyTotal.debit_count), 0).label("debit_count")
+    ).join(models.Wallet, models.Wallet.id == models.WalletDailyTotal.wallet_id).filter(wallet_filter)
+    if date_from:
+        rolled = rolled.filter(models.WalletDailyTotal.day >= date_from)
+    if date_to:
+        rolled = rolled.filter(models.WalletDailyTotal.day <= date_to)
+
+    tail = db.query(
+        *keys,
+        func.coalesce(func.sum(case((_is_credit(), models.Transaction.amount), else_=0)), 0),
+        func.count(case((_is_credit(), 1))),
+        func.coalesce(func.sum(case((_is_debit(), models.Transaction.amount), else_=0)), 0),
+        func.count(case((_is_debit(), 1)))
+    ).join(models.Wallet, models.Wallet.id == models.Transaction.wallet_id).filter(
+        wallet_filter,
+        models.Transaction.id > func.coalesce(watermark_query(db), literal(0)),
+        models.Transaction.created_at >= func.coalesce(
+            watermark_query(db, models.RollupWatermark.tail_from), literal(EPOCH, DateTime)
+        )
+    )
+    if date_from:
+        tail = tail.filter(models.Transaction.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        tail = tail.filter(models.Transaction.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if keys:
+        rolled, tail = rolled.group_by(*group_by), tail.group_by(*group_by)
+
+    parts = union_all(rolled.statement, tail.statement).subquery()
+    part_keys = [parts.c[key.name] for key in keys]
+    return db.query(
+        *part_keys,
+        func.coalesce(func.sum(parts.c.credit_total), 0),
+        func.coalesce(func.sum(parts.c.credit_count), 0),
+        func.coalesce(func.sum(parts.c.debit_total), 0),
+        func.coalesce(func.sum(parts.c.debit_count), 0)
+    ).group_by(*part_keys)
+
+
+def _summary(credit_total, credit_count, debit_total, debit_count):
+    # SUM(bigint) comes back as Decimal on PostgreSQL
+    credit_total, credit_count, debit_total, debit_count = map(int, (credit_total, credit_count, debit_total, debit_count))
+    return {
+        "total_credits": credit_total,
+        "total_debits": debit_total,
+        "credit_count": credit_count,
+        "debit_count": debit_count,
+        "current_balance": credit_total + debit_total
+    }
+
+
+def summarize(db: Session, wallet_filter, date_from: date = None, date_to: date = None):
+    return _summary(*_summary_query(db, wallet_filter, date_from, date_to).one())
+
+
+def summarize_by_currency(db: Session, wallet_filter, date_from: date = None, date_to: date = None):
+    # {currency: summary in that currency's minor units}, from one grouped query;
+    # currencies without activity in the range are left out
+    currency = func.coalesce(models.Wallet.currency, DEFAULT_CURRENCY)
+    rows = _summary_query(db, wallet_filter, date_from, date_to, group_by=(currency,)).all()
+    summaries = {}
+    for row_currency, *totals in rows:
+        summary = _summary(*totals)
+        if summary["credit_count"] or summary["debit_count"]:
+            summaries[row_currency] = summary
+    return summaries
+
+
+# Usage (from the app directory):
+#   python rollups.py            -> roll up once (e.g. every minute from cron)
+#   python rollups.py --every 60 -> keep rolling up every 60 seconds
+# Until it runs, summaries read every transaction from the unrolled tail.
+if __name__ == "__main__":
+    interval = int(sys.argv[sys.argv.index("--every") + 1]) if "--every" in sys.argv else None
+    while True:
+        db = SessionLocal()
+        try:
+            print(f"✅ Rolled up {roll_up(db)} wallet-days.")
+        finally:
+            db.close()
+        if interval is None:
+            break
+        time.sleep(interval)
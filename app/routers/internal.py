@@ -0,0 +1,66 @@
+from fastapi import APIRouter
+
+import database
+import cache
+import catalog
+import fx
+import balances
+import points_buffer
+import points_rules
+import jobs
+
+router = APIRouter(
+    prefix="/internal",
+    tags=["Internal"],
+    include_in_schema=False
+)
+
+# ---------------- Connection Pool Stats ----------------
+@router.get("/pool")
+def pool_stats():
+    return {
+        "settings": {
+            "pool_size": database.DB_POOL_SIZE,
+            "max_overflow": database.DB_MAX_OVERFLOW,
+            "pool_timeout": database.DB_POOL_TIMEOUT,
+            "pool_recycle": database.DB_POOL_RECYCLE,
+            "pool_pre_ping": database.DB_POOL_PRE_PING,
+        },
+        "api": database.async_pool_stats.snapshot(),
+        "scripts": database.sync_pool_stats.snapshot(),
+    }
+
+# ---------------- Cache Stats ----------------
+@router.get("/cache")
+def cache_stats():
+    return cache.stats()
+
+# ---------------- Points Earn Buffer ----------------
+@router.get("/points-buffer")
+def points_buffer_stats():
+    return points_buffer.buffer.stats()
+
+# ---------------- Tour Catalog Snapshot ----------------
+@router.get("/catalog")
+def catalog_stats():
+    return catalog.stats()
+
+# ---------------- FX Rate Cache ----------------
+@router.get("/fx")
+def fx_stats():
+    return fx.stats()
+
+# ---------------- Sharded Wallet Balances ----------------
+@router.get("/balances")
+def balance_shard_stats():
+    return balances.stats()
+
+# ---------------- Points Rules ----------------
+@router.get("/points-rules")
+def points_rules_stats():
+    return points_rules.stats()
+
+# ---------------- Background Jobs ----------------
+@router.get("/jobs")
+def job_stats():
+    return jobs.queue.stats()
@@ -1,74 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException, Path
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models, schemas
-from database import get_db
+from bookings import BOOKING_ACTIVITY
+from database import get_async_db
+import points_ledger
+import points_buffer
+import points_rules
+import cache
 
 router = APIRouter(
     prefix="/points",
     tags=["Points"]
 )
 
+MAX_BATCH_EARN_EVENTS = 1000
+# Awarded by the server from its own data (a booking's tour distance), never by clients
+SERVER_AWARDED_ACTIVITIES = {BOOKING_ACTIVITY}
+
 @router.get("/points")
 def get_points():
     return{"message": "You have redeemed your points"}
 
 # ---------------- Earn Points ----------------
-@router.post("/earn")
-def earn_points(earn: schemas.EarnPoints, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == earn.user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+def _should_wait(wait: Optional[bool]):
+    if wait is not None:
+        return wait
+    return points_buffer.POINTS_EARN_DURABILITY != "async"
 
-    earned_points = 10  # You can make this dynamic based on activity_type
 
-    points_txn = models.PointsTransaction(
-        user_id=earn.user_id,
-        activity_type=earn.activity_type,
-        metadata=earn.metadata,
-        points=earned_points
-    )
+def _check_activities(earns):
+    refused = sorted({earn.activity_type for earn in earns} & SERVER_AWARDED_ACTIVITIES)
+    if refused:
+        raise HTTPException(status_code=400, detail=f"Points for {refused} are awarded by the server")
 
-    db.add(points_txn)
-    db.commit()
 
-    total = db.query(func.sum(models.PointsTransaction.points)).filter_by(user_id=earn.user_id).scalar() or 0
+# Earn events go through the group-commit buffer: one insert + commit per flush
+@router.post("/earn")
+async def earn_points(earn: schemas.EarnPoints, response: Response, wait: Optional[bool] = None,
+                      db: AsyncSession = Depends(get_async_db)):
+    _check_activities([earn])
+    user = await cache.get_user(db, earn.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    return {"message": f"{earned_points} points earned", "total_points": total}
+    # Points come from the cached rules (see points_rules.py), not from a query per event
+    rules = await points_rules.get_rules(db)
+    points = rules.points(earn.activity_type, earn.distance_km)
+    event = (earn.user_id, points, earn.activity_type, earn.metadata)
+    # The flush commits on its own connection: hand this request's back to the pool first,
+    # or a burst of waiting requests can hold every connection the flush needs
+    await db.close()
+    if not _should_wait(wait):
+        await points_buffer.buffer.add([event], wait=False)
+        response.status_code = 202
+        return {"message": f"{points} points queued", "points_earned": points}
+
+    totals = await points_buffer.buffer.add([event])
+    return {"message": f"{points} points earned", "points_earned": points, "total_points": totals[earn.user_id]}
+
+
+@router.post("/earn/batch")
+async def earn_points_batch(batch: schemas.EarnPointsBatch, response: Response, wait: Optional[bool] = None,
+                            db: AsyncSession = Depends(get_async_db)):
+    if not batch.events:
+        raise HTTPException(status_code=400, detail="No earn events given")
+    if len(batch.events) > MAX_BATCH_EARN_EVENTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_EARN_EVENTS} earn events per batch")
+    _check_activities(batch.events)
+
+    # One lookup for every user in the batch, so a bad id can't fail the whole flush
+    user_ids = {earn.user_id for earn in batch.events}
+    found = set((await db.execute(select(models.User.id).where(models.User.id.in_(user_ids)))).scalars())
+    if user_ids - found:
+        raise HTTPException(status_code=404, detail=f"Users not found: {sorted(user_ids - found)}")
+
+    # Every event is evaluated against the same rules at the same time
+    rules = await points_rules.get_rules(db)
+    points = rules.points_batch([(earn.activity_type, earn.distance_km) for earn in batch.events])
+    events = [(earn.user_id, earned, earn.activity_type, earn.metadata) for earn, earned in zip(batch.events, points)]
+    await db.close()  # as in earn_points: don't hold a connection while the flush needs one
+    if not _should_wait(wait):
+        await points_buffer.buffer.add(events, wait=False)
+        response.status_code = 202
+        return {"message": f"{len(events)} earn events queued", "points_earned": sum(points)}
+
+    totals = await points_buffer.buffer.add(events)
+    return {
+        "message": f"{len(events)} earn events recorded",
+        "points_earned": sum(points),
+        "total_points": {str(user_id): total for user_id, total in sorted(totals.items())},
+    }
 
 
 # ---------------- Redeem Points ----------------
 @router.post("/redeem")
-def redeem_points(redeem: schemas.RedeemPoints, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == redeem.user_id).first()
+async def redeem_points(redeem: schemas.RedeemPoints, db: AsyncSession = Depends(get_async_db)):
+    user = await cache.get_user(db, redeem.user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    total_points = db.query(func.sum(models.PointsTransaction.points)).filter_by(user_id=redeem.user_id).scalar() or 0
-
-    if total_points < redeem.points:
+    # The debit only applies while the balance covers it, so concurrent redeems can't overdraw
+    total_points = await db.run_sync(points_ledger.add_points, redeem.user_id, -redeem.points, "redeem", redeem.reward_type)
+    if total_points is None:
         raise HTTPException(status_code=400, detail="Not enough points")
+    await db.commit()
 
-    redemption = models.PointsTransaction(
-        user_id=redeem.user_id,
-        activity_type="redeem",
-        metadata=redeem.reward_type,
-        points=-redeem.points
-    )
-
-    db.add(redemption)
-    db.commit()
-
-    return {"message": f"{redeem.points} points redeemed for {redeem.reward_type}", "remaining_points": total_points - redeem.points}
+    return {"message": f"{redeem.points} points redeemed for {redeem.reward_type}", "remaining_points": total_points}
 
 
 # ---------------- Check Points Balance ----------------
 @router.get("/balance/{user_id}")
-def get_points_balance(user_id: int = Path(..., description="User ID"), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+async def get_points_balance(user_id: int = Path(..., description="User ID"), db: AsyncSession = Depends(get_async_db)):
+    balance = await db.get(models.PointsBalance, user_id)
+    if balance:
+        return {"user_id": user_id, "total_points": balance.total_points}
+
+    user = await cache.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-
-    total_points = db.query(func.sum(models.PointsTransaction.points)).filter_by(user_id=user_id).scalar() or 0
-    return {"user_id": user_id, "total_points": total_points}
+    return {"user_id": user_id, "total_points": 0}
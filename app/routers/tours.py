@@ -0,0 +1,71 @@
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import schemas
+from database import get_async_db
+import bookings
+import catalog
+import cache
+import money
+import idempotency
+
+router = APIRouter(
+    prefix="/tours",
+    tags=["Tours"]
+)
+
+# ---------------- Tour Catalog ----------------
+# Served from the in-memory catalog snapshot; the database is only read to rebuild it
+@router.get("/", response_model=schemas.TourPage)
+async def list_tours(
+    location: Optional[str] = None,
+    vendor_id: Optional[int] = None,
+    service_type: Optional[str] = None,
+    min_price: Optional[schemas.Price] = None,
+    max_price: Optional[schemas.Price] = None,
+    min_distance: Optional[float] = None,
+    max_distance: Optional[float] = None,
+    sort: Literal["name", "-name", "price", "-price", "distance", "-distance"] = "name",
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await catalog.search(
+        db, sort, cursor, limit, location=location, vendor_id=vendor_id, service_type=service_type,
+        min_price=min_price, max_price=max_price, min_distance=min_distance, max_distance=max_distance
+    )
+
+# ---------------- Book Tour ----------------
+# Debit, booking record, ledger row and points award (or its job) commit together or not at all
+@router.post("/{tour_id}/book")
+async def book_tour(
+    tour_id: int,
+    booking: schemas.TourBooking,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    tour = await cache.get_tour(db, tour_id)
+    if not tour:
+        raise HTTPException(status_code=404, detail="Tour not found")
+    if tour["price"] is None:
+        raise HTTPException(status_code=400, detail="Tour is not open for booking")
+
+    async def apply():
+        result = await bookings.book_tour(db, tour, booking.user_id, booking.wallet_id)
+        return {
+            "message": "Tour booked successfully",
+            "booking_id": result["booking_id"],
+            "tour_id": tour_id,
+            "amount_paid": money.to_major(tour["price"]),
+            "wallet_balance": money.to_major(result["new_balance"]),
+            "points_earned": result["points_earned"],
+            "total_points": result["total_points"],
+        }
+
+    payload = {"tour_id": tour_id, **booking.model_dump()}
+    body = await idempotency.run(db, "tour_booking", idempotency_key, payload, apply, response)
+    await cache.invalidate("wallet", booking.wallet_id)
+    return body
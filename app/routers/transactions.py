@@ -1,10 +1,21 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models, schemas
-from database import get_db
+from database import get_async_db
+from pagination import apply_keyset
+import rollups
+import exports
+import transfers
+import cache
+import money
+import idempotency
+import fx
+from serialization import TRANSACTION_COLUMNS, transaction_page
 
 router = APIRouter(
     prefix="/transactions",
@@ -12,187 +23,210 @@ router = APIRouter(
 )
 
 @router.get("/transactions")
-def get_transactions():
+def get_transactions_placeholder():
     return{"message": "Your Transactions here"}
 
-# ---------------- Get All Transactions for a Wallet ----------------
-@router.get("/wallet/{wallet_id}", response_model=list[schemas.TransactionOut])
-def get_wallet_transactions(wallet_id: int, db: Session = Depends(get_db)):
-    transactions = db.query(models.Transaction).filter(models.Transaction.wallet_id == wallet_id).all()
-    if not transactions:
-        raise HTTPException(status_code=404, detail="No transactions found for this wallet")
-    return transactions
-
-from fastapi import Query
-
-# ---------------- Get Transactions by Wallet ----------------
-@router.get("/wallet/{wallet_id}")
-def get_transactions_by_wallet(wallet_id: int, db: Session = Depends(get_db)):
-    wallet = db.query(models.Wallet).filter(models.Wallet.id == wallet_id).first()
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-
-    transactions = db.query(models.Transaction).filter(models.Transaction.wallet_id == wallet_id).all()
-    return {"wallet_id": wallet_id, "transactions": transactions}
-
-@router.get("/user/{user_id}")
-def get_transactions_by_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Get all wallets owned by the user
-    wallets = db.query(models.Wallet).filter(models.Wallet.user_id == user_id).all()
-    wallet_ids = [wallet.id for wallet in wallets]
-
-    if not wallet_ids:
-        return {"user_id": user_id, "transactions": []}
-
-    # Fetch all transactions for those wallets
-    transactions = db.query(models.Transaction).filter(models.Transaction.wallet_id.in_(wallet_ids)).all()
-    return {"user_id": user_id, "transactions": transactions}
-
-
-# ---------------- Get Single Transaction ----------------
-@router.get("/{transaction_id}", response_model=schemas.TransactionOut)
-def get_transactions(transaction_id: int, db: Session = Depends(get_db)):
-    txn = db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
-    if not txn:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    return txn
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-
-import models, schemas
-from database import get_db
-
-router = APIRouter(
-    prefix="/transactions",
-    tags=["Transactions"]
-)
-
 # ---------------- Wallet Transfer ----------------
 @router.post("/transfer")
-def transfer_funds(
+async def transfer_funds(
     from_wallet_id: int,
     to_wallet_id: int,
-    amount: float,
-    db: Session = Depends(get_db)
+    amount: schemas.Amount,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def apply():
+        balances = await transfers.apply_transfers(db, [(from_wallet_id, to_wallet_id, amount)])
+        return {
+            "message": "Transfer successful",
+            "from_wallet_balance": money.to_major(balances[from_wallet_id]),
+            "to_wallet_balance": money.to_major(balances[to_wallet_id])
+        }
+
+    payload = {"from_wallet_id": from_wallet_id, "to_wallet_id": to_wallet_id, "amount": amount}
+    body = await idempotency.run(db, "transfer", idempotency_key, payload, apply, response)
+    await cache.invalidate("wallet", from_wallet_id, to_wallet_id)
+    return body
+
+# ---------------- Batch Wallet Transfer ----------------
+@router.post("/transfer/batch")
+async def transfer_funds_batch(
+    batch: schemas.BatchTransfer,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    if from_wallet_id == to_wallet_id:
-        raise HTTPException(status_code=400, detail="Cannot transfer to the same wallet")
+    if not batch.transfers:
+        raise HTTPException(status_code=400, detail="No transfers given")
+    if len(batch.transfers) > transfers.MAX_BATCH_TRANSFERS:
+        raise HTTPException(status_code=400, detail=f"At most {transfers.MAX_BATCH_TRANSFERS} transfers per batch")
+
+    async def apply():
+        balances = await transfers.apply_transfers(
+            db, [(t.from_wallet_id, t.to_wallet_id, t.amount) for t in batch.transfers]
+        )
+        return {
+            "message": "Batch transfer successful",
+            "transfers": len(batch.transfers),
+            "balances": {str(wallet_id): money.to_major(balance) for wallet_id, balance in balances.items()}
+        }
+
+    body = await idempotency.run(db, "transfer_batch", idempotency_key, batch.model_dump(), apply, response)
+    await cache.invalidate("wallet", *{wallet_id for t in batch.transfers for wallet_id in (t.from_wallet_id, t.to_wallet_id)})
+    return body
 
-    from_wallet = db.query(models.Wallet).filter(models.Wallet.id == from_wallet_id).first()
-    to_wallet = db.query(models.Wallet).filter(models.Wallet.id == to_wallet_id).first()
+# ---------------- Transaction Summary by Wallet ----------------
+def _summary_out(summary):
+    # Sums are exact integer minor units; convert only for the response
+    return {key: money.to_major(value) if key.endswith(("_credits", "_debits", "_balance")) and value is not None
+            else value for key, value in summary.items()}
 
-    if not from_wallet or not to_wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
+@router.get("/summary/wallet/{wallet_id}")
+async def transaction_summary_by_wallet(
+    wallet_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    summary = await db.run_sync(rollups.summarize, models.Wallet.id == wallet_id, date_from, date_to)
 
-    if from_wallet.balance < amount:
-        raise HTTPException(status_code=400, detail="Insufficient funds in sender's wallet")
+    # Only an empty summary needs to tell "no activity" apart from "no wallet"
+    if not summary["credit_count"] and not summary["debit_count"]:
+        wallet = await cache.get_wallet(db, wallet_id)
+        if not wallet:
+            raise HTTPException(status_code=404, detail="Wallet not found")
 
-    # Perform transfer
-    from_wallet.balance -= amount
-    to_wallet.balance += amount
+    return {"wallet_id": wallet_id, **_summary_out(summary)}
 
-    # Record transactions
-    db.add(models.Transaction(wallet_id=from_wallet_id, amount=-amount, transaction_type="debit"))
-    db.add(models.Transaction(wallet_id=to_wallet_id, amount=amount, transaction_type="credit"))
+# ---------------- Transaction Summary by User ----------------
+# Totals are kept per wallet currency (one grouped query) and converted to the
+# reporting currency with the cached FX rates. Without a rate the converted totals
+# are null, unless ?currency= asked for that conversion (then 400).
+@router.get("/summary/user/{user_id}")
+async def transaction_summary_by_user(
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    currency: Optional[str] = Query(None, min_length=3, max_length=3),
+    db: AsyncSession = Depends(get_async_db)
+):
+    requested = currency is not None
+    currency = (currency or fx.FX_REPORTING_CURRENCY).upper()
+    by_currency = await db.run_sync(rollups.summarize_by_currency, models.Wallet.user_id == user_id, date_from, date_to)
 
-    db.commit()
+    if not by_currency:
+        user = await cache.get_user(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
 
+    rates = await fx.get_rates(db) if set(by_currency) - {currency} else None
+    summary, used = fx.convert_summaries(by_currency, currency, rates, required=requested)
     return {
-        "message": "Transfer successful",
-        "from_wallet_balance": from_wallet.balance,
-        "to_wallet_balance": to_wallet.balance
+        "user_id": user_id,
+        "currency": currency,
+        **_summary_out(summary),
+        "by_currency": {code: _summary_out(totals) for code, totals in sorted(by_currency.items())},
+        "fx_rates": {code: float(rate) for code, rate in sorted(used.items()) if code != currency},
     }
-# ---------------- Transaction Summary by Wallet ----------------
-@router.get("/summary/wallet/{wallet_id}")
-def transaction_summary_by_wallet(wallet_id: int, db: Session = Depends(get_db)):
-    wallet = db.query(models.Wallet).filter(models.Wallet.id == wallet_id).first()
+
+# ---------------- Export Transactions by Wallet ----------------
+@router.get("/export/wallet/{wallet_id}")
+async def export_transactions_by_wallet(
+    wallet_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    wallet = await cache.get_wallet(db, wallet_id)
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
 
-    # Total credit (sum of all credit transactions)
-    total_credits = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.wallet_id == wallet_id,
-        models.Transaction.transaction_type == "credit"
-    ).scalar() or 0
-
-    # Total debit (sum of all debit transactions)
-    total_debits = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.wallet_id == wallet_id,
-        models.Transaction.transaction_type == "debit"
-    ).scalar() or 0
-
-    # Current balance (credit - debit)
-    current_balance = total_credits + total_debits
-
-    return {
-        "wallet_id": wallet_id,
-        "total_credits": total_credits,
-        "total_debits": total_debits,
-        "current_balance": current_balance
-    }
-# ---------------- Transaction Summary by User ----------------
-@router.get("/summary/user/{user_id}")
-def transaction_summary_by_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    # Get all wallets owned by the user
-    wallets = db.query(models.Wallet).filter(models.Wallet.user_id == user_id).all()
-    wallet_ids = [wallet.id for wallet in wallets]
-
-    if not wallet_ids:
-        return {"user_id": user_id, "total_credits": 0, "total_debits": 0, "current_balance": 0}
-
-    # Total credits (sum of all credit transactions across all wallets)
-    total_credits = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.wallet_id.in_(wallet_ids),
-        models.Transaction.transaction_type == "credit"
-    ).scalar() or 0
-
-    # Total debits (sum of all debit transactions across all wallets)
-    total_debits = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.wallet_id.in_(wallet_ids),
-        models.Transaction.transaction_type == "debit"
-    ).scalar() or 0
-
-    # Current balance (credit - debit)
-    current_balance = total_credits + total_debits
-    
-    # ---------------- Paginated Transactions by User ----------------
-@router.get("/user/{user_id}", response_model=List[schemas.TransactionOut])
-def get_transactions_by_user(user_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    query = exports.export_query(models.Wallet.id == wallet_id, date_from, date_to)
+    return StreamingResponse(
+        exports.stream_export(query, format),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="wallet_{wallet_id}_transactions.{format}"'}
+    )
+
+# ---------------- Export Transactions by User ----------------
+@router.get("/export/user/{user_id}")
+async def export_transactions_by_user(
+    user_id: int,
+    format: Literal["csv", "ndjson"] = "csv",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    user = await cache.get_user(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # Get all wallets owned by the user
-    wallets = db.query(models.Wallet).filter(models.Wallet.user_id == user_id).all()
-    wallet_ids = [wallet.id for wallet in wallets]
-
-    if not wallet_ids:
-        return []
+    query = exports.export_query(models.Wallet.user_id == user_id, date_from, date_to)
+    return StreamingResponse(
+        exports.stream_export(query, format),
+        media_type=exports.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="user_{user_id}_transactions.{format}"'}
+    )
+
+# ---------------- Paginated Transactions by Wallet ----------------
+@router.get("/wallet/{wallet_id}", response_model=schemas.TransactionPage)
+async def get_transactions_by_wallet(
+    wallet_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = select(*TRANSACTION_COLUMNS).where(models.Transaction.wallet_id == wallet_id)
+    query = apply_keyset(query, models.Transaction.created_at, models.Transaction.id, cursor, limit)
+    transactions = (await db.execute(query)).all()
+
+    if not transactions and not cursor:
+        wallet = await cache.get_wallet(db, wallet_id)
+        if not wallet:
+            raise HTTPException(status_code=404, detail="Wallet not found")
+
+    return transaction_page(transactions, limit)
+
+# ---------------- Paginated Transactions by User ----------------
+@router.get("/user/{user_id}", response_model=schemas.TransactionPage)
+async def get_transactions_by_user(
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # One indexed query across all of the user's wallets, newest first
+    query = select(*TRANSACTION_COLUMNS)\
+        .join(models.Wallet, models.Wallet.id == models.Transaction.wallet_id)\
+        .where(models.Wallet.user_id == user_id)
+    query = apply_keyset(query, models.Transaction.created_at, models.Transaction.id, cursor, limit)
+    transactions = (await db.execute(query)).all()
 
-    # Fetch paginated transactions for those wallets
-    transactions = db.query(models.Transaction).filter(models.Transaction.wallet_id.in_(wallet_ids))\
-        .offset(skip).limit(limit).all()
+    # Only an empty first page needs to tell "no transactions" apart from "no user"
+    if not transactions and not cursor:
+        user = await cache.get_user(db, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
 
-    return transactions
+    return transaction_page(transactions, limit)
 
 # ---------------- Paginated Transactions ----------------
-@router.get("/", response_model=List[schemas.TransactionOut])
-def get_transactions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    transactions = db.query(models.Transaction).offset(skip).limit(limit).all()
-    return transactions
+@router.get("/", response_model=schemas.TransactionPage)
+async def get_transactions(
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db)
+):
+    query = apply_keyset(select(*TRANSACTION_COLUMNS), models.Transaction.created_at, models.Transaction.id, cursor, limit)
+    transactions = (await db.execute(query)).all()
+    return transaction_page(transactions, limit)
 
-    return {
-        "user_id": user_id,
-        "total_credits": total_credits,
-        "total_debits": total_debits,
-        "current_balance": current_balance
-    }
+# ---------------- Get Single Transaction ----------------
+@router.get("/{transaction_id}", response_model=schemas.TransactionOut)
+async def get_transaction(transaction_id: int, db: AsyncSession = Depends(get_async_db)):
+    txn = await db.get(models.Transaction, transaction_id)
+    if not txn:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+    return txn
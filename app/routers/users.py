@@ -1,78 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import exc, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
-from database import get_db
+from database import get_async_db
 import models, schemas
+import passwords
+import balances
+from serialization import TRANSACTION_COLUMNS
 
 router = APIRouter(
     prefix="/users",
     tags=["Users"]
 )
 
-@router.get("/users")
-def get_users():
-    return{"message": "Here are the users"}
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _busy(detail):
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": "1"}
+    )
 
 
-# ---------------- Register User ----------------
-@router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
+def _password_pool_busy():
+    return _busy("Too many login attempts in progress, please retry")
 
-    hashed_password = pwd_context.hash(user.password)
-    new_user = models.User(name=user.name, email=user.email, password=hashed_password)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    return new_user
 
+def _db_pool_busy():
+    return _busy("Too many requests waiting for the database, please retry")
 
-# ---------------- Login User ----------------
-@router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.password):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return {"message": "Login successful", "user_id": db_user.id}
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-
-from database import get_db
-import models, schemas
-
-router = APIRouter(
-    prefix="/users",
-    tags=["Users"]
-)
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt takes far longer than the queries around it, so both handlers hand their
+# connection back to the pool before hashing and only check one out again to write.
+# Otherwise a burst of logins holds every pooled connection while it waits on the hash.
 
 # ---------------- Register User ----------------
 @router.post("/register", response_model=schemas.UserOut)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        existing_user = (await db.execute(select(models.User.id).where(models.User.email == user.email))).first()
+    except exc.TimeoutError:
+        raise _db_pool_busy()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
+    await db.close()
 
-    hashed_password = pwd_context.hash(user.password)
+    try:
+        hashed_password = await passwords.hash_password(user.password)
+    except passwords.PasswordPoolBusy:
+        raise _password_pool_busy()
     new_user = models.User(name=user.name, email=user.email, password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        await db.commit()
+    except exc.IntegrityError:
+        # Registered by a concurrent request while this one was hashing
+        raise HTTPException(status_code=400, detail="Email already registered")
+    except exc.TimeoutError:
+        raise _db_pool_busy()
+    await db.refresh(new_user)
     return new_user
 
 
 # ---------------- Login User ----------------
 @router.post("/login")
-def login(user: schemas.UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.password):
+async def login(user: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    try:
+        db_user = (await db.execute(
+            select(models.User.id, models.User.password).where(models.User.email == user.email)
+        )).first()
+    except exc.TimeoutError:
+        raise _db_pool_busy()
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    await db.close()
+
+    try:
+        valid, new_hash = await passwords.verify_password(user.password, db_user.password)
+    except passwords.PasswordPoolBusy:
+        raise _password_pool_busy()
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+
+    # Work factor changed since this hash was made: store the upgraded hash
+    if new_hash:
+        try:
+            await db.execute(update(models.User).where(models.User.id == db_user.id).values(password=new_hash))
+            await db.commit()
+        except exc.TimeoutError:
+            raise _db_pool_busy()
+
     return {"message": "Login successful", "user_id": db_user.id}
+
+
+# ---------------- User Dashboard ----------------
+# Everything the app's home screen shows, in a fixed number of queries however many
+# wallets the user has: the user with their points balance, their wallets (selectinload),
+# the latest `limit` transactions of every wallet (one windowed query), and the shard
+# totals only when a wallet is sharded
+def latest_transactions_query(wallet_ids, limit):
+    position = func.row_number().over(
+        partition_by=models.Transaction.wallet_id,
+        order_by=(models.Transaction.created_at.desc(), models.Transaction.id.desc())
+    ).label("position")
+    ranked = select(*TRANSACTION_COLUMNS, position)\
+        .where(models.Transaction.wallet_id.in_(wallet_ids))\
+        .subquery()
+    return select(*(ranked.c[column.key] for column in TRANSACTION_COLUMNS))\
+        .where(ranked.c.position <= limit)\
+        .order_by(ranked.c.wallet_id, ranked.c.position)
+
+
+@router.get("/{user_id}/dashboard", response_model=schemas.UserDashboard)
+async def user_dashboard(
+    user_id: int,
+    limit: int = Query(5, ge=0, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user = (await db.execute(
+        select(models.User)
+        .options(joinedload(models.User.points_balance), selectinload(models.User.wallets))
+        .where(models.User.id == user_id)
+    )).scalars().first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    wallets = sorted(user.wallets, key=lambda wallet: wallet.id)
+    latest = {wallet.id: [] for wallet in wallets}
+    if wallets and limit:
+        for row in (await db.execute(latest_transactions_query(list(latest), limit))).all():
+            latest[row.wallet_id].append(row)
+
+    sharded = [wallet.id for wallet in wallets if wallet.balance_shards]
+    totals = await balances.totals(db, sharded) if sharded else {}
+
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "total_points": user.points_balance.total_points if user.points_balance else 0,
+        "wallets": [
+            {
+                "id": wallet.id,
+                "user_id": wallet.user_id,
+                "balance": totals.get(wallet.id, wallet.balance),
+                "currency": wallet.currency,
+                "transactions": latest[wallet.id],
+            }
+            for wallet in wallets
+        ],
+    }
+
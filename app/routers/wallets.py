@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models, schemas
-from database import get_db
+from database import get_async_db
+import cache
+import money
+import idempotency
+import balances
 
 router = APIRouter(
     prefix="/wallets",
@@ -15,40 +21,55 @@ def get_wallets():
 
 # ---------------- Create Wallet ----------------
 @router.post("/", response_model=schemas.WalletOut)
-def create_wallet(wallet: schemas.WalletCreate, db: Session = Depends(get_db)):
-    new_wallet = models.Wallet(user_id=wallet.user_id, balance=0.0, currency=wallet.currency)
+async def create_wallet(wallet: schemas.WalletCreate, db: AsyncSession = Depends(get_async_db)):
+    user = await cache.get_user(db, wallet.user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    new_wallet = models.Wallet(user_id=wallet.user_id, balance=0, currency=wallet.currency)
     db.add(new_wallet)
-    db.commit()
-    db.refresh(new_wallet)
+    await db.commit()
+    await db.refresh(new_wallet)
     return new_wallet
 
 
 # ---------------- Get Wallet ----------------
 @router.get("/{wallet_id}", response_model=schemas.WalletOut)
-def get_wallet(wallet_id: int, db: Session = Depends(get_db)):
-    wallet = db.query(models.Wallet).filter(models.Wallet.id == wallet_id).first()
+async def get_wallet(wallet_id: int, db: AsyncSession = Depends(get_async_db)):
+    wallet = await cache.get_wallet(db, wallet_id)
     if not wallet:
         raise HTTPException(status_code=404, detail="Wallet not found")
     return wallet
 
 
 # ---------------- Fund Wallet ----------------
+# Retries carrying the same Idempotency-Key get the first response back without funding again
 @router.post("/fund")
-def fund_wallet(fund: schemas.FundWallet, db: Session = Depends(get_db)):
-    wallet = db.query(models.Wallet).filter(models.Wallet.id == fund.wallet_id).first()
-    if not wallet:
-        raise HTTPException(status_code=404, detail="Wallet not found")
-
-    wallet.balance += fund.amount
+async def fund_wallet(
+    fund: schemas.FundWallet,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    async def apply():
+        # Relative credit: on a sharded wallet it lands on one shard, not the wallet row
+        sharded = await balances.sharded_wallets(db)
+        if not await balances.credit(db, fund.wallet_id, fund.amount, sharded.get(fund.wallet_id, 0)):
+            raise HTTPException(status_code=404, detail="Wallet not found")
 
-    # Create a transaction record
-    transaction = models.Transaction(
-        wallet_id=wallet.id,
-        amount=fund.amount,
-        transaction_type="credit"
-    )
-    db.add(transaction)
+        # Create a transaction record
+        transaction = models.Transaction(
+            wallet_id=fund.wallet_id,
+            amount=fund.amount,
+            transaction_type=models.TransactionType.credit,
+            transaction_category=models.TransactionCategory.wallet_funding,
+            status="completed"
+        )
+        db.add(transaction)
+        await db.flush()
+        new_balance = (await balances.totals(db, [fund.wallet_id]))[fund.wallet_id]
+        return {"message": "Wallet funded successfully", "new_balance": money.to_major(new_balance)}
 
-    db.commit()
-    db.refresh(wallet)
-    return {"message": "Wallet funded successfully", "new_balance": wallet.balance}
+    body = await idempotency.run(db, "fund", idempotency_key, fund.model_dump(), apply, response)
+    await cache.invalidate("wallet", fund.wallet_id)
+    return body
@@ -1,5 +1,14 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, EmailStr, Field, PlainSerializer, WithJsonSchema
+from typing import Annotated, List, Optional
+from datetime import datetime
+
+import money
+
+# Amounts travel as major units (12.50) and are stored as integer minor units (1250).
+# Amounts moved (fund, transfer) must be positive; price filters may be 0.
+Amount = Annotated[int, BeforeValidator(money.to_minor), Field(gt=0, le=money.MAX_MINOR), WithJsonSchema({"type": "number"})]
+Price = Annotated[int, BeforeValidator(money.to_minor), Field(ge=0, le=money.MAX_MINOR), WithJsonSchema({"type": "number"})]
+AmountOut = Annotated[int, PlainSerializer(money.to_major, return_type=float), WithJsonSchema({"type": "number"})]
 
 # ---------------- User Schemas ----------------
 class UserCreate(BaseModel):
@@ -16,8 +25,7 @@ class UserOut(BaseModel):
     name: str
     email: EmailStr
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ---------------- Wallet Schemas ----------------
@@ -28,37 +36,87 @@ class WalletCreate(BaseModel):
 class WalletOut(BaseModel):
     id: int
     user_id: int
-    balance: float
+    balance: AmountOut
     currency: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 class FundWallet(BaseModel):
     wallet_id: int
-    amount: float
+    amount: Amount
     source: str  # card, bank, promo, etc.
 
 
 # ---------------- Points Schemas ----------------
+# Longest distance an earn event may claim (about half the Earth's circumference)
+MAX_EARN_DISTANCE_KM = 20_000
+
 class EarnPoints(BaseModel):
     user_id: int
     activity_type: str
     metadata: Optional[str] = None
+    # for rules that award points per km
+    distance_km: Optional[float] = Field(None, ge=0, le=MAX_EARN_DISTANCE_KM, allow_inf_nan=False)
+
+class EarnPointsBatch(BaseModel):
+    events: List[EarnPoints]
 
 class RedeemPoints(BaseModel):
     user_id: int
-    points: int
+    points: int = Field(gt=0)
     reward_type: str
 
 
+# ---------------- Transfer Schemas ----------------
+class TransferItem(BaseModel):
+    from_wallet_id: int
+    to_wallet_id: int
+    amount: Amount
+
+class BatchTransfer(BaseModel):
+    transfers: List[TransferItem]  # applied in order, all or nothing
+
+
+# ---------------- Tour Schemas ----------------
+class TourOut(BaseModel):
+    id: int
+    name: str
+    location: Optional[str] = None
+    distance_km: Optional[float] = None
+    price: AmountOut
+    vendor_id: Optional[int] = None
+    vendor_name: Optional[str] = None
+    service_type: Optional[str] = None
+    points_per_booking: int
+
+class TourPage(BaseModel):
+    items: List[TourOut]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+class TourBooking(BaseModel):
+    user_id: int
+    wallet_id: int  # debited for the tour price
+
+
 # ---------------- Transaction Schemas ----------------
 class TransactionOut(BaseModel):
     id: int
     wallet_id: int
-    amount: float
+    amount: AmountOut
     transaction_type: str  # credit or debit
-    created_at: str
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class TransactionPage(BaseModel):
+    items: List[TransactionOut]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
+
+# ---------------- Dashboard Schemas ----------------
+class DashboardWallet(WalletOut):
+    transactions: List[TransactionOut]  # newest first
 
-    class Config:
-        orm_mode = True
+class UserDashboard(UserOut):
+    total_points: int
+    wallets: List[DashboardWallet]
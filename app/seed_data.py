@@ -1,6 +1,6 @@
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app.models import User, Wallet, Vendor, Tour, TourTransaction, PointsTransaction
+from database import SessionLocal
+from models import User, Wallet, Vendor, Tour, TourTransaction, PointsTransaction
 
 # Start DB session
 db: Session = SessionLocal()
@@ -21,9 +21,9 @@ try:
     db.add_all([user1, user2])
     db.commit()
 
-    # ---- Create Wallets for Users ----
-    wallet1 = Wallet(user_id=user1.id, balance=5000.0, currency="GHS")
-    wallet2 = Wallet(user_id=user2.id, balance=3000.0, currency="GHS")
+    # ---- Create Wallets for Users (amounts in pesewas) ----
+    wallet1 = Wallet(user_id=user1.id, balance=500000, currency="GHS")
+    wallet2 = Wallet(user_id=user2.id, balance=300000, currency="GHS")
     db.add_all([wallet1, wallet2])
     db.commit()
 
@@ -33,9 +33,9 @@ try:
     db.add_all([vendor1, vendor2])
     db.commit()
 
-    # ---- Create Tours ----
-    tour1 = Tour(name="Cape Coast Castle Visit", location="Cape Coast", distance_km=150.0, price=200.0, vendor_id=vendor1.id)
-    tour2 = Tour(name="Nzulezu Stilt Village", location="Western Region", distance_km=280.0, price=400.0, vendor_id=vendor2.id)
+    # ---- Create Tours (prices in pesewas) ----
+    tour1 = Tour(name="Cape Coast Castle Visit", location="Cape Coast", distance_km=150.0, price=20000, vendor_id=vendor1.id)
+    tour2 = Tour(name="Nzulezu Stilt Village", location="Western Region", distance_km=280.0, price=40000, vendor_id=vendor2.id)
     db.add_all([tour1, tour2])
     db.commit()
 
@@ -0,0 +1,36 @@
+from typing import List
+
+import orjson
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+import models, schemas
+from pagination import build_page
+
+# List endpoints select these columns as plain row tuples: no ORM objects are built
+TRANSACTION_COLUMNS = [
+    models.Transaction.id,
+    models.Transaction.wallet_id,
+    models.Transaction.amount,
+    models.Transaction.transaction_type,
+    models.Transaction.created_at,
+]
+
+
+class ORJSONResponse(Response):
+    # FastAPI's own ORJSONResponse is deprecated; this is the same few lines
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content)
+
+
+transactions_adapter = TypeAdapter(List[schemas.TransactionOut])
+
+
+def transaction_page(rows, limit):
+    # Same body as schemas.TransactionPage: the page is validated in one call and
+    # encoded with orjson, skipping FastAPI's per-item response_model pass
+    page = build_page(rows, limit)
+    items = transactions_adapter.validate_python(page["items"], from_attributes=True)
+    return ORJSONResponse({"items": transactions_adapter.dump_python(items), "next_cursor": page["next_cursor"]})
@@ -0,0 +1,111 @@
+from fastapi import HTTPException
+from sqlalchemy import bindparam, exc, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import balances
+
+MAX_BATCH_TRANSFERS = 1000
+
+
+# ---------------- Transfer Engine ----------------
+async def lock_wallets(db: AsyncSession, wallet_ids):
+    # SELECT ... FOR UPDATE in ascending id order, so concurrent batches touching
+    # overlapping wallets always queue on the same row first instead of deadlocking.
+    wallet_ids = sorted(set(wallet_ids))
+    result = await db.execute(
+        select(models.Wallet)
+        .where(models.Wallet.id.in_(wallet_ids))
+        .order_by(models.Wallet.id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    wallets = {wallet.id: wallet for wallet in result.scalars()}
+    missing = [wallet_id for wallet_id in wallet_ids if wallet_id not in wallets]
+    if missing:
+        raise HTTPException(status_code=404, detail="Wallet not found" if len(wallet_ids) <= 2 else f"Wallets not found: {missing}")
+    return wallets
+
+
+def _rejected(transfers, index, message):
+    # Single transfers keep their original messages; batches say which transfer failed
+    detail = message if len(transfers) == 1 else f"Transfer {index}: {message[0].lower()}{message[1:]}"
+    return HTTPException(status_code=400, detail=detail)
+
+
+async def apply_transfers(db: AsyncSession, transfers):
+    # transfers: iterable of (from_wallet_id, to_wallet_id, amount), applied in order.
+    # Returns {wallet_id: new balance}. All-or-nothing: the caller commits only if this returns.
+    transfers = list(transfers)
+    for index, (from_wallet_id, to_wallet_id, amount) in enumerate(transfers):
+        if from_wallet_id == to_wallet_id:
+            raise _rejected(transfers, index, "Cannot transfer to the same wallet")
+        if amount <= 0:
+            raise _rejected(transfers, index, "Amount must be positive")
+
+    # Sharded wallets that only receive are credited on a shard without locking their row
+    sharded = await balances.sharded_wallets(db)
+    senders = {t[0] for t in transfers}
+    credit_only = {t[1] for t in transfers if t[1] in sharded and t[1] not in senders}
+    wallets = await lock_wallets(db, [wallet_id for t in transfers for wallet_id in t[:2] if wallet_id not in credit_only])
+
+    # Validate every transfer against running balances in one pass
+    opening = {wallet_id: wallet.balance for wallet_id, wallet in wallets.items()}
+    # The locked rows say exactly which of them are sharded
+    locked_sharded = {wallet_id for wallet_id, wallet in wallets.items() if wallet.balance_shards}
+    if locked_sharded:
+        opening.update(await balances.totals(db, locked_sharded))
+    opening.update(dict.fromkeys(credit_only, 0))  # only their net credit is needed
+    running = dict(opening)
+    rows = []
+    for index, (from_wallet_id, to_wallet_id, amount) in enumerate(transfers):
+        if running[from_wallet_id] < amount:
+            raise _rejected(transfers, index, "Insufficient funds in sender's wallet")
+        running[from_wallet_id] -= amount
+        running[to_wallet_id] += amount
+        rows.append({
+            "wallet_id": from_wallet_id,
+            "amount": -amount,
+            "transaction_type": models.TransactionType.debit,
+            "transaction_category": models.TransactionCategory.wallet_transfer,
+            "status": "completed",
+        })
+        rows.append({
+            "wallet_id": to_wallet_id,
+            "amount": amount,
+            "transaction_type": models.TransactionType.credit,
+            "transaction_category": models.TransactionCategory.wallet_transfer,
+            "status": "completed",
+        })
+    net = {wallet_id: running[wallet_id] - opening[wallet_id] for wallet_id in running if running[wallet_id] != opening[wallet_id]}
+
+    # Apply net deltas relative to the stored balance rather than writing the values
+    # read above: SQLite ignores FOR UPDATE, and a relative update can't lose money
+    # there. The non-negative CHECK catches an overdraft from a stale read.
+    wallets_table = models.Wallet.__table__
+    deltas = [
+        {"wallet_key": wallet_id, "delta": delta}
+        for wallet_id, delta in net.items()
+        if wallet_id in wallets and not (delta < 0 and wallet_id in locked_sharded)
+    ]
+    try:
+        if deltas:
+            await db.execute(
+                update(wallets_table)
+                .where(wallets_table.c.id == bindparam("wallet_key"))
+                .values(balance=wallets_table.c.balance + bindparam("delta")),
+                deltas
+            )
+        for wallet_id, delta in net.items():
+            if wallet_id in credit_only:
+                if not await balances.credit(db, wallet_id, delta, sharded[wallet_id]):
+                    raise HTTPException(status_code=404, detail="Wallet not found")
+            elif delta < 0 and wallet_id in locked_sharded:
+                if await balances.claim(db, wallet_id, -delta) is None:
+                    raise HTTPException(status_code=409, detail="Balance changed during transfer, please retry")
+    except exc.IntegrityError:
+        raise HTTPException(status_code=409, detail="Balance changed during transfer, please retry")
+    await db.execute(insert(models.Transaction), rows)
+
+    # Stored balances (including shards), as the callers report them
+    return await balances.totals(db, running.keys())
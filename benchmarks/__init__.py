@@ -0,0 +1,12 @@
+# Benchmarks and load tests for the Vooya Wallet API.
+#
+# Run from the repo root, e.g. `python -m benchmarks.load_test --help`.
+# The app modules import each other as top-level modules (run from app/), so the
+# app directory goes on the path (the repo root too, for `import benchmarks`).
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(ROOT, "app"), ROOT):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,132 @@
+# Contention benchmark for POST /tours/{id}/book.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.booking_contention --concurrency 64 --bookings 5000
+#   python -m benchmarks.booking_contention --hot-wallets 4   # worst case: everyone books from 4 wallets
+#
+# Every booking targets the same popular tour. By default each request books from a
+# random wallet (the tour row is only read, so bookings shouldn't serialize on it);
+# --hot-wallets concentrates the load on a few wallets to measure row-lock contention.
+# Afterwards the ledger is checked once the points award jobs have run: every wallet
+# lost exactly price x its bookings, every booking awarded points once, and points
+# balances still match the points ledger.
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import func, select
+
+from benchmarks.load_test import percentile
+from benchmarks.seed import seed_dataset
+import jobs
+import models
+import points_ledger
+from database import SessionLocal
+
+
+async def run(client, tour_id, owners, wallet_ids, args):
+    latencies = []
+    statuses = {}
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < args.bookings:
+            issued += 1
+            wallet_id = random.choice(wallet_ids)
+            start = time.perf_counter()
+            response = await client.post(f"/tours/{tour_id}/book", json={"user_id": owners[wallet_id], "wallet_id": wallet_id})
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    return sorted(latencies), statuses, time.perf_counter() - start
+
+
+def verify(tour_id, wallet_ids, opening_balance):
+    db = SessionLocal()
+    try:
+        price = db.get(models.Tour, tour_id).price
+        balances = dict(db.execute(
+            select(models.Wallet.id, models.Wallet.balance).where(models.Wallet.id.in_(wallet_ids))
+        ).all())
+        booked = dict(db.execute(
+            select(models.Transaction.wallet_id, func.count())
+            .where(models.Transaction.wallet_id.in_(wallet_ids),
+                   models.Transaction.transaction_category == models.TransactionCategory.tour_booking)
+            .group_by(models.Transaction.wallet_id)
+        ).all())
+        problems = [
+            f"wallet {wallet_id}: balance {balance} != {opening_balance} - {booked.get(wallet_id, 0)} x {price}"
+            for wallet_id, balance in balances.items()
+            if balance != opening_balance - booked.get(wallet_id, 0) * price
+        ]
+        awards = db.execute(select(func.count()).select_from(models.PointsTransaction).where(
+            models.PointsTransaction.details == f"tour:{tour_id}"
+        )).scalar()
+        if awards != sum(booked.values()):
+            problems.append(f"{awards} points awards for {sum(booked.values())} bookings")
+        problems += [f"points drift for user {row['user_id']}" for row in points_ledger.find_drift(db)]
+        return problems
+    finally:
+        db.close()
+
+
+async def wait_for_jobs(timeout):
+    # Points are awarded by outbox jobs after each booking commits
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db = SessionLocal()
+        try:
+            left = db.execute(select(func.count()).select_from(models.OutboxJob).where(
+                models.OutboxJob.status.in_([jobs.PENDING, jobs.RUNNING])
+            )).scalar()
+        finally:
+            db.close()
+        if not left:
+            return
+        await asyncio.sleep(0.1)
+    print(f"⚠️  {left} jobs still pending after {timeout:.0f}s")
+
+
+async def main(args):
+    opening_balance = args.opening_balance
+    dataset = seed_dataset(args.users, 1, 0, 0, opening_balance=opening_balance, rollup=False, tours=1)
+    tour_id = dataset["tour_ids"][0]
+    wallet_ids = dataset["wallet_ids"][:args.hot_wallets] if args.hot_wallets else dataset["wallet_ids"]
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        import main as app_main
+        transport = httpx.ASGITransport(app=app_main.app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        latencies, statuses, elapsed = await run(client, tour_id, dataset["wallet_owners"], wallet_ids, args)
+
+    print(f"{len(latencies)} bookings of tour {tour_id} from {len(wallet_ids)} wallets, concurrency {args.concurrency}")
+    print(f"  {len(latencies) / elapsed:.1f} bookings/s   statuses {dict(sorted(statuses.items()))}")
+    print("  " + "   ".join(f"p{pct} {percentile(latencies, pct) * 1000:.2f} ms" for pct in (50, 95, 99)))
+
+    await wait_for_jobs(args.timeout)
+    problems = verify(tour_id, dataset["wallet_ids"], opening_balance)
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Wallet debits and points match the ledgers.")
+    return 1 if problems or statuses.get(500) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tour booking contention benchmark")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--hot-wallets", type=int, default=0, help="book only from this many wallets")
+    parser.add_argument("--opening-balance", type=int, default=100_000_000, help="minor units")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
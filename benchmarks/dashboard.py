@@ -0,0 +1,122 @@
+# Query count check for GET /users/{id}/dashboard.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.dashboard --users 20 --wallets 3 --transactions 40 --limit 5
+#
+# Every dashboard must take the same number of SQL statements however many wallets
+# and transactions the user has: 3 (user + points balance, wallets, latest transactions),
+# 4 when a wallet is sharded, 1 for an unknown user. Each dashboard is also checked
+# against the separate endpoints the app called before (wallet, points balance and
+# transaction listing per wallet), whose requests and statements are reported.
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+from sqlalchemy import event
+
+from benchmarks.seed import seed_dataset
+import balances
+import models
+from database import SessionLocal, get_async_engine
+
+DASHBOARD_QUERIES = 3
+SHARDED_DASHBOARD_QUERIES = 4
+MISSING_USER_QUERIES = 1
+
+statements = 0
+
+
+def _count(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+async def counted(client, url):
+    # (response, SQL statements it took)
+    global statements
+    statements = 0
+    response = await client.get(url)
+    return response, statements
+
+
+async def separate_calls(client, user_id, wallet_ids, limit):
+    # What the home screen requested before: the same data, one endpoint at a time
+    requests, queries = 0, 0
+    wallets = []
+    for wallet_id in wallet_ids:
+        wallet, wallet_queries = await counted(client, f"/wallets/{wallet_id}")
+        listing, listing_queries = await counted(client, f"/transactions/wallet/{wallet_id}?limit={limit}")
+        wallets.append({**wallet.json(), "transactions": listing.json()["items"]})
+        requests, queries = requests + 2, queries + wallet_queries + listing_queries
+    points, points_queries = await counted(client, f"/points/balance/{user_id}")
+    return {"total_points": points.json()["total_points"], "wallets": wallets}, requests + 1, queries + points_queries
+
+
+async def main(args):
+    dataset = seed_dataset(args.users, args.wallets, args.transactions, 5, rollup=False, tours=0)
+    owners = {}
+    for wallet_id, user_id in dataset["wallet_owners"].items():
+        owners.setdefault(user_id, []).append(wallet_id)
+
+    # One user gets a sharded wallet with part of its balance in a shard
+    sharded_user = dataset["user_ids"][-1]
+    sharded_wallet = min(owners[sharded_user])
+    db = SessionLocal()
+    try:
+        balances.set_shards(db, sharded_wallet, 4)
+        db.execute(models.WalletBalanceShard.__table__.update()
+                   .where(models.WalletBalanceShard.wallet_id == sharded_wallet, models.WalletBalanceShard.shard == 0)
+                   .values(balance=12_345))
+        db.commit()
+    finally:
+        db.close()
+
+    event.listen(get_async_engine().sync_engine, "before_cursor_execute", _count)
+    import main as app_main
+    transport = httpx.ASGITransport(app=app_main.app)
+    failures = []
+    timings, old_requests, old_queries = [], [], []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for user_id in dataset["user_ids"]:
+            start = time.perf_counter()
+            response, queries = await counted(client, f"/users/{user_id}/dashboard?limit={args.limit}")
+            timings.append(time.perf_counter() - start)
+            expected_queries = SHARDED_DASHBOARD_QUERIES if user_id == sharded_user else DASHBOARD_QUERIES
+            if response.status_code != 200 or queries != expected_queries:
+                failures.append(f"user {user_id}: status {response.status_code}, {queries} queries (expected {expected_queries})")
+                continue
+
+            dashboard = response.json()
+            before, requests, queries = await separate_calls(client, user_id, sorted(owners[user_id]), args.limit)
+            old_requests.append(requests)
+            old_queries.append(queries)
+            if {key: dashboard[key] for key in before} != before:
+                failures.append(f"user {user_id}: dashboard differs from the separate endpoints\n"
+                                f"  {json.dumps(dashboard)}\n  {json.dumps(before)}")
+
+        response, queries = await counted(client, "/users/0/dashboard")
+        if response.status_code != 404 or queries != MISSING_USER_QUERIES:
+            failures.append(f"unknown user: status {response.status_code}, {queries} queries")
+
+    print(f"{len(timings)} dashboards ({args.wallets} wallets, {args.transactions} transactions each, limit {args.limit})")
+    print(f"  dashboard: 1 request, {DASHBOARD_QUERIES} queries ({SHARDED_DASHBOARD_QUERIES} with a sharded wallet), "
+          f"mean {sum(timings) / len(timings) * 1000:.1f} ms")
+    if old_requests:
+        print(f"  separate endpoints: {old_requests[0]} requests, "
+              f"{min(old_queries)}-{max(old_queries)} queries")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        return 1
+    print("✅ Fixed query count, same data as the separate endpoints.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="User dashboard query count check")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--wallets", type=int, default=3)
+    parser.add_argument("--transactions", type=int, default=40)
+    parser.add_argument("--limit", type=int, default=5)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,99 @@
+# Credit throughput into one hot wallet, unsharded and sharded.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.hot_wallet --shards 0,4,16 --credits 5000
+#
+# Many senders transfer into one wallet at once (POST /transactions/transfer).
+# Each run flags the wallet with the given shard count first (0 = one balance row),
+# so credits/s can be compared as N grows. Afterwards the shards are compacted and the
+# wallet's balance is checked against its opening balance plus its ledger.
+#
+# SQLite serializes every write, so sharding can't help there; measure on PostgreSQL.
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from sqlalchemy import func, select
+
+from benchmarks.load_test import percentile
+from benchmarks.seed import seed_dataset
+import balances
+import models
+from database import SessionLocal
+
+
+async def run(client, hot_wallet_id, senders, args):
+    latencies = []
+    statuses = {}
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < args.credits:
+            issued += 1
+            start = time.perf_counter()
+            response = await client.post("/transactions/transfer", params={
+                "from_wallet_id": random.choice(senders), "to_wallet_id": hot_wallet_id, "amount": "1.00"
+            })
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    return sorted(latencies), statuses, time.perf_counter() - start
+
+
+def verify(hot_wallet_id, opening_balance):
+    db = SessionLocal()
+    try:
+        balances.compact(db)
+        balance = db.get(models.Wallet, hot_wallet_id).balance
+        ledger = db.execute(
+            select(func.coalesce(func.sum(models.Transaction.amount), 0))
+            .where(models.Transaction.wallet_id == hot_wallet_id)
+        ).scalar()
+        if balance != opening_balance + int(ledger):
+            return [f"wallet {hot_wallet_id}: balance {balance} != {opening_balance} + ledger {int(ledger)}"]
+        return []
+    finally:
+        db.close()
+
+
+async def main(args):
+    dataset = seed_dataset(args.senders + 1, 1, 0, 0, opening_balance=args.opening_balance, rollup=False, tours=0)
+    hot_wallet_id, *senders = dataset["wallet_ids"]
+
+    import main as app_main
+    transport = httpx.ASGITransport(app=app_main.app, raise_app_exceptions=False)
+    problems = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+        for shards in [int(value) for value in args.shards.split(",")]:
+            db = SessionLocal()
+            try:
+                balances.set_shards(db, hot_wallet_id, shards)
+            finally:
+                db.close()
+            balances.invalidate()
+
+            latencies, statuses, elapsed = await run(client, hot_wallet_id, senders, args)
+            print(f"shards {shards:>3}: {len(latencies) / elapsed:8.1f} credits/s   statuses {dict(sorted(statuses.items()))}   "
+                  + "   ".join(f"p{pct} {percentile(latencies, pct) * 1000:.2f} ms" for pct in (50, 95, 99)))
+            problems += verify(hot_wallet_id, args.opening_balance)
+
+    for problem in problems:
+        print(f"❌ {problem}")
+    if not problems:
+        print("✅ Hot wallet balance matches its ledger after compaction.")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot wallet credit throughput")
+    parser.add_argument("--shards", default="0,4,16", help="comma-separated shard counts to compare")
+    parser.add_argument("--credits", type=int, default=2000, help="transfers into the hot wallet per run")
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--opening-balance", type=int, default=100_000_000, help="minor units")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,366 @@
+# Load test for every router: seeds a dataset, drives a weighted mix of requests at
+# fixed concurrency and reports throughput and p50/p95/p99 latency per endpoint.
+#
+#   DATABASE_URL=sqlite:///./bench.db BCRYPT_ROUNDS=4 python -m benchmarks.load_test --duration 30
+#   python -m benchmarks.load_test --base-url http://localhost:8000 --concurrency 64
+#   python -m benchmarks.load_test --compare benchmarks/results/<earlier run>.json
+#
+# Without --base-url the app runs in-process (ASGI, no network). Results are saved as
+# JSON under benchmarks/results/ so runs can be compared across commits.
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks import ROOT
+from benchmarks.seed import BENCH_PASSWORD, seed_dataset
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+# ---------------- Scenarios ----------------
+class Context:
+    def __init__(self, dataset):
+        self.user_ids = dataset["user_ids"]
+        self.wallet_ids = dataset["wallet_ids"]
+        self.wallet_owners = dataset["wallet_owners"]
+        self.tour_ids = dataset["tour_ids"]
+        self.emails = dataset["emails"]
+        self.run_id = dataset["run_id"]
+        self.registered = 0
+
+    def user(self):
+        return random.choice(self.user_ids)
+
+    def wallet(self):
+        return random.choice(self.wallet_ids)
+
+    def wallet_pair(self):
+        return random.sample(self.wallet_ids, 2)
+
+
+async def register(client, ctx):
+    ctx.registered += 1
+    email = f"bench-{ctx.run_id}-new-{ctx.registered}@example.com"
+    return await client.post("/users/register", json={"name": "Bench", "email": email, "password": BENCH_PASSWORD})
+
+
+async def login(client, ctx):
+    return await client.post("/users/login", json={"email": random.choice(ctx.emails), "password": BENCH_PASSWORD})
+
+
+async def get_wallet(client, ctx):
+    return await client.get(f"/wallets/{ctx.wallet()}")
+
+
+async def fund_wallet(client, ctx):
+    return await client.post("/wallets/fund", json={"wallet_id": ctx.wallet(), "amount": 10.0, "source": "card"})
+
+
+async def transfer(client, ctx):
+    from_id, to_id = ctx.wallet_pair()
+    return await client.post(f"/transactions/transfer?from_wallet_id={from_id}&to_wallet_id={to_id}&amount=1.0")
+
+
+async def transfer_batch(client, ctx):
+    transfers = []
+    for _ in range(10):
+        from_id, to_id = ctx.wallet_pair()
+        transfers.append({"from_wallet_id": from_id, "to_wallet_id": to_id, "amount": 1.0})
+    return await client.post("/transactions/transfer/batch", json={"transfers": transfers})
+
+
+async def earn_points(client, ctx):
+    return await client.post("/points/earn", json={"user_id": ctx.user(), "activity_type": "booking"})
+
+
+async def earn_points_batch(client, ctx):
+    events = [{"user_id": ctx.user(), "activity_type": "campaign"} for _ in range(20)]
+    return await client.post("/points/earn/batch", json={"events": events})
+
+
+async def redeem_points(client, ctx):
+    return await client.post("/points/redeem", json={"user_id": ctx.user(), "points": 1, "reward_type": "bench"})
+
+
+async def points_balance(client, ctx):
+    return await client.get(f"/points/balance/{ctx.user()}")
+
+
+async def dashboard(client, ctx):
+    return await client.get(f"/users/{ctx.user()}/dashboard")
+
+
+async def browse_tours(client, ctx):
+    params = random.choice([{}, {"sort": "price"}, {"sort": "-distance"}, {"location": "Accra", "max_price": 250}])
+    return await client.get("/tours/", params={**params, "limit": 20})
+
+
+async def book_tour(client, ctx):
+    wallet_id = ctx.wallet()
+    # Skewed towards the first few tours, like a handful of popular trips
+    tour_id = ctx.tour_ids[min(int(random.expovariate(0.5)), len(ctx.tour_ids) - 1)]
+    return await client.post(f"/tours/{tour_id}/book", json={"user_id": ctx.wallet_owners[wallet_id], "wallet_id": wallet_id})
+
+
+async def wallet_summary(client, ctx):
+    return await client.get(f"/transactions/summary/wallet/{ctx.wallet()}")
+
+
+async def user_summary(client, ctx):
+    return await client.get(f"/transactions/summary/user/{ctx.user()}")
+
+
+async def wallet_listing(client, ctx):
+    return await client.get(f"/transactions/wallet/{ctx.wallet()}?limit=50")
+
+
+async def user_listing(client, ctx):
+    return await client.get(f"/transactions/user/{ctx.user()}?limit=50")
+
+
+async def global_listing(client, ctx):
+    return await client.get("/transactions/?limit=50")
+
+
+# (label, weight, request); weights roughly follow production traffic, reads first
+SCENARIOS = [
+    ("POST /users/register", 1, register),
+    ("POST /users/login", 4, login),
+    ("GET /wallets/{id}", 15, get_wallet),
+    ("POST /wallets/fund", 4, fund_wallet),
+    ("POST /transactions/transfer", 6, transfer),
+    ("POST /transactions/transfer/batch", 1, transfer_batch),
+    ("POST /points/earn", 6, earn_points),
+    ("POST /points/earn/batch", 1, earn_points_batch),
+    ("POST /points/redeem", 2, redeem_points),
+    ("GET /points/balance/{id}", 10, points_balance),
+    ("GET /users/{id}/dashboard", 8, dashboard),
+    ("GET /tours/", 12, browse_tours),
+    ("POST /tours/{id}/book", 3, book_tour),
+    ("GET /transactions/summary/wallet/{id}", 6, wallet_summary),
+    ("GET /transactions/summary/user/{id}", 6, user_summary),
+    ("GET /transactions/wallet/{id}", 10, wallet_listing),
+    ("GET /transactions/user/{id}", 10, user_listing),
+    ("GET /transactions/", 3, global_listing),
+]
+
+
+# ---------------- Runner ----------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+async def run_load(client, ctx, scenarios, concurrency, duration, max_requests):
+    latencies = {label: [] for label, _, _ in scenarios}
+    errors = {label: 0 for label, _, _ in scenarios}
+    labels = [label for label, _, _ in scenarios]
+    weights = [weight for _, weight, _ in scenarios]
+    requests_by_label = {label: request for label, _, request in scenarios}
+    deadline = time.perf_counter() + duration
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while time.perf_counter() < deadline and (max_requests is None or issued < max_requests):
+            issued += 1
+            label = random.choices(labels, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await requests_by_label[label](client, ctx)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            # Only successful requests count towards latency: a fast 500 is not a fast endpoint
+            if failed:
+                errors[label] += 1
+            else:
+                latencies[label].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - start
+
+
+def summarize(latencies, errors, elapsed, error_threshold):
+    # Endpoints failing more than error_threshold (a fraction) of their requests get no
+    # latency figures: they are reported as failing instead of as fast
+    endpoints = {}
+    for label, values in latencies.items():
+        requests = len(values) + errors[label]
+        if not requests:
+            continue
+        values = sorted(values)
+        error_rate = errors[label] / requests
+        measured = bool(values) and error_rate <= error_threshold
+        latency = lambda value: round(value * 1000, 3) if measured else None
+        endpoints[label] = {
+            "requests": requests,
+            "errors": errors[label],
+            "error_rate": round(error_rate, 4),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "mean_ms": latency(sum(values) / len(values)) if values else None,
+            "p50_ms": latency(percentile(values, 50)),
+            "p95_ms": latency(percentile(values, 95)),
+            "p99_ms": latency(percentile(values, 99)),
+            "max_ms": latency(values[-1]) if values else None,
+        }
+    everything = sorted(value for values in latencies.values() for value in values)
+    requests = len(everything) + sum(errors.values())
+    total = {
+        "requests": requests,
+        "errors": sum(errors.values()),
+        "error_rate": round(sum(errors.values()) / requests, 4) if requests else 0.0,
+        "throughput_rps": round(len(everything) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(everything, 50) * 1000, 3),
+        "p95_ms": round(percentile(everything, 95) * 1000, 3),
+        "p99_ms": round(percentile(everything, 99) * 1000, 3),
+    }
+    return endpoints, total
+
+
+def failing(endpoints):
+    # Endpoints reported without latency because too many of their requests failed
+    return sorted(label for label, row in endpoints.items() if row["p95_ms"] is None)
+
+
+# ---------------- Reporting ----------------
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(endpoints, total):
+    print(f"{'endpoint':40} {'reqs':>7} {'err':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for label, row in sorted(endpoints.items()):
+        if row["p95_ms"] is None:
+            latencies = f"{'FAILING: ' + format(row['error_rate'], '.0%') + ' errors':>29}"
+        else:
+            latencies = f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+        print(f"{label:40} {row['requests']:>7} {row['errors']:>5} {row['throughput_rps']:>9.1f} {latencies}")
+    print(f"{'TOTAL':40} {total['requests']:>7} {total['errors']:>5} {total['throughput_rps']:>9.1f} "
+          f"{total['p50_ms']:>9.2f} {total['p95_ms']:>9.2f} {total['p99_ms']:>9.2f}")
+    if total["errors"]:
+        print(f"\n❌ {total['errors']} requests failed ({total['error_rate']:.1%})"
+              + (f"; failing endpoints: {', '.join(failing(endpoints))}" if failing(endpoints) else ""))
+
+
+def compare(result, baseline_path, threshold, error_threshold):
+    # Returns the endpoints whose p95 grew by more than threshold (a fraction), or whose
+    # error rate rose above error_threshold
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline['meta']['commit']} ({baseline_path}):")
+    regressions = []
+    for label, row in sorted(result["endpoints"].items()):
+        before = baseline["endpoints"].get(label)
+        if not before:
+            continue
+        error_rate = row["error_rate"]
+        # Older result files have no error_rate; their latencies included failed requests
+        before_error_rate = before.get("error_rate", before["errors"] / before["requests"] if before["requests"] else 0.0)
+        if error_rate > error_threshold and error_rate > before_error_rate:
+            print(f"{label:40} errors {before_error_rate:.1%} -> {error_rate:.1%}  <-- regression")
+            regressions.append(label)
+            continue
+        if not before["p95_ms"] or row["p95_ms"] is None or before_error_rate > error_threshold:
+            continue
+        change = row["p95_ms"] / before["p95_ms"] - 1
+        rps_change = row["throughput_rps"] / before["throughput_rps"] - 1 if before["throughput_rps"] else 0.0
+        flag = "  <-- regression" if change > threshold else ""
+        print(f"{label:40} p95 {before['p95_ms']:>8.2f} -> {row['p95_ms']:>8.2f} ms ({change:+.0%})  "
+              f"rps {rps_change:+.0%}{flag}")
+        if flag:
+            regressions.append(label)
+    return regressions
+
+
+async def main(args):
+    dataset = seed_dataset(args.users, args.wallets_per_user, args.transactions_per_wallet, args.points_per_user)
+    ctx = Context(dataset)
+
+    scenarios = SCENARIOS
+    if args.only:
+        wanted = [name.strip() for name in args.only.split(",")]
+        scenarios = [s for s in SCENARIOS if any(name in s[0] for name in wanted)]
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        import main as app_main
+        # Unhandled app errors come back as 500s (counted as errors) instead of raising
+        transport = httpx.ASGITransport(app=app_main.app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout)
+
+    async with client:
+        latencies, errors, elapsed = await run_load(
+            client, ctx, scenarios, args.concurrency, args.duration, args.requests
+        )
+
+    endpoints, total = summarize(latencies, errors, elapsed, args.error_threshold)
+    result = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "database": os.getenv("DATABASE_URL", "").split("://")[0],
+            "target": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "error_threshold": args.error_threshold,
+            "elapsed_seconds": round(elapsed, 3),
+            "dataset": {
+                "users": args.users,
+                "wallets_per_user": args.wallets_per_user,
+                "transactions_per_wallet": args.transactions_per_wallet,
+                "points_per_user": args.points_per_user,
+            },
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+
+    print_report(endpoints, total)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{result['meta']['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nSaved {output}")
+
+    regressions = compare(result, args.compare, args.regression_threshold, args.error_threshold) if args.compare else []
+    if regressions or failing(endpoints):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vooya Wallet API load test")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--only", help="comma-separated substrings of endpoint labels to run")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--wallets-per-user", type=int, default=2)
+    parser.add_argument("--transactions-per-wallet", type=int, default=50)
+    parser.add_argument("--points-per-user", type=int, default=20)
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--regression-threshold", type=float, default=0.2,
+                        help="fail when an endpoint's p95 grows by more than this fraction")
+    parser.add_argument("--error-threshold", type=float, default=0.01,
+                        help="fail (and report no latency) when an endpoint's requests fail more than this fraction")
+    asyncio.run(main(parser.parse_args()))
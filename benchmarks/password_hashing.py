@@ -0,0 +1,59 @@
+# Micro-benchmark for login password verification.
+#
+# Usage (from the repo root):
+#   python benchmarks/password_hashing.py [--logins 200] [--rounds 12] [--workers N]
+#
+# Reports logins/second inline (one core) and through the passwords process pool,
+# plus the pool's logins/second per core.
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--logins", type=int, default=200)
+parser.add_argument("--rounds", type=int, default=12)
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+args = parser.parse_args()
+
+# passwords.py reads its settings at import time
+os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+os.environ["PASSWORD_WORKERS"] = str(args.workers)
+os.environ["PASSWORD_MAX_PENDING"] = str(args.logins)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import passwords  # noqa: E402
+
+
+def run_inline(hashed):
+    start = time.perf_counter()
+    for _ in range(args.logins):
+        passwords._verify_and_update("correct horse battery staple", hashed)
+    return time.perf_counter() - start
+
+
+async def run_pool(hashed):
+    # Warm the worker processes before timing
+    await asyncio.gather(*[passwords.verify_password("warmup", hashed) for _ in range(args.workers)])
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        passwords.verify_password("correct horse battery staple", hashed) for _ in range(args.logins)
+    ])
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    hashed = passwords.pwd_context.hash("correct horse battery staple")
+
+    inline_seconds = run_inline(hashed)
+    pool_seconds = asyncio.run(run_pool(hashed))
+    passwords.shutdown()
+
+    inline_rate = args.logins / inline_seconds
+    pool_rate = args.logins / pool_seconds
+    print(f"bcrypt rounds:        {args.rounds}")
+    print(f"logins:               {args.logins}")
+    print(f"inline (1 core):      {inline_rate:8.1f} logins/s")
+    print(f"pool ({args.workers} workers):    {pool_rate:8.1f} logins/s")
+    print(f"pool per core:        {pool_rate / max(args.workers, 1):8.1f} logins/s/core")
@@ -0,0 +1,116 @@
+# Seeds a synthetic dataset for load tests into the database at DATABASE_URL.
+#
+#   python -m benchmarks.seed --users 1000 --wallets-per-user 2 --transactions-per-wallet 100
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+import benchmarks  # noqa: F401  (sets up sys.path)
+import models
+import passwords
+import points_rules
+import rollups
+from database import Base, SessionLocal, get_engine
+
+BENCH_PASSWORD = "benchmark-password"
+BATCH_SIZE = 5000
+
+
+def _insert_batches(db, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed_dataset(users=200, wallets_per_user=2, transactions_per_wallet=50, points_per_user=20,
+                 opening_balance=100_000_000, history_days=90, rollup=True, tours=20):
+    # Amounts are minor units. Returns {"run_id", "user_ids", "wallet_ids", "wallet_owners",
+    # "tour_ids", "emails"} for the load test to target
+    # Throwaway benchmark databases skip the migrations
+    Base.metadata.create_all(bind=get_engine())
+    run_id = str(time.time_ns())
+    hashed = passwords.pwd_context.hash(BENCH_PASSWORD)
+    now = datetime.utcnow()
+
+    db = SessionLocal()
+    try:
+        emails = [f"bench-{run_id}-{i}@example.com" for i in range(users)]
+        _insert_batches(db, models.User, [
+            {"name": f"Bench User {i}", "email": email, "password": hashed} for i, email in enumerate(emails)
+        ])
+        user_ids = list(db.execute(select(models.User.id).where(models.User.email.in_(emails))).scalars())
+
+        _insert_batches(db, models.Wallet, [
+            {"user_id": user_id, "balance": opening_balance, "currency": "GHS"}
+            for user_id in user_ids for _ in range(wallets_per_user)
+        ])
+        wallet_owners = dict(db.execute(
+            select(models.Wallet.id, models.Wallet.user_id).where(models.Wallet.user_id.in_(user_ids))
+        ).all())
+        wallet_ids = list(wallet_owners)
+
+        vendor = models.Vendor(name=f"Bench Tours {run_id}", service_type="tour")
+        db.add(vendor)
+        db.flush()
+        _insert_batches(db, models.Tour, [
+            {"name": f"Bench Tour {i}", "location": "Accra", "distance_km": random.uniform(10, 300),
+             "price": random.randint(5_000, 50_000), "vendor_id": vendor.id}
+            for i in range(tours)
+        ])
+        tour_ids = list(db.execute(select(models.Tour.id).where(models.Tour.vendor_id == vendor.id)).scalars())
+
+        # Balanced history: every credit has a matching debit, so balances stay at the opening balance
+        transactions = []
+        for wallet_id in wallet_ids:
+            for i in range(transactions_per_wallet):
+                amount = random.randint(100, 50_000)
+                credit = i % 2 == 0
+                transactions.append({
+                    "wallet_id": wallet_id,
+                    "amount": amount if credit else -amount,
+                    "transaction_type": models.TransactionType.credit if credit else models.TransactionType.debit,
+                    "transaction_category": models.TransactionCategory.wallet_funding,
+                    "status": "completed",
+                    "created_at": now - timedelta(days=random.uniform(1, history_days)),
+                })
+        transactions.sort(key=lambda row: row["created_at"])
+        _insert_batches(db, models.Transaction, transactions)
+
+        _insert_batches(db, models.PointsTransaction, [
+            {"user_id": user_id, "activity_type": "booking", "points": 10, "created_at": now - timedelta(days=1)}
+            for user_id in user_ids for _ in range(points_per_user)
+        ])
+        _insert_batches(db, models.PointsBalance, [
+            {"user_id": user_id, "total_points": 10 * points_per_user} for user_id in user_ids
+        ])
+        # Databases built with create_all have no points rules yet
+        if db.execute(select(models.PointsRule.id).limit(1)).first() is None:
+            db.execute(insert(models.PointsRule), points_rules.DEFAULT_RULES)
+        db.commit()
+
+        if rollup:
+            rollups.roll_up(db)
+    finally:
+        db.close()
+
+    return {"run_id": run_id, "user_ids": user_ids, "wallet_ids": wallet_ids, "wallet_owners": wallet_owners,
+            "tour_ids": tour_ids, "emails": emails}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--wallets-per-user", type=int, default=2)
+    parser.add_argument("--transactions-per-wallet", type=int, default=50)
+    parser.add_argument("--points-per-user", type=int, default=20)
+    parser.add_argument("--tours", type=int, default=20)
+    parser.add_argument("--no-rollup", action="store_true")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset = seed_dataset(args.users, args.wallets_per_user, args.transactions_per_wallet,
+                           args.points_per_user, rollup=not args.no_rollup, tours=args.tours)
+    print(f"✅ Seeded {len(dataset['user_ids'])} users / {len(dataset['wallet_ids'])} wallets "
+          f"/ {len(dataset['tour_ids'])} tours in {time.perf_counter() - start:.1f}s (run {dataset['run_id']})")
@@ -0,0 +1,74 @@
+# Rows per second for one large transaction listing, built the old and the new way.
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.serialization --rows 10000 --runs 5
+#
+# orm:  select(Transaction) ORM objects, validated and encoded as a TransactionPage
+#       response_model (what the list endpoints did before)
+# rows: column tuples, one TypeAdapter validation for the page, orjson encoding
+#       (serialization.transaction_page, what they do now)
+# Both include the query. The two bodies are checked to decode to the same JSON.
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from benchmarks.seed import seed_dataset
+import models
+import schemas
+from database import AsyncSessionLocal
+from pagination import apply_keyset, build_page
+from serialization import TRANSACTION_COLUMNS, transaction_page
+
+page_adapter = TypeAdapter(schemas.TransactionPage)
+
+
+def listing(columns, wallet_id, limit):
+    query = select(*columns).where(models.Transaction.wallet_id == wallet_id)
+    return apply_keyset(query, models.Transaction.created_at, models.Transaction.id, None, limit)
+
+
+async def orm_body(db, wallet_id, limit):
+    transactions = (await db.execute(listing([models.Transaction], wallet_id, limit))).scalars().all()
+    body = page_adapter.dump_json(page_adapter.validate_python(build_page(transactions, limit), from_attributes=True))
+    db.expunge_all()  # each run hydrates fresh objects
+    return body
+
+
+async def rows_body(db, wallet_id, limit):
+    rows = (await db.execute(listing(TRANSACTION_COLUMNS, wallet_id, limit))).all()
+    return transaction_page(rows, limit).body
+
+
+async def main(args):
+    dataset = seed_dataset(1, 1, args.rows, 0, rollup=False, tours=0)
+    wallet_id = dataset["wallet_ids"][0]
+
+    bodies = {}
+    async with AsyncSessionLocal() as db:
+        for name, build in (("orm", orm_body), ("rows", rows_body)):
+            await build(db, wallet_id, args.rows)  # warm up
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                bodies[name] = await build(db, wallet_id, args.rows)
+                timings.append(time.perf_counter() - start)
+            median = statistics.median(timings)
+            print(f"{name:>4}: {args.rows / median:10.0f} rows/s   median {median * 1000:.1f} ms   "
+                  f"{len(bodies[name]) / 1024:.0f} KiB")
+
+    if json.loads(bodies["orm"]) != json.loads(bodies["rows"]):
+        print("❌ The two responses differ.")
+        return 1
+    print("✅ Both responses decode to the same JSON.")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transaction listing serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
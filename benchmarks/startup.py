@@ -0,0 +1,80 @@
+# Worker cold-start benchmark: how long a fresh interpreter takes to import the app
+# and to answer its first request (which is the first to touch the database).
+#
+#   DATABASE_URL=postgresql://... python -m benchmarks.startup --runs 10
+#   python -m benchmarks.startup --compare-ref <commit>   # also measure an earlier commit
+#
+# --compare-ref checks the commit out into a temporary git worktree and runs the same
+# measurement there, so before/after numbers come from one invocation.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from benchmarks import ROOT
+
+# Runs inside the worker being measured, from its app directory
+PROBE = """
+import json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/wallets/0")
+print(json.dumps({"import": imported - start, "first_request": time.perf_counter() - imported}))
+"""
+
+
+def measure(tree, runs):
+    app_dir = os.path.join(tree, "app")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([app_dir, tree]))
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], cwd=app_dir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        phase: {
+            "median_ms": round(statistics.median(sample[phase] for sample in samples) * 1000, 1),
+            "min_ms": round(min(sample[phase] for sample in samples) * 1000, 1),
+        }
+        for phase in ("import", "first_request")
+    }
+
+
+def print_row(label, result):
+    print(f"{label:>12}  import {result['import']['median_ms']:>8.1f} ms (min {result['import']['min_ms']:.1f})"
+          f"   first request {result['first_request']['median_ms']:>8.1f} ms (min {result['first_request']['min_ms']:.1f})")
+
+
+def main(args):
+    if not os.getenv("DATABASE_URL"):
+        sys.exit("Set DATABASE_URL to the database the workers would use")
+
+    results = {}
+    if args.compare_ref:
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = os.path.join(tmp, "tree")
+            subprocess.run(["git", "worktree", "add", "--detach", tree, args.compare_ref],
+                           cwd=ROOT, check=True, capture_output=True)
+            try:
+                results[args.compare_ref] = measure(tree, args.runs)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", tree], cwd=ROOT, check=True)
+    results["working tree"] = measure(ROOT, args.runs)
+
+    print(f"median of {args.runs} cold starts:")
+    for label, result in results.items():
+        print_row(label, result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--compare-ref", help="git commit to measure as the baseline")
+    main(parser.parse_args())
@@ -0,0 +1,108 @@
+# Concurrency check for the batch transfer engine.
+#
+# Usage (from the repo root, against a disposable database):
+#   DATABASE_URL=postgresql://... python benchmarks/transfer_concurrency.py [--wallets 10] [--tasks 50] [--batches 20]
+#
+# Fires overlapping random transfer batches at a small set of wallets and checks
+# that money is conserved: the wallets' total is unchanged, no balance goes
+# negative, and every balance equals its opening balance plus its ledger rows.
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--wallets", type=int, default=10)
+parser.add_argument("--tasks", type=int, default=50)
+parser.add_argument("--batches", type=int, default=20, help="batches per task")
+parser.add_argument("--batch-size", type=int, default=5)
+parser.add_argument("--opening-balance", type=int, default=100000, help="minor units")
+args = parser.parse_args()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "app")]
+
+from fastapi import HTTPException  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.exc import DBAPIError  # noqa: E402
+
+import models  # noqa: E402
+import transfers  # noqa: E402
+from database import AsyncSessionLocal, Base, get_engine  # noqa: E402
+
+
+async def setup():
+    Base.metadata.create_all(bind=get_engine())
+    async with AsyncSessionLocal() as db:
+        user = models.User(name="transfer-check", email=f"transfer-check-{time.time_ns()}@example.com", password="-")
+        db.add(user)
+        await db.flush()
+        wallets = [models.Wallet(user_id=user.id, balance=args.opening_balance, currency="GHS") for _ in range(args.wallets)]
+        db.add_all(wallets)
+        await db.commit()
+        return [wallet.id for wallet in wallets]
+
+
+async def worker(wallet_ids, outcomes):
+    for _ in range(args.batches):
+        batch = []
+        for _ in range(args.batch_size):
+            from_id, to_id = random.sample(wallet_ids, 2)
+            batch.append((from_id, to_id, random.randint(100, 20000)))
+        async with AsyncSessionLocal() as db:
+            try:
+                await transfers.apply_transfers(db, batch)
+                await db.commit()
+                outcomes["committed"] += 1
+            except HTTPException:
+                await db.rollback()
+                outcomes["rejected"] += 1
+            except DBAPIError as e:
+                await db.rollback()
+                outcomes["deadlock" if "deadlock" in str(e).lower() else "db_error"] += 1
+
+
+async def verify(wallet_ids):
+    async with AsyncSessionLocal() as db:
+        balances = dict((await db.execute(
+            select(models.Wallet.id, models.Wallet.balance).where(models.Wallet.id.in_(wallet_ids))
+        )).all())
+        ledger = dict((await db.execute(
+            select(models.Transaction.wallet_id, func.sum(models.Transaction.amount))
+            .where(models.Transaction.wallet_id.in_(wallet_ids))
+            .group_by(models.Transaction.wallet_id)
+        )).all())
+
+    expected_total = args.opening_balance * len(wallet_ids)
+    problems = []
+    # Integer minor units, so every check is exact
+    if sum(balances.values()) != expected_total:
+        problems.append(f"total {sum(balances.values())} != {expected_total}")
+    for wallet_id, balance in balances.items():
+        if balance < 0:
+            problems.append(f"wallet {wallet_id} is negative ({balance})")
+        if args.opening_balance + (ledger.get(wallet_id) or 0) != balance:
+            problems.append(f"wallet {wallet_id} balance {balance} does not match its ledger")
+    return problems
+
+
+async def main():
+    wallet_ids = await setup()
+    outcomes = {"committed": 0, "rejected": 0, "deadlock": 0, "db_error": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(wallet_ids, outcomes) for _ in range(args.tasks)])
+    elapsed = time.perf_counter() - start
+
+    problems = await verify(wallet_ids)
+    print(f"batches: {outcomes}  ({outcomes['committed'] * args.batch_size / elapsed:.1f} transfers/s)")
+    if problems or outcomes["deadlock"]:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ Balances conserved, no deadlocks.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# Tests run the app in-process against a throwaway SQLite database. The app modules
+# read their settings at import, so the environment is set before importing them.
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+# Always a temporary file: the fixtures drop every table
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="vooya-tests-"), "test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import balances  # noqa: E402
+import cache  # noqa: E402
+import catalog  # noqa: E402
+import database  # noqa: E402
+import fx  # noqa: E402
+import idempotency  # noqa: E402
+import main  # noqa: E402
+import models  # noqa: E402
+import points_rules  # noqa: E402
+
+# One event loop for the whole run: the async engine's connections, the points buffer
+# and the job queue all belong to the loop they were first used on
+loop = asyncio.new_event_loop()
+
+
+@pytest.fixture
+def run():
+    return loop.run_until_complete
+
+
+@pytest.fixture
+def db():
+    # Empty schema and empty per-process caches for every test
+    engine = database.get_engine()
+    database.Base.metadata.drop_all(engine)
+    database.Base.metadata.create_all(engine)
+    cache.backend = cache.LRUCache()
+    idempotency._recent = cache.LRUCache(max_entries=idempotency.IDEMPOTENCY_CACHE_ENTRIES, ttl=idempotency.IDEMPOTENCY_TTL)
+    for module in (balances, catalog, fx, points_rules):
+        module.invalidate()
+
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+    yield client
+    loop.run_until_complete(client.aclose())
+
+
+@pytest.fixture
+def make_wallets(db):
+    # make_wallets(count, balance) -> wallet ids of one new user; balance in minor units
+    def make(count, balance, currency="GHS"):
+        user = models.User(name="Test User", email=f"user{db.query(models.User).count()}@example.com", password="-")
+        db.add(user)
+        db.flush()
+        wallets = [models.Wallet(user_id=user.id, balance=balance, currency=currency) for _ in range(count)]
+        db.add_all(wallets)
+        db.commit()
+        return [wallet.id for wallet in wallets]
+    return make
@@ -0,0 +1,30 @@
+import pytest
+
+import models
+
+BAD_AMOUNTS = [-1, 0, -10**16, 1e17, "nan", "inf", 0.001]
+
+
+@pytest.mark.parametrize("amount", BAD_AMOUNTS)
+def test_fund_rejects_bad_amounts(client, make_wallets, db, run, amount):
+    wallet_id, = make_wallets(1, 1_000)
+    response = run(client.post("/wallets/fund", json={"wallet_id": wallet_id, "amount": amount, "source": "card"}))
+    assert response.status_code == 422
+    assert db.get(models.Wallet, wallet_id).balance == 1_000
+
+
+@pytest.mark.parametrize("amount", BAD_AMOUNTS)
+def test_transfers_reject_bad_amounts(client, make_wallets, db, run, amount):
+    source, target = make_wallets(2, 1_000)
+    single = run(client.post("/transactions/transfer", params={"from_wallet_id": source, "to_wallet_id": target, "amount": amount}))
+    batch = run(client.post("/transactions/transfer/batch", json={"transfers": [
+        {"from_wallet_id": source, "to_wallet_id": target, "amount": amount}
+    ]}))
+    assert (single.status_code, batch.status_code) == (422, 422)
+    db.expire_all()
+    assert [db.get(models.Wallet, wallet_id).balance for wallet_id in (source, target)] == [1_000, 1_000]
+
+
+def test_price_filters_accept_zero(client, db, run):
+    response = run(client.get("/tours/", params={"min_price": 0, "max_price": 100}))
+    assert response.status_code == 200
@@ -0,0 +1,47 @@
+import asyncio
+
+import cache
+import models
+
+
+class SlowSession:
+    # Stands in for the AsyncSession: each get returns the row as it was when the
+    # load started, but only after `release` is set
+    def __init__(self, row):
+        self.row = row
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def get(self, model, entity_id):
+        row = self.row
+        self.started.set()
+        await self.release.wait()
+        return row
+
+
+def test_load_racing_an_invalidate_is_not_cached(db, run):
+    stale = models.Wallet(id=1, user_id=1, balance=500, currency="GHS", balance_shards=0)
+
+    async def race():
+        session = SlowSession(stale)
+        load = asyncio.ensure_future(cache.get_wallet(session, 1))
+        await session.started.wait()
+        # The balance changes and is invalidated while the old row is still loading
+        await cache.invalidate("wallet", 1)
+        session.release.set()
+        await load
+        return await cache.backend.get(cache._key("wallet", 1))
+
+    assert run(race()) is None
+
+
+def test_load_without_invalidate_is_cached(db, run):
+    wallet = models.Wallet(id=1, user_id=1, balance=500, currency="GHS", balance_shards=0)
+
+    async def load():
+        session = SlowSession(wallet)
+        session.release.set()
+        await cache.get_wallet(session, 1)
+        return await cache.backend.get(cache._key("wallet", 1))
+
+    assert run(load())["balance"] == 500
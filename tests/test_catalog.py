@@ -0,0 +1,22 @@
+import asyncio
+
+import models
+
+
+def test_reads_during_a_rebuild_see_the_change(client, db, run):
+    vendor = models.Vendor(name="Coast Tours", service_type="tour")
+    db.add(vendor)
+    db.flush()
+    db.add(models.Tour(name="Cape Coast", location="Cape Coast", distance_km=150, price=20_000, vendor_id=vendor.id))
+    db.commit()
+    assert len(run(client.get("/tours/")).json()["items"]) == 1
+
+    # Committing through a Session invalidates the snapshot; every read after that must
+    # see the new tour, including reads that arrive while the rebuild is running
+    db.add(models.Tour(name="Kakum", location="Kakum", distance_km=170, price=15_000, vendor_id=vendor.id))
+    db.commit()
+
+    async def browse():
+        return await asyncio.gather(*[client.get("/tours/") for _ in range(20)])
+
+    assert [len(response.json()["items"]) for response in run(browse())] == [2] * 20
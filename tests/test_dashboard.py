@@ -0,0 +1,53 @@
+import balances
+import metrics
+import models
+
+ROUTE = ("GET", "/users/{user_id}/dashboard")
+
+
+def _dashboard(client, run, user_id, **params):
+    # (response, SQL statements it took), as counted by the metrics middleware
+    before = metrics._queries.get(ROUTE)
+    before = (before.count, before.total) if before is not None else (0, 0)
+    response = run(client.get(f"/users/{user_id}/dashboard", params=params))
+    after = metrics._queries[ROUTE]
+    assert after.count == before[0] + 1
+    return response, after.total - before[1]
+
+
+def _fund(client, run, wallet_id, times):
+    for _ in range(times):
+        assert run(client.post("/wallets/fund", json={"wallet_id": wallet_id, "amount": 1, "source": "card"})).status_code == 200
+
+
+def test_dashboard_takes_a_fixed_number_of_statements(client, make_wallets, db, run):
+    small, = make_wallets(1, 0)
+    _fund(client, run, small, 1)
+    large = make_wallets(4, 0)
+    for wallet_id in large:
+        _fund(client, run, wallet_id, 6)
+    user_ids = [db.get(models.Wallet, wallet_id).user_id for wallet_id in (small, large[0])]
+
+    for user_id, wallets in zip(user_ids, (1, 4)):
+        response, statements = _dashboard(client, run, user_id, limit=5)
+        assert response.status_code == 200
+        assert statements == 3
+        body = response.json()
+        assert len(body["wallets"]) == wallets
+        assert all(len(wallet["transactions"]) == min(5, 6 if wallets == 4 else 1) for wallet in body["wallets"])
+
+
+def test_dashboard_with_a_sharded_wallet(client, make_wallets, db, run):
+    wallet_id, other = make_wallets(2, 1_000)
+    balances.set_shards(db, wallet_id, 4)
+    db.commit()
+    response, statements = _dashboard(client, run, db.get(models.Wallet, wallet_id).user_id)
+    assert response.status_code == 200
+    assert statements == 4
+    assert sorted(wallet["balance"] for wallet in response.json()["wallets"]) == [10.0, 10.0]
+
+
+def test_dashboard_of_an_unknown_user(client, db, run):
+    response, statements = _dashboard(client, run, 999)
+    assert response.status_code == 404
+    assert statements == 1
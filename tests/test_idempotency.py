@@ -0,0 +1,63 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+import cache
+import idempotency
+import models
+
+
+def _credits(db, wallet_id):
+    return db.execute(
+        select(func.count()).select_from(models.Transaction).where(models.Transaction.wallet_id == wallet_id)
+    ).scalar()
+
+
+def test_fund_replayed_with_the_same_key_credits_once(client, make_wallets, db, run):
+    wallet_id, = make_wallets(1, 1_000)
+    fund = lambda: client.post("/wallets/fund", json={"wallet_id": wallet_id, "amount": 12.5, "source": "card"},
+                               headers={"Idempotency-Key": "fund-1"})
+
+    first = run(fund())
+    assert first.status_code == 200
+    assert first.json()["new_balance"] == 22.5
+    assert "Idempotent-Replayed" not in first.headers
+
+    # Replayed from this worker's cache, then from the table as another worker would
+    replays = [run(fund())]
+    idempotency._recent = cache.LRUCache()
+    replays.append(run(fund()))
+    for replay in replays:
+        assert replay.status_code == 200
+        assert replay.headers["Idempotent-Replayed"] == "true"
+        assert replay.json() == first.json()
+
+    db.expire_all()
+    assert db.get(models.Wallet, wallet_id).balance == 2_250
+    assert _credits(db, wallet_id) == 1
+
+
+def test_concurrent_duplicates_credit_once(client, make_wallets, db, run):
+    wallet_id, = make_wallets(1, 0)
+
+    async def fire():
+        return await asyncio.gather(*[
+            client.post("/wallets/fund", json={"wallet_id": wallet_id, "amount": 5, "source": "card"},
+                        headers={"Idempotency-Key": "fund-2"})
+            for _ in range(10)
+        ])
+
+    responses = run(fire())
+    assert {response.status_code for response in responses} == {200}
+    assert {response.json()["new_balance"] for response in responses} == {5.0}
+    db.expire_all()
+    assert db.get(models.Wallet, wallet_id).balance == 500
+    assert _credits(db, wallet_id) == 1
+
+
+def test_key_reused_for_a_different_fund_is_rejected(client, make_wallets, db, run):
+    wallet_id, = make_wallets(1, 0)
+    fund = lambda amount: client.post("/wallets/fund", json={"wallet_id": wallet_id, "amount": amount, "source": "card"},
+                                      headers={"Idempotency-Key": "fund-3"})
+    assert run(fund(5)).status_code == 200
+    assert run(fund(6)).status_code == 422
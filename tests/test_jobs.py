@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+import jobs
+import models
+
+APP_DIR = os.path.dirname(os.path.abspath(jobs.__file__))
+
+
+def test_worker_script_runs_the_handlers_jobs(make_wallets, db):
+    # `python jobs.py run` must claim jobs for handlers that other modules register
+    make_wallets(1, 0)
+    db.execute(insert(jobs.jobs_table).values(
+        kind="award_points", max_attempts=1, run_after=datetime.utcnow(),
+        payload=json.dumps({"user_id": 1, "points": 150, "activity_type": "tour_booking", "details": "tour:1"}),
+    ))
+    db.commit()
+
+    worker = subprocess.Popen([sys.executable, "jobs.py", "run", "--workers", "1"], cwd=APP_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline and worker.poll() is None:
+            db.expire_all()
+            if db.execute(select(jobs.jobs_table.c.status)).scalar() == jobs.DONE:
+                break
+            time.sleep(0.2)
+    finally:
+        worker.terminate()
+        _, errors = worker.communicate(timeout=10)
+
+    assert db.execute(select(jobs.jobs_table.c.status)).scalar() == jobs.DONE, errors.decode()
+    assert db.get(models.PointsBalance, 1).total_points == 150
+
+
+def test_worker_refuses_to_start_without_handlers(monkeypatch, run):
+    monkeypatch.setattr(jobs, "_handlers", {})
+    with pytest.raises(RuntimeError, match="No job handlers"):
+        run(jobs.run_worker())
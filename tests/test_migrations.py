@@ -0,0 +1,46 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+
+import database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(database.__file__)), "migrations")
+
+
+def alembic_config():
+    # No ini file: fileConfig would replace the test run's logging setup
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIR)
+    return config
+
+
+def test_adopting_a_create_all_database(db):
+    # A database from before migrations: the 0001 schema with float amounts
+    db.close()
+    engine = database.get_engine()
+    database.Base.metadata.drop_all(engine)
+    config = alembic_config()
+    command.upgrade(config, "0001")
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+        conn.execute(text("INSERT INTO users (id, email) VALUES (1, 'old@example.com')"))
+        conn.execute(text("INSERT INTO wallets (id, user_id, balance, currency) VALUES (1, 1, 12.34, 'GHS')"))
+        conn.execute(text("INSERT INTO transactions (wallet_id, amount, transaction_type, transaction_category, status, created_at) "
+                          "VALUES (1, 0.29, 'credit', 'wallet_funding', 'completed', '2026-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO points_transactions (user_id, activity_type, points) "
+                          "VALUES (1, 'tour_booking', 25), (1, 'review', 10)"))
+
+    try:
+        command.stamp(config, "0001")
+        command.upgrade(config, "head")
+        command.check(config)  # raises if the schema still differs from models.py
+
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT balance FROM wallets")).scalar_one() == 1234
+            assert conn.execute(text("SELECT amount FROM transactions")).scalar_one() == 29
+            assert conn.execute(text("SELECT total_points FROM points_balances WHERE user_id = 1")).scalar_one() == 35
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
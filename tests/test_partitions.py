@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import func, insert, select
+
+import database
+import models
+import partitions
+import points_ledger
+import rollups
+
+LEDGERS = [
+    (models.Transaction.__table__, models.TransactionArchive.__table__),
+    (models.PointsTransaction.__table__, models.PointsTransactionArchive.__table__),
+]
+
+
+def test_archived_ids_are_never_reused(make_wallets, db):
+    wallet_id, = make_wallets(1, 0)
+    db.execute(insert(models.Transaction).values(
+        wallet_id=wallet_id, amount=100, transaction_type=models.TransactionType.credit,
+        transaction_category=models.TransactionCategory.wallet_funding, status="completed",
+        created_at=datetime(2020, 1, 15)
+    ))
+    points_ledger.add_points(db, 1, 40, "walk")
+    db.query(models.PointsTransaction).update({"created_at": datetime(2020, 1, 15)})
+    db.commit()
+    rollups.roll_up(db)  # only rolled-up transactions may be archived
+
+    # Archiving the newest (here: every) row leaves the hot tables empty
+    with database.get_engine().begin() as conn:
+        for hot, cold in LEDGERS:
+            partitions.archive_month(conn, hot, cold, datetime(2020, 1, 1), to="table")
+
+    db.execute(insert(models.Transaction).values(
+        wallet_id=wallet_id, amount=100, transaction_type=models.TransactionType.credit,
+        transaction_category=models.TransactionCategory.wallet_funding, status="completed"
+    ))
+    points_ledger.add_points(db, 1, 25, "walk")
+    db.commit()
+    for hot, cold in LEDGERS:
+        assert db.execute(select(func.min(hot.c.id))).scalar() > db.execute(select(func.max(cold.c.id))).scalar()
+    # The new transaction lands past the rollup watermark instead of behind it
+    assert db.execute(select(func.min(models.Transaction.id))).scalar() > rollups.get_watermark(db).last_id
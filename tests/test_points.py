@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import event, insert
+
+import bookings
+import database
+import metrics
+import models
+import partitions
+import points_buffer
+import points_ledger
+import points_rules
+
+
+def test_burst_of_earns_larger_than_the_pool(client, make_wallets, db, run):
+    # More waiting earn requests than pooled connections: the flush must still get one
+    db.execute(insert(models.PointsRule), points_rules.DEFAULT_RULES)
+    db.commit()
+    make_wallets(1, 0)
+    burst = 2 * (database.DB_POOL_SIZE + database.DB_MAX_OVERFLOW)
+
+    async def fire():
+        return await asyncio.gather(*[
+            client.post("/points/earn", json={"user_id": 1, "activity_type": "walk"}) for _ in range(burst)
+        ])
+
+    assert {response.status_code for response in run(fire())} == {200}
+    assert run(client.get("/points/balance/1")).json()["total_points"] == 10 * burst
+
+
+def test_earns_during_a_rules_rebuild_use_the_new_rules(client, make_wallets, db, run):
+    db.execute(insert(models.PointsRule), points_rules.DEFAULT_RULES)
+    db.commit()
+    make_wallets(1, 0)
+    assert run(client.post("/points/earn", json={"user_id": 1, "activity_type": "walk"})).json()["points_earned"] == 10
+
+    # Committing through a Session invalidates the rules; every earn after that must use
+    # the new rule, including earns that arrive while the rebuild is running
+    db.add(models.PointsRule(activity_type="walk", base_points=25, points_per_km=0))
+    db.commit()
+
+    async def fire():
+        return await asyncio.gather(*[
+            client.post("/points/earn", json={"user_id": 1, "activity_type": "walk"}) for _ in range(10)
+        ])
+
+    assert [response.json()["points_earned"] for response in run(fire())] == [25] * 10
+
+
+def test_drift_check_reads_archived_points(make_wallets, db):
+    make_wallets(1, 0)
+    points_ledger.add_points(db, 1, 40, "walk")
+    db.query(models.PointsTransaction).update({"created_at": datetime(2020, 1, 15)})
+    points_ledger.add_points(db, 1, 25, "walk")
+    db.commit()
+
+    with database.get_engine().begin() as conn:
+        partitions.archive_month(conn, models.PointsTransaction.__table__,
+                                 models.PointsTransactionArchive.__table__, datetime(2020, 1, 1), to="table")
+    assert db.query(models.PointsTransactionArchive).count() == 1
+
+    assert points_ledger.find_drift(db) == []
+    points_ledger.backfill_balances(db)
+    assert points_ledger.get_balance_row(db, 1).total_points == 65
+
+
+def test_earn_refuses_unbounded_distances(client, make_wallets, db, run):
+    db.execute(insert(models.PointsRule), points_rules.DEFAULT_RULES)
+    db.commit()
+    make_wallets(1, 0)
+    earn = lambda body: run(client.post("/points/earn", content=body, headers={"Content-Type": "application/json"}))
+    for distance in ("-1", "1e9", "Infinity", "NaN"):
+        assert earn(f'{{"user_id": 1, "activity_type": "walk", "distance_km": {distance}}}').status_code == 422
+
+    # Booking points come from the tour, never from the client
+    assert earn('{"user_id": 1, "activity_type": "tour_booking", "distance_km": 500}').status_code == 400
+    batch = {"events": [{"user_id": 1, "activity_type": "walk"}, {"user_id": 1, "activity_type": "tour_booking"}]}
+    assert run(client.post("/points/earn/batch", json=batch)).status_code == 400
+    assert run(client.get("/points/balance/1")).json()["total_points"] == 0
+
+
+def test_a_flush_costs_the_same_statements_for_any_number_of_users(db, run):
+    db.add_all([models.User(name="Earner", email=f"earner{i}@example.com", password="-") for i in range(20)])
+    db.commit()
+    user_ids = [user.id for user in db.query(models.User).order_by(models.User.id)]
+    statements = []
+    count = lambda *args: statements.append(args[2])
+    engine = database.get_async_engine().sync_engine
+    event.listen(engine, "before_cursor_execute", count)
+
+    stats = {"queries": 0, "db_seconds": 0.0}
+
+    async def earn(users):
+        # As if inside a request: the flush must not count against it
+        token = metrics._request_stats.set(stats)
+        try:
+            return await points_buffer.buffer.add([(user_id, 10, "walk", None) for user_id in users])
+        finally:
+            metrics._request_stats.reset(token)
+
+    try:
+        assert run(earn(user_ids[:1])) == {user_ids[0]: 10}
+        one_user = len(statements)
+        statements.clear()
+        assert run(earn(user_ids)) == {user_id: 20 if user_id == user_ids[0] else 10 for user_id in user_ids}
+        assert len(statements) == one_user
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert stats["queries"] == 0
+    assert points_ledger.find_drift(db) == []
+
+
+def test_inline_booking_award_uses_the_points_ledger(client, make_wallets, db, run, monkeypatch):
+    monkeypatch.setattr(bookings, "BOOKING_POINTS_AWARD", "inline")
+    db.execute(insert(models.PointsRule), points_rules.DEFAULT_RULES)
+    db.add(models.Vendor(id=1, name="Vendor"))
+    db.add(models.Tour(id=1, name="Hike", distance_km=42.5, price=5000, vendor_id=1))
+    db.commit()
+    wallet_id, = make_wallets(1, 20000)
+
+    book = lambda: run(client.post("/tours/1/book", json={"user_id": 1, "wallet_id": wallet_id}))
+    assert book().json()["total_points"] == 42  # the user's first points create the balance row
+    assert book().json()["total_points"] == 84
+    assert points_ledger.find_drift(db) == []
@@ -0,0 +1,38 @@
+from datetime import datetime
+from decimal import Decimal
+
+import models
+
+
+def _two_currency_user(client, db, run):
+    user = models.User(name="Test User", email="fx@example.com", password="-")
+    db.add(user)
+    db.flush()
+    wallets = [models.Wallet(user_id=user.id, balance=0, currency=currency) for currency in ("GHS", "USD")]
+    db.add_all(wallets)
+    db.commit()
+    for wallet, amount in zip(wallets, (100, 10)):
+        response = run(client.post("/wallets/fund", json={"wallet_id": wallet.id, "amount": amount, "source": "card"}))
+        assert response.status_code == 200
+    return user.id
+
+
+def test_summary_without_rates_keeps_the_breakdown(client, db, run):
+    user_id = _two_currency_user(client, db, run)
+    response = run(client.get(f"/transactions/summary/user/{user_id}"))
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total_credits"], body["current_balance"], body["credit_count"]) == (None, None, 2)
+    assert {code: totals["total_credits"] for code, totals in body["by_currency"].items()} == {"GHS": 100, "USD": 10}
+
+    # Asking for a conversion that can't be done is still an error
+    assert run(client.get(f"/transactions/summary/user/{user_id}", params={"currency": "GHS"})).status_code == 400
+
+
+def test_summary_converts_with_a_rate(client, db, run):
+    user_id = _two_currency_user(client, db, run)
+    db.add(models.FxRate(base_currency="USD", quote_currency="GHS", rate=Decimal("15.5"), as_of=datetime.utcnow()))
+    db.commit()
+    for params in ({}, {"currency": "GHS"}):
+        body = run(client.get(f"/transactions/summary/user/{user_id}", params=params)).json()
+        assert (body["currency"], body["total_credits"], body["fx_rates"]) == ("GHS", 255, {"USD": 15.5})
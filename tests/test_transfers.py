@@ -0,0 +1,62 @@
+import asyncio
+import random
+
+from sqlalchemy import func, select
+
+import models
+
+OPENING_BALANCE = 100_000  # minor units
+
+
+def _ledger_check(db, wallet_ids):
+    db.expire_all()
+    balances = dict(db.execute(select(models.Wallet.id, models.Wallet.balance).where(models.Wallet.id.in_(wallet_ids))).all())
+    ledger = dict(db.execute(
+        select(models.Transaction.wallet_id, func.sum(models.Transaction.amount))
+        .where(models.Transaction.wallet_id.in_(wallet_ids))
+        .group_by(models.Transaction.wallet_id)
+    ).all())
+    return balances, ledger
+
+
+def test_concurrent_transfers_conserve_money(client, make_wallets, db, run):
+    wallet_ids = make_wallets(6, OPENING_BALANCE)
+    rng = random.Random(7)
+
+    def transfer():
+        from_id, to_id = rng.sample(wallet_ids, 2)
+        amount = rng.randint(1, 20_000) * 2 / 100  # major units; half of it is still whole cents
+        if rng.random() < 0.5:
+            return client.post("/transactions/transfer", params={"from_wallet_id": from_id, "to_wallet_id": to_id, "amount": amount})
+        batch = [{"from_wallet_id": from_id, "to_wallet_id": to_id, "amount": amount}]
+        batch.append({"from_wallet_id": to_id, "to_wallet_id": rng.choice(wallet_ids), "amount": amount / 2})
+        return client.post("/transactions/transfer/batch", json={"transfers": batch})
+
+    async def fire():
+        return await asyncio.gather(*[transfer() for _ in range(120)])
+
+    responses = run(fire())
+    statuses = [response.status_code for response in responses]
+    assert set(statuses) <= {200, 400, 409}, statuses
+    assert statuses.count(200) > 0
+
+    balances, ledger = _ledger_check(db, wallet_ids)
+    assert sum(balances.values()) == OPENING_BALANCE * len(wallet_ids)
+    for wallet_id, balance in balances.items():
+        assert balance >= 0
+        assert balance == OPENING_BALANCE + (ledger.get(wallet_id) or 0)
+    # Transfer rows are written settled, like every other ledger row
+    assert set(db.scalars(select(models.Transaction.status).where(models.Transaction.wallet_id.in_(wallet_ids)))) == {"completed"}
+
+
+def test_overdrawing_transfer_changes_nothing(client, make_wallets, db, run):
+    source, target = make_wallets(2, 1_000)
+    response = run(client.post("/transactions/transfer/batch", json={"transfers": [
+        {"from_wallet_id": source, "to_wallet_id": target, "amount": 6},
+        {"from_wallet_id": source, "to_wallet_id": target, "amount": 6},
+    ]}))
+    assert response.status_code == 400
+
+    balances, ledger = _ledger_check(db, [source, target])
+    assert balances == {source: 1_000, target: 1_000}
+    assert ledger == {}
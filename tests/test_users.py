@@ -0,0 +1,56 @@
+import asyncio
+
+import database
+import models
+import passwords
+
+LOGINS = 10
+
+
+def _checked_out():
+    return database.get_async_engine().sync_engine.pool.checkedout()
+
+
+def test_login_and_register_hash_without_holding_a_connection(client, db, run, monkeypatch):
+    # While bcrypt runs, the request must not hold a pooled connection
+    held = []
+
+    async def fake_hash(password):
+        held.append(_checked_out())
+        await asyncio.sleep(0.05)
+        return f"hashed:{password}"
+
+    hashing = []
+    everyone_hashing = asyncio.Event()
+
+    async def fake_verify(password, hashed):
+        # Counted when every login has reached its hash, so none is querying
+        hashing.append(password)
+        if len(hashing) == LOGINS:
+            held.append(_checked_out())
+            everyone_hashing.set()
+        await asyncio.wait_for(everyone_hashing.wait(), 5)
+        return hashed == f"hashed:{password}", "rehashed"
+
+    monkeypatch.setattr(passwords, "hash_password", fake_hash)
+    monkeypatch.setattr(passwords, "verify_password", fake_verify)
+
+    register = run(client.post("/users/register", json={"name": "A", "email": "a@example.com", "password": "pw"}))
+    assert register.status_code == 200
+
+    async def logins():
+        return await asyncio.gather(*[
+            client.post("/users/login", json={"email": "a@example.com", "password": "pw"}) for _ in range(LOGINS)
+        ])
+
+    assert {response.status_code for response in run(logins())} == {200}
+    assert held == [0, 0]
+    # The upgraded hash is stored through a fresh checkout
+    db.expire_all()
+    assert db.get(models.User, register.json()["id"]).password == "rehashed"
+
+
+def test_register_twice_is_rejected(client, db, run):
+    body = {"name": "A", "email": "b@example.com", "password": "pw"}
+    assert run(client.post("/users/register", json=body)).status_code == 200
+    assert run(client.post("/users/register", json=body)).status_code == 400